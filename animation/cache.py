@@ -0,0 +1,260 @@
+import os
+import json
+import pickle
+import hashlib
+import numpy as np
+
+from animation.data import *
+from animation.profiler import PROFILER
+
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "shs-demo")
+CACHE_MAGIC = b"SHSCACHE"
+CACHE_VERSION = 3
+CACHE_ALIGN = 64
+HASH_INDEX = "hashes.json" # Content hashes of files by path, with the modified time and size they were hashed at
+
+
+# Get content hashes of files, only hashing files whose modified time or size
+# changed since they were last hashed (like WorkbookData sidecars)
+def stamped_hashes(files: list[str], cache_dir: str = CACHE_DIR) -> list[str]:
+    index_file = os.path.join(cache_dir, HASH_INDEX)
+    try:
+        with open(index_file) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    hashes = []
+    changed = False
+    for filename in files:
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        if index.get(path, [])[:2] != stamp:
+            index[path] = stamp + [file_hash(path)]
+            changed = True
+        hashes.append(index[path][2])
+    if changed:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = index_file + ".tmp%d" % os.getpid()
+            with open(tmp, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp, index_file)
+        except OSError as e:
+            print("WARNING: Unable to write file hashes '%s' (%s)" % (index_file, e))
+    return hashes
+
+# Calculate cache key from the contents of a movement log and simulation input xlsx
+def cache_key(log_file: str, xlsx: str, cache_dir: str = CACHE_DIR) -> str:
+    h = hashlib.sha256()
+    h.update(b"%d:" % CACHE_VERSION)
+    for digest in stamped_hashes([log_file, xlsx], cache_dir):
+        h.update(digest.encode())
+    return h.hexdigest()
+
+# Get cache file path for a movement log, files for the same log share a prefix
+def cache_path(log_file: str, key: str, cache_dir: str = CACHE_DIR) -> str:
+    prefix = hashlib.sha1(os.path.abspath(log_file).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, "%s-%s.shs" % (prefix, key[:24]))
+
+# Get offset of array data in a cache file, after the magic, header size, and header
+def _data_start(header_size: int) -> int:
+    start = len(CACHE_MAGIC) + 8 + header_size
+    return start + (-start % CACHE_ALIGN)
+
+# Read movement log events from a pickle, either a raw event list or a saved UserSim
+def read_log(log_file: str) -> list:
+    with open(log_file, "rb") as f:
+        data = pickle.load(f)
+    if hasattr(data, "output"):
+        if not data.output:
+            raise ValueError("Simulation '%s' has no output" % log_file)
+        return data.output
+    return data
+
+# Lay out levels over time (CargoData.NodeLevels) by name back to back, as
+# arrays named with a prefix, giving the names in order
+def _pack_levels(levels: dict, prefix: str) -> tuple[list[str], dict]:
+    names = list(levels)
+    arrays = {
+            prefix + "_bounds": np.cumsum([0] + [len(levels[n]) for n in names]),
+            prefix + "_times": np.concatenate([np.zeros(0)] + [levels[n].times for n in names]),
+            prefix + "_levels": np.concatenate([np.zeros((0, len(CARGO_TYPES)))] + [levels[n].levels for n in names]),
+        }
+    return (names, arrays)
+
+# Get levels over time by name from arrays made by _pack_levels
+def _unpack_levels(names: list[str], arrays: dict, prefix: str) -> dict:
+    bounds = arrays[prefix + "_bounds"]
+    levels = {}
+    for i, name in enumerate(names):
+        levels[name] = CargoData.NodeLevels(arrays[prefix + "_times"][bounds[i]:bounds[i + 1]], arrays[prefix + "_levels"][bounds[i]:bounds[i + 1]])
+    return levels
+
+
+
+# Locations, routing and cargo data derived from a movement log and xlsx
+class ParsedLog:
+    def __init__(self):
+        self.locations = LocationsData()
+        self.routing = RoutingData()
+        self.cargo = CargoData()
+
+    @staticmethod
+    def from_object(data, xlsx: str, verbose: bool = False):
+        self = ParsedLog()
+        with PROFILER.phase("read xlsx"):
+            self.locations = LocationsData.from_xlsx(xlsx, verbose)
+        with PROFILER.phase("routing"):
+            self.routing = RoutingData.from_object(data)
+        with PROFILER.phase("cargo"):
+            self.cargo = CargoData.from_object(data)
+        # Build derived indexes so they are stored with the cache
+        with PROFILER.phase("indexes"):
+            self.routing.get_leg_rows()
+            self.routing.get_move_order()
+        return self
+
+    # Load from cache if possible, otherwise parse and save to cache
+    @staticmethod
+    def load(log_file: str, xlsx: str, cache_dir: str = CACHE_DIR, verbose: bool = False):
+        with PROFILER.phase("hash files"):
+            key = cache_key(log_file, xlsx, cache_dir)
+        path = cache_path(log_file, key, cache_dir)
+        if os.path.exists(path):
+            try:
+                with PROFILER.phase("read cache"):
+                    self = ParsedLog.from_cache(path, key)
+                if verbose:
+                    print("Read cached mission log (%s)" % path)
+                return self
+            except ValueError as e:
+                if verbose:
+                    print("Ignoring cache (%s): %s" % (path, e))
+        if verbose:
+            print("Reading mission log from pickle (%s)" % log_file)
+        with PROFILER.phase("read pickle"):
+            data = read_log(log_file)
+        self = ParsedLog.from_object(data, xlsx, verbose)
+        try:
+            with PROFILER.phase("write cache"):
+                self.to_cache(path, key)
+        except OSError as e:
+            print("WARNING: Unable to write cache '%s' (%s)" % (path, e))
+        return self
+
+    # Read cache file, with arrays memory mapped from the file
+    @staticmethod
+    def from_cache(path: str, key: str = None):
+        with open(path, "rb") as f:
+            if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                raise ValueError("Not a cache file")
+            size = int.from_bytes(f.read(8), "little")
+            try:
+                header = json.loads(f.read(size))
+            except json.JSONDecodeError:
+                raise ValueError("Corrupt cache header")
+        if header["version"] != CACHE_VERSION:
+            raise ValueError("Cache version %s is out of date" % header["version"])
+        if key and header["key"] != key:
+            raise ValueError("Cache key mismatch")
+        start = _data_start(size)
+        arrays = {}
+        for name, (dtype, shape, offset) in header["arrays"].items():
+            if 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=start + offset, shape=tuple(shape))
+
+        self = ParsedLog()
+        for name, lat, lon in header["locations"]:
+            node = LocationsData.Node()
+            node.name = name
+            node.lat = lat
+            node.lon = lon
+            self.locations.nodes.append(node)
+        # Routing columns and indexes
+        routing = self.routing
+        routing.times = arrays["times"]
+        routing.vehicles = arrays["vehicles"]
+        routing.models = arrays["models"]
+        routing.events = arrays["events"]
+        routing.locations = arrays["locations"]
+        routing.vehicle_table = header["vehicle_table"]
+        routing.model_table = header["model_table"]
+        routing.event_table = header["event_table"]
+        routing.location_table = header["location_table"]
+        routing.location_nodes = arrays["location_nodes"]
+        routing.node_table = header["node_table"]
+        routing.leg_rows = (arrays["leg_starts"], arrays["leg_ends"])
+        routing.move_order = arrays["move_order"]
+        routing.move_bounds = arrays["move_bounds"]
+        # Cargo levels, stored back to back for all nodes and vehicles
+        self.cargo.levels = _unpack_levels(header["cargo_nodes"], arrays, "cargo")
+        for i, node in enumerate(header["cargo_nodes"]):
+            self.cargo.init[node] = header["cargo_init"][i]
+            self.cargo.maximums[node] = header["cargo_maximums"][i]
+        self.cargo.vehicles = _unpack_levels(header["cargo_vehicles"], arrays, "vehicle_cargo")
+        return self
+
+    # Write cache file, replacing any older cache of the same log
+    def to_cache(self, path: str, key: str):
+        routing = self.routing
+        leg_starts, leg_ends = routing.get_leg_rows()
+        move_order, move_bounds = routing.get_move_order()
+        cargo_nodes, cargo_arrays = _pack_levels(self.cargo.levels, "cargo")
+        cargo_vehicles, vehicle_arrays = _pack_levels(self.cargo.vehicles, "vehicle_cargo")
+        arrays = {
+                "times": routing.times,
+                "vehicles": routing.vehicles,
+                "models": routing.models,
+                "events": routing.events,
+                "locations": routing.locations,
+                "location_nodes": routing.location_nodes,
+                "leg_starts": leg_starts,
+                "leg_ends": leg_ends,
+                "move_order": move_order,
+                "move_bounds": move_bounds,
+                **cargo_arrays,
+                **vehicle_arrays,
+            }
+        header = {
+                "version": CACHE_VERSION,
+                "key": key,
+                "locations": [[n.name, float(n.lat), float(n.lon)] for n in self.locations],
+                "vehicle_table": [str(v) for v in routing.vehicle_table],
+                "model_table": [str(m) for m in routing.model_table],
+                "event_table": [str(e) for e in routing.event_table],
+                "location_table": [str(l) for l in routing.location_table],
+                "node_table": [str(n) for n in routing.node_table],
+                "cargo_nodes": cargo_nodes,
+                "cargo_init": [self.cargo.init[n] for n in cargo_nodes],
+                "cargo_maximums": [self.cargo.maximums[n] for n in cargo_nodes],
+                "cargo_vehicles": [str(v) for v in cargo_vehicles],
+                "arrays": {},
+            }
+        # Lay out arrays after the header, aligned for memory mapping
+        arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+        offset = 0
+        for name, a in arrays.items():
+            header["arrays"][name] = [a.dtype.str, list(a.shape), offset]
+            offset += a.nbytes + (-a.nbytes % CACHE_ALIGN)
+        header_bytes = json.dumps(header).encode()
+        start = _data_start(len(header_bytes))
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp%d" % os.getpid()
+        with open(tmp, "wb") as f:
+            f.write(CACHE_MAGIC)
+            f.write(len(header_bytes).to_bytes(8, "little"))
+            f.write(header_bytes)
+            for name, a in arrays.items():
+                f.write(b"\0" * (start + header["arrays"][name][2] - f.tell()))
+                f.write(a.tobytes())
+        os.replace(tmp, path)
+        # Remove caches of older versions of this log
+        prefix = os.path.basename(path).split("-")[0] + "-"
+        for f in os.scandir(os.path.dirname(path)):
+            if f.name.startswith(prefix) and f.name.endswith(".shs") and f.path != path:
+                os.remove(f.path)
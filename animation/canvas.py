@@ -1,5 +1,10 @@
+import math
 import tkinter
 from tkinter import font
+import numpy as np
+from PIL import ImageTk
+
+from animation.tiles import TileLayer, TILE_DIR
 
 
 MAP_SCALES = [
@@ -10,6 +15,13 @@ MAP_SCALES = [
 ]
 ICON_SIZE = 1 # 1 or 2
 DYNAMIC_LEG_DISPLAY = False
+DIRECTED_LEGS = False # Draw legs separately for each direction
+LEG_WIDTH_SCALE = 3 # Extra width of busiest legs, as a multiple of line width
+MAX_ZOOM = 32 # Largest zoom, relative to the whole world, tiles may limit it further
+CLUSTER_CELL_PX = 40 # Size of screen grid cells vehicles are clustered by, at map scale 1
+CLUSTER_MIN = 4 # Fewest vehicles in a cell drawn as a cluster badge
+CLUSTER_MAX_ZOOM = 8 # Vehicles are drawn individually from this zoom in
+ZOOM_STEP = 1.25 # Zoom factor of one mouse wheel step
 
 
 class MapCanvas:
@@ -17,28 +29,51 @@ class MapCanvas:
         self.style = None
         self.coord = WorldCoordinates()
         self.named = {}
+        self.named_latlon = {}
+        self.node_names = None
+        self.node_px = np.zeros((0, 2))
+        self.images = {}
+        self.tiles = None
+        self.tile_slots = [] # [item, tile key, image] of tile canvas items, reused as the view moves
+        self.bg_item = None
 
     # Set style by style name ('light', 'dark', or 'satellite')
     def set_style(self, style_name: str, icons: bool):
         self.style = WorldStyle(style_name, icons)
+        self.tiles = TileLayer(self.style.get_tile_dir(), self.make_image)
 
     # Crop in map to show 1/4 of earth
     def crop(self, min_lat: int, min_lon: int):
         self.coord = WorldCoordinates(min_lat, min_lon, 2)
         # print("Cropping world to", self.coord)
 
+    # Set size of the canvas, with map tiles the map fills it at any size,
+    # otherwise it's one of the map image sizes
     def set_px(self, max_width: int, max_height: int):
-        self.coord.set_px(max_width, max_height)
+        self.coord.set_px(max_width, max_height, self.has_tiles())
+
+    def has_tiles(self) -> bool:
+        return self.tiles is not None and self.tiles.exists()
 
     # Add a named location that other can reference later
     def add_named_loc(self, name: str, lat: float, lon: float):
-        if "_" in name:
-            # Everything after a '_' is stripped by the getter (see below)
-            raise ValueError("'_' not allowed in named locations")
-        try:
-            self.named[name] = self.coord.calc_px(lat, lon)
-        except:
-            self.named[name] = None
+        self.add_named_locs([name], [lat], [lon])
+
+    # Add many named locations, projected together
+    def add_named_locs(self, names: list[str], lats: list[float], lons: list[float]):
+        for name in names:
+            if "_" in name:
+                # Everything after a '_' is stripped by the getter (see below)
+                raise ValueError("'_' not allowed in named locations")
+        for name, loc, lat, lon in zip(names, self.calc_locs(lats, lons), lats, lons):
+            self.named_latlon[name] = (lat, lon)
+            self.named[name] = loc
+
+    # Get pixel locations of arrays of latitudes/longitudes, None for those
+    # outside the view
+    def calc_locs(self, lats, lons) -> list[tuple[int, int]]:
+        (x, y) = self.coord.calc_px_array(lats, lons)
+        return [None if math.isnan(px) else (int(px), int(py)) for px, py in zip(x.tolist(), y.tolist())]
 
     # Get pixel location of a name location
     def get_named_px(self, name: str) -> tuple[int, int]:
@@ -47,6 +82,94 @@ class MapCanvas:
             return self.named[name]
         raise ValueError("Unknown node '%s'" % (name))
 
+    # Set node names by ID, keeping their pixel locations in an array indexed
+    # by node ID (NaN for nodes outside the map)
+    def set_nodes(self, names: list[str]):
+        self.node_names = names
+        self.node_px = np.full((len(names), 2), np.nan)
+        for i, name in enumerate(names):
+            if not name in self.named:
+                raise ValueError("Unknown node '%s'" % (name))
+            if self.named[name]:
+                self.node_px[i] = self.named[name]
+
+    # Get pixel location of a node by ID, None if outside the map
+    def get_node_px(self, node: int) -> tuple[int, int]:
+        (x, y) = self.node_px[node]
+        if np.isnan(x):
+            return None
+        return (int(x), int(y))
+
+    # Load an image file for canvas items, each file is only loaded once
+    def load_image(self, file: str):
+        if not file in self.images:
+            self.images[file] = tkinter.PhotoImage(master=self.canvas, file=file)
+        return self.images[file]
+
+    # Convert a Pillow image for canvas items
+    def make_image(self, img):
+        return ImageTk.PhotoImage(img, master=self.canvas)
+
+    # Get size of the default font
+    def get_font_size(self) -> int:
+        return font.nametofont('TkTextFont').actual()["size"]
+
+    # Create canvas items for map tiles, enough to cover the canvas at any zoom
+    def add_tile_items(self):
+        count = self.tiles.max_tiles(self.coord.px_width_full, self.coord.px_height_full)
+        self.tiles.set_canvas_size(self.coord.px_width_full, self.coord.px_height_full)
+        self.coord.max_zoom = min(max(self.tiles.max_world_width() / self.coord.px_width, 1), MAX_ZOOM)
+        for i in range(count):
+            self.tile_slots.append([self.canvas.create_image(0, 0, anchor=tkinter.NW, state="hidden"), None, None])
+
+    # Show map tiles in view, tiles already shown keep their canvas items. Fast
+    # tiles are scaled roughly, for while the view is moving.
+    def show_tiles(self, fast: bool = False):
+        (x, y) = self.coord.calc_world_offset_px()
+        world_width = self.coord.px_width * self.coord.zoom
+        wanted = {}
+        for key, tile_x, tile_y in self.tiles.get_tiles(world_width, -x, -y, self.coord.px_width_full, self.coord.px_height_full):
+            wanted[key] = (tile_x, tile_y)
+        free = []
+        for slot in self.tile_slots:
+            if slot[1] in wanted:
+                pos = wanted.pop(slot[1])
+                # Roughly scaled tiles are replaced once the view settles
+                image = slot[2] if fast else self.tiles.get_image(slot[1])
+                if image is not slot[2]:
+                    slot[2] = image
+                    self.updates.config(slot[0], image=image)
+                self.updates.coords(slot[0], *pos)
+            else:
+                free.append(slot)
+        for slot, (key, pos) in zip(free, wanted.items()):
+            slot[1] = key
+            slot[2] = self.tiles.get_image(key, fast)
+            self.updates.config(slot[0], image=slot[2])
+            self.updates.coords(slot[0], *pos)
+            self.updates.show(slot[0], True)
+        for slot in free[len(wanted):]:
+            slot[1] = None
+            slot[2] = None
+            self.updates.show(slot[0], False)
+
+    # Check if the view can be zoomed, only tiles can be drawn at any zoom
+    def can_zoom(self) -> bool:
+        return self.has_tiles()
+
+    # Project named locations, nodes, and the background again after the view
+    # changes, canvas items are updated on the next flush
+    def reproject(self, fast: bool = False):
+        if self.named_latlon:
+            (lats, lons) = zip(*self.named_latlon.values())
+            self.add_named_locs(list(self.named_latlon), lats, lons)
+        if self.node_names is not None:
+            self.set_nodes(self.node_names)
+        if self.has_tiles():
+            self.show_tiles(fast)
+        elif self.bg_item:
+            self.updates.coords(self.bg_item, *self.coord.calc_world_offset_px())
+
     def display(self, parent, verbose: bool = False):
         if not self.style:
             self.style = WorldStyle
@@ -54,15 +177,79 @@ class MapCanvas:
         # Setup canvas with background
         self.canvas = tkinter.Canvas(parent, bg="black", width=self.coord.px_width_full, height=self.coord.px_height_full, confine=False)
         self.canvas.grid(column=0, row=0)
-        img_width = self.coord.px_width * self.coord.zoom
-        img_height = self.coord.px_height * self.coord.zoom
-        self.bg_img = tkinter.PhotoImage(master=self.canvas, file=self.style.get_map_file(img_width, img_height))
-        self.canvas.create_image(self.coord.calc_world_offset_px(), image=self.bg_img, anchor=tkinter.NW)
-
+        self.updates = TkCanvasUpdates(self.canvas)
+        if self.has_tiles():
+            self.add_tile_items()
+            self.show_tiles()
+        else:
+            # Whole world map image, when tiles haven't been made
+            img_width = self.coord.px_width * self.coord.zoom
+            img_height = self.coord.px_height * self.coord.zoom
+            self.bg_img = self.load_image(self.style.get_map_file(img_width, img_height))
+            self.bg_item = self.canvas.create_image(self.coord.calc_world_offset_px(), image=self.bg_img, anchor=tkinter.NW)
         if verbose:
-            center_lat = self.coord.min_lat + (self.coord.max_lat - self.coord.min_lat)/2
-            center_lon = self.coord.min_lon + (self.coord.max_lon - self.coord.min_lon)/2
-            print("Cropping map to center on (%d, %d)" % (center_lat, center_lon))
+            self.print_center()
+
+    def print_center(self):
+        center_lat = self.coord.min_lat + (self.coord.max_lat - self.coord.min_lat)/2
+        center_lon = self.coord.min_lon + (self.coord.max_lon - self.coord.min_lon)/2
+        print("Cropping map to center on (%d, %d)" % (center_lat, center_lon))
+
+
+
+# Item updates for a frame, skipping values that haven't changed since they
+# were last sent, and applied to the canvas together on flush
+class CanvasUpdates:
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.sent = {}
+        self.pending = []
+
+    def coords(self, item: int, *coords):
+        coords = tuple(int(c) for c in coords)
+        if self.sent.get((item, "coords")) == coords:
+            return
+        self.sent[(item, "coords")] = coords
+        self.pending.append((item, "coords", coords))
+
+    def config(self, item: int, **options):
+        for name, value in options.items():
+            if self.sent.get((item, name)) == value:
+                continue
+            self.sent[(item, name)] = value
+            self.pending.append((item, name, value))
+
+    # Show or hide an item
+    def show(self, item: int, visible: bool):
+        self.config(item, state="normal" if visible else "hidden")
+
+    # Apply pending updates to the canvas
+    def flush(self):
+        for item, name, value in self.pending:
+            if name == "coords":
+                self.canvas.coords(item, *value)
+            else:
+                self.canvas.itemconfig(item, {name: value})
+        self.pending = []
+
+
+# Item updates for a Tk canvas, sent to Tk as one script per frame
+class TkCanvasUpdates(CanvasUpdates):
+    def flush(self):
+        script = []
+        for item, name, value in self.pending:
+            if name == "coords":
+                script.append("%s coords %d %s" % (self.canvas._w, item, " ".join(map(str, value))))
+                continue
+            value = str(value)
+            if "{" in value or "}" in value or "\\" in value:
+                # Can't be quoted in braces, let tkinter escape it
+                self.canvas.itemconfig(item, {name: value})
+                continue
+            script.append("%s itemconfigure %d -%s {%s}" % (self.canvas._w, item, name, value))
+        if script:
+            self.canvas.tk.eval("\n".join(script))
+        self.pending = []
 
 
 
@@ -73,6 +260,7 @@ class WorldCoordinates:
     max_lat = 90
     max_lon = 180
     zoom = 1
+    max_zoom = MAX_ZOOM
     px_width = None
     px_height = None
     node_radius = 3
@@ -102,37 +290,107 @@ class WorldCoordinates:
         else:
             return "Coord[(%d, %d) (%d, %d) %dx%d]" % (self.min_lat, self.min_lon, self.max_lat, self.max_lon, self.px_width, self.px_height)
 
-    def set_px(self, max_width: int, max_height: int):
+    # Set map size to the largest map scale fitting in the space, or fit the
+    # map to the space (keeping item sizes of the largest scale that fits).
+    # Only map images of the scales are made, so spaces smaller than every
+    # scale need the map fitted.
+    def set_px(self, max_width: int, max_height: int, fit: bool = False):
+        if max_width < 2 or max_height < 1:
+            raise ValueError("Unsupported screen resolution %dx%d" % (max_width, max_height))
+        width = min(max_width, max_height * 2) // 2 * 2
+        self.scale = 1
         for scale in MAP_SCALES:
             if (scale[0] < max_width) and (scale[1] < max_height):
-                self.px_width_full = max_width
-                self.px_width_padding = int((max_width - scale[0]) / 2)
-                self.px_width = scale[0]
-                self.px_height_full = max_height
-                self.px_height_padding = int((max_height - scale[1]) / 2)
-                self.px_height = scale[1]
+                if not fit:
+                    width = scale[0]
                 self.scale = scale[2]
-                return
-        raise ValueError("Unsupported screen resolution %dx%d" % (max_width, max_height))
+                break
+        else:
+            if not fit:
+                raise ValueError("Unsupported screen resolution %dx%d" % (max_width, max_height))
+        self.px_width_full = max_width
+        self.px_width_padding = int((max_width - width) / 2)
+        self.px_width = width
+        self.px_height_full = max_height
+        self.px_height_padding = int((max_height - width // 2) / 2)
+        self.px_height = width // 2
 
-    # Calculate pixel coordinates from latitude/longitude
-    def calc_px(self, lat: float, lon: float) -> tuple[int, int]:
+    # Calculate pixel coordinates from latitude/longitude, raising ValueError
+    # outside the view (unless clip is false)
+    def calc_px(self, lat: float, lon: float, clip: bool = True) -> tuple[int, int]:
         if not (self.px_width and self.px_height):
             raise ValueError("Pixels must be set before they can be calculated")
-        if lat < self.min_lat:
-            raise ValueError("Latitude below mimumum")
-        if lon < self.min_lon:
-            raise ValueError("Longitude below mimumum")
-        if lat > self.max_lat:
-            raise ValueError("Latitude above maximum")
-        if lon > self.max_lon:
-            raise ValueError("Longitude above maximum")
+        if clip:
+            if lat < self.min_lat:
+                raise ValueError("Latitude below mimumum")
+            if lon < self.min_lon:
+                raise ValueError("Longitude below mimumum")
+            if lat > self.max_lat:
+                raise ValueError("Latitude above maximum")
+            if lon > self.max_lon:
+                raise ValueError("Longitude above maximum")
         x = (lon - self.min_lon) * self.px_width / (self.max_lon - self.min_lon)
         x = x + self.px_width_padding
         y = (lat - self.min_lat) * self.px_height / (self.max_lat - self.min_lat)
         y = self.px_height - y + self.px_height_padding
         return (int(x), int(y))
 
+    # Calculate pixel coordinates of arrays of latitudes/longitudes, as float
+    # arrays with NaN for points outside the view (unless clip is false)
+    def calc_px_array(self, lats, lons, clip: bool = True) -> tuple[np.ndarray, np.ndarray]:
+        if not (self.px_width and self.px_height):
+            raise ValueError("Pixels must be set before they can be calculated")
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        x = (lons - self.min_lon) * self.px_width / (self.max_lon - self.min_lon)
+        x = x + self.px_width_padding
+        y = (lats - self.min_lat) * self.px_height / (self.max_lat - self.min_lat)
+        y = self.px_height - y + self.px_height_padding
+        if clip:
+            outside = (lats < self.min_lat) | (lats > self.max_lat) | (lons < self.min_lon) | (lons > self.max_lon)
+            x[outside] = np.nan
+            y[outside] = np.nan
+        return (x, y)
+
+    # Calculate latitudes/longitudes of arrays of pixel coordinates, the
+    # inverse of calc_px_array, with NaN for pixels outside the view (unless
+    # clip is false)
+    def calc_latlon_array(self, xs, ys, clip: bool = True) -> tuple[np.ndarray, np.ndarray]:
+        if not (self.px_width and self.px_height):
+            raise ValueError("Pixels must be set before they can be calculated")
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        lons = self.min_lon + (xs - self.px_width_padding) * (self.max_lon - self.min_lon) / self.px_width
+        lats = self.min_lat + (self.px_height + self.px_height_padding - ys) * (self.max_lat - self.min_lat) / self.px_height
+        if clip:
+            outside = (lats < self.min_lat) | (lats > self.max_lat) | (lons < self.min_lon) | (lons > self.max_lon)
+            lats[outside] = np.nan
+            lons[outside] = np.nan
+        return (lats, lons)
+
+    # Move the view to a corner and zoom, kept inside the world
+    def set_view(self, min_lat: float, min_lon: float, zoom: float):
+        zoom = min(max(zoom, 1), self.max_zoom)
+        self.min_lat = min(max(min_lat, WorldCoordinates.min_lat), WorldCoordinates.max_lat - 180/zoom)
+        self.min_lon = min(max(min_lon, WorldCoordinates.min_lon), WorldCoordinates.max_lon - 360/zoom)
+        self.max_lat = self.min_lat + 180/zoom
+        self.max_lon = self.min_lon + 360/zoom
+        self.zoom = zoom
+
+    # Move the view so the map moves by a number of pixels
+    def pan_px(self, dx: float, dy: float):
+        lat_per_px = (self.max_lat - self.min_lat) / self.px_height
+        lon_per_px = (self.max_lon - self.min_lon) / self.px_width
+        self.set_view(self.min_lat + dy * lat_per_px, self.min_lon - dx * lon_per_px, self.zoom)
+
+    # Zoom the view by a factor, keeping the point at a pixel location in place
+    def zoom_at(self, x: float, y: float, factor: float):
+        (lats, lons) = self.calc_latlon_array([x], [y], clip=False)
+        x_frac = (lons[0] - self.min_lon) / (self.max_lon - self.min_lon)
+        y_frac = (lats[0] - self.min_lat) / (self.max_lat - self.min_lat)
+        zoom = min(max(self.zoom * factor, 1), self.max_zoom)
+        self.set_view(lats[0] - y_frac * 180/zoom, lons[0] - x_frac * 360/zoom, zoom)
+
     # Calculate overset for world map background
     def calc_world_offset_px(self) -> tuple[int, int]:
         if not (self.px_width and self.px_height):
@@ -186,7 +444,7 @@ class WorldStyle:
             self.line_width = world.coord.scale * 2
         else:
             self.line_width = world.coord.scale
-        self.font_px = font.nametofont('TkTextFont').actual()["size"]*world.coord.scale
+        self.font_px = world.get_font_size()*world.coord.scale
 
     def get_map_file(self, w: int, h: int) -> str:
         if self.map == "light":
@@ -196,11 +454,21 @@ class WorldStyle:
         elif self.map == "satellite":
             return "files/maps/equirectangular_earth_satellite_%04dx%04d.png" % (w, h)
 
+    # Get directory of map tiles (see make_tiles.py)
+    def get_tile_dir(self) -> str:
+        if self.map == "light":
+            return "%s/equirectangular_earth_map_light" % TILE_DIR
+        elif self.map == "dark":
+            return "%s/equirectangular_earth_map_dark" % TILE_DIR
+        elif self.map == "satellite":
+            return "%s/equirectangular_earth_satellite" % TILE_DIR
+
     def get_icon_file(self, vehicle: str) -> str:
         if not (self.node_radius and self.vehicle_radius and self.line_width):
             raise ValueError("Pixels values must be set get icon files")
         color = self.vehicles[vehicle].replace("#", "")
-        size = self.vehicle_radius * 4 * ICON_SIZE
+        # Icons are made at sizes doubling from 10px, use the closest
+        size = 10 * 2 ** max(0, round(math.log2(self.vehicle_radius * 4 * ICON_SIZE / 10)))
         return "files/icons/%s_%s_%dx%d.png" % (vehicle.lower(), color, size, size)
 
 
@@ -0,0 +1,133 @@
+from time import perf_counter
+import numpy as np
+
+
+DAYS_PER_SECOND = 0.2 # Simulation days per wall clock second at speed 1
+TARGET_FPS = 60
+STALL_MIN_SECONDS = 0.25 # Wall clock gaps between frames up to this long are always played
+STALL_FRAMES = 4 # Longer gaps are stalls when over this many usual frame gaps, played as one usual gap
+IDLE_MIN_SECONDS = 1.0 # Idle periods shorter than this (wall clock seconds at the current speed) aren't skipped
+IDLE_LEAD_SECONDS = 0.25 # Wall clock seconds of an idle period still played before activity resumes
+
+
+# Get simulation times of frames at a frame rate and speed, from 0 to end_time
+def frame_times(end_time: float, fps: int = 30, speed: int = 1) -> list[float]:
+    step = DAYS_PER_SECOND * speed / fps
+    count = int(end_time / step) + 1
+    times = [i * step for i in range(count)]
+    if times[-1] < end_time:
+        times.append(end_time)
+    return times
+
+
+# Get idle periods between 0 and end_time, as (start, end) rows, from sorted
+# (start, end) rows of busy intervals and times of instant events
+def idle_gaps(busy: np.ndarray, events: np.ndarray, end_time: float) -> np.ndarray:
+    points = np.column_stack([events, events])
+    busy = np.concatenate([np.reshape(busy, (-1, 2)), points])
+    busy = busy[np.argsort(busy[:, 0], kind="stable")]
+    busy_ends = np.maximum.accumulate(busy[:, 1]) if len(busy) else np.zeros(0)
+    # Gaps are between each busy end and the next start, where nothing earlier is still busy
+    starts = np.concatenate([[0.0], busy_ends])
+    ends = np.concatenate([busy[:, 0], [end_time]])
+    starts = np.maximum(starts, 0.0)
+    ends = np.minimum(ends, end_time)
+    keep = ends > starts
+    return np.column_stack([starts[keep], ends[keep]])
+
+
+# Maps wall clock time to simulation time, so playback speed doesn't depend on frame cost
+class AnimationClock:
+    time = 0.0
+    speed = 1
+    paused = False
+    skip_idle = False
+    idle_starts = np.zeros(0)
+    idle_ends = np.zeros(0)
+    last_skip = None
+
+    # Create for a simulation ending at end_time (days), now is the wall clock in seconds
+    def __init__(self, end_time: float, speed: int = 1, fps: int = TARGET_FPS, now=perf_counter):
+        self.end_time = end_time
+        self.speed = speed
+        self.period = 1 / fps
+        self.now = now
+        self.last = None
+        self.frame_start = None
+        self.frame_cost = 0.0
+        self.frame_gap = self.period
+        self.skipped = 0
+
+    def pause(self):
+        self.paused = True
+
+    def set_speed(self, speed: int):
+        self.paused = False
+        self.speed = speed
+
+    # Set idle periods, as (start, end) rows, skipped over while skip_idle is set
+    def set_idle(self, gaps: np.ndarray, skip: bool = True):
+        self.idle_starts = np.asarray(gaps)[:, 0] if len(gaps) else np.zeros(0)
+        self.idle_ends = np.asarray(gaps)[:, 1] if len(gaps) else np.zeros(0)
+        self.skip_idle = skip
+
+    def toggle_skip_idle(self):
+        self.skip_idle = not self.skip_idle
+
+    # Jump to a simulation time
+    def seek(self, time: float):
+        self.time = min(max(time, 0), self.end_time)
+
+    # Start a frame, advancing simulation time by the wall clock time since the
+    # last frame, so slow frames are skipped over rather than slowing playback.
+    # Stalls (eg. while the window is dragged) are gaps much longer than the
+    # usual gap between frames, they don't jump ahead. Gaps are smoothed with
+    # stalls cut down, so playback follows the wall clock again a few frames
+    # after frames become slower.
+    def tick(self) -> float:
+        now = self.now()
+        self.frame_start = now
+        if self.last is None:
+            self.last = now
+        gap = now - self.last
+        self.last = now
+        limit = max(STALL_MIN_SECONDS, STALL_FRAMES * self.frame_gap)
+        elapsed = gap if gap <= limit else self.frame_gap
+        self.frame_gap = 0.8 * self.frame_gap + 0.2 * min(gap, limit)
+        if self.paused:
+            return self.time
+        if elapsed > self.period * 1.5:
+            self.skipped += int(elapsed / self.period) - 1
+        self.seek(self.time + elapsed * DAYS_PER_SECOND * self.speed)
+        self.last_skip = None
+        if self.skip_idle:
+            self._skip_idle()
+        return self.time
+
+    # Jump to shortly before the end of a long enough idle period (or its start
+    # when playing backwards), recording the skipped period in last_skip
+    def _skip_idle(self):
+        i = np.searchsorted(self.idle_starts, self.time, "right") - 1
+        if i < 0 or self.time >= self.idle_ends[i]:
+            return
+        (start, end) = (float(self.idle_starts[i]), float(self.idle_ends[i]))
+        days = DAYS_PER_SECOND * abs(self.speed)
+        if end - start < IDLE_MIN_SECONDS * days:
+            return
+        lead = IDLE_LEAD_SECONDS * days
+        if self.speed > 0 and self.time < end - lead:
+            self.time = end - lead
+        elif self.speed < 0 and self.time > start + lead:
+            self.time = start + lead
+        else:
+            return
+        self.last_skip = (start, end)
+
+    # End a frame, getting delay (ms) until the next frame to keep the target rate
+    def get_delay(self) -> int:
+        if self.frame_start is None:
+            return round(self.period * 1000)
+        cost = self.now() - self.frame_start
+        # Smooth frame cost so one slow frame doesn't stall the next
+        self.frame_cost = 0.8 * self.frame_cost + 0.2 * cost
+        return max(1, round((self.period - self.frame_cost) * 1000))
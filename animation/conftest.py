@@ -0,0 +1,15 @@
+import pytest
+
+
+# Wall clock that only moves when a test moves it
+class FakeTime:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def wall():
+    return FakeTime()
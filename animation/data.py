@@ -1,8 +1,11 @@
+import os
 import sys
 import csv
 import pickle
+import hashlib
 import re
-from operator import attrgetter
+from operator import attrgetter, itemgetter
+import numpy as np
 import pandas as pd
 
 
@@ -13,6 +16,31 @@ DIRECTION_SIGN_KEY = {
     "W": -1, "w": -1,
 }
 
+# Routing event kinds
+EVENT_ARRIVING = 0
+EVENT_TAKING_OFF = 1
+EVENT_LOADING = 2
+EVENT_UNLOADING = 3
+ROUTING_EVENTS = {
+    "arriving": EVENT_ARRIVING,
+    "taking off": EVENT_TAKING_OFF,
+    "loading cargo": EVENT_LOADING,
+    "Unloading cargo": EVENT_UNLOADING,
+}
+
+# Workbook sheets and columns read from simulation input xlsx files
+WORKBOOK_SHEETS = {
+    "Army_nodes": ["ICAO", "name", "lat", "LNG_180"],
+    "Vehicles": ["model", "home"],
+}
+WORKBOOK_VERSION = 1
+
+CARGO_TYPES = [
+    "PAX", # passengers
+    "cargo", # short tons
+    "out", # sq ft
+]
+
 
 # Convert degrees minutes seconds notation to float degrees
 def dms2float(dms: str) -> float:
@@ -84,6 +112,148 @@ def parse_coord(coord: str) -> tuple[float, float]:
         c = ","
     return (dms2float(coord.split(c)[0]), dms2float(coord.split(c)[1]))
 
+# Calculate SHA256 hash of a file's contents
+def file_hash(filename: str) -> str:
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+# Encode values as integer codes, with a table of unique values in order of first appearance
+def _factorize(values: list) -> tuple[np.ndarray, list]:
+    if len(values) == 0:
+        return (np.zeros(0, dtype=np.int32), [])
+    codes, uniques = pd.factorize(np.array(values, dtype=object))
+    return (codes.astype(np.int32), list(uniques))
+
+# Merge intervals given by start and end arrays, giving sorted non-overlapping
+# (start, end) rows
+def _merge_intervals(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    if len(starts) == 0:
+        return np.zeros((0, 2))
+    order = np.argsort(starts, kind="stable")
+    starts = starts[order]
+    ends = np.maximum.accumulate(ends[order])
+    # An interval starts a new group if it starts after every earlier one ended
+    first = np.ones(len(starts), dtype=bool)
+    first[1:] = starts[1:] > ends[:-1]
+    groups = np.flatnonzero(first)
+    last = np.append(groups[1:] - 1, len(starts) - 1)
+    return np.column_stack([starts[groups], ends[last]])
+
+# Group signed cargo changes by name, keeping log order within each name, into
+# starting levels (covering the lowest point reached) and levels over time
+def _group_levels(names: list[str], times: np.ndarray, changes: np.ndarray) -> dict:
+    codes, table = _factorize(names)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(table) + 1))
+    times = times[order]
+    changes = changes[order]
+    ret = {}
+    for n in range(len(table)):
+        start, end = bounds[n], bounds[n + 1]
+        running = np.cumsum(changes[start:end], axis=0)
+        init = -np.minimum(running.min(axis=0), 0)
+        levels = np.vstack([np.zeros((1, changes.shape[1])), running]) + init
+        level_times = np.concatenate([[0.0], times[start:end]])
+        by_time = np.argsort(level_times, kind="stable")
+        ret[table[n]] = (init, CargoData.NodeLevels(level_times[by_time], levels[by_time]))
+    return ret
+
+
+
+
+class WorkbookData:
+    # Workbooks already read by this process, by absolute path
+    loaded = {}
+
+    def __init__(self):
+        self.stamp = None
+        self.hash = ""
+        self.sheets = {}
+
+    # Get a copy of a parsed sheet
+    def sheet(self, name: str) -> pd.DataFrame:
+        return self.sheets[name].copy()
+
+    # Read the sheets in WORKBOOK_SHEETS from an xlsx, reusing results from
+    # memory or the sidecar file when the xlsx is unchanged
+    @staticmethod
+    def load(filename: str, verbose: bool = False):
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if path in WorkbookData.loaded and WorkbookData.loaded[path].stamp == stamp:
+            return WorkbookData.loaded[path]
+
+        sidecar = WorkbookData.sidecar_path(path)
+        self = WorkbookData.from_sidecar(sidecar)
+        if self and self.stamp != stamp:
+            # Modified time changed, check if the contents did too
+            if self.hash == file_hash(path):
+                self.stamp = stamp
+                self.to_sidecar(sidecar)
+            else:
+                self = None
+        if not self:
+            if verbose:
+                print("Parsing XLSX (%s)" % filename)
+            self = WorkbookData.from_xlsx(path)
+            self.stamp = stamp
+            self.to_sidecar(sidecar)
+        WorkbookData.loaded[path] = self
+        return self
+
+    @staticmethod
+    def from_xlsx(filename: str):
+        self = WorkbookData()
+        self.hash = file_hash(filename)
+        with pd.ExcelFile(filename) as xls:
+            for sheet, columns in WORKBOOK_SHEETS.items():
+                self.sheets[sheet] = pd.read_excel(xls, sheet, usecols=columns)
+        return self
+
+    # Get sidecar file path, a hidden file beside the xlsx
+    @staticmethod
+    def sidecar_path(filename: str) -> str:
+        head, tail = os.path.split(filename)
+        return os.path.join(head, ".%s.sheets.pkl" % tail)
+
+    # Read sidecar file, returns None if missing or out of date
+    @staticmethod
+    def from_sidecar(filename: str):
+        try:
+            with open(filename, "rb") as f:
+                data = pickle.load(f)
+        except Exception:
+            return None
+        if data.get("version") != WORKBOOK_VERSION or data.get("columns") != WORKBOOK_SHEETS:
+            return None
+        self = WorkbookData()
+        self.stamp = data["stamp"]
+        self.hash = data["hash"]
+        self.sheets = data["sheets"]
+        return self
+
+    def to_sidecar(self, filename: str):
+        data = {
+                "version": WORKBOOK_VERSION,
+                "columns": WORKBOOK_SHEETS,
+                "stamp": self.stamp,
+                "hash": self.hash,
+                "sheets": self.sheets,
+            }
+        try:
+            with open(filename, "wb") as f:
+                pickle.dump(data, f)
+        except OSError:
+            # Sidecar is only an optimization, xlsx directory may be read only
+            pass
+
 
 
 
@@ -109,7 +279,7 @@ class LocationsData:
         if verbose:
             print("Reading locations from XLSX (%s)" % filename)
         self = LocationsData()
-        data = pd.read_excel(filename, "Army_nodes")
+        data = WorkbookData.load(filename).sheet("Army_nodes")
         for name in data.index:
             new = self.Node()
             new.name = data.at[name, "ICAO"]
@@ -139,7 +309,25 @@ class LocationsData:
 
 class RoutingData:
     def __init__(self):
-        self.event_log = []
+        # Event columns, one entry per log row
+        self.times = np.zeros(0, dtype=np.float64)
+        self.vehicles = np.zeros(0, dtype=np.int32)
+        self.models = np.zeros(0, dtype=np.int32)
+        self.events = np.zeros(0, dtype=np.int32)
+        self.locations = np.zeros(0, dtype=np.int32)
+        # Lookup tables for categorical columns
+        self.vehicle_table = []
+        self.model_table = []
+        self.event_table = []
+        self.location_table = []
+        # Node ID of each location, locations after a '_' belong to the node before it
+        self.location_nodes = np.zeros(0, dtype=np.int32)
+        self.node_table = []
+        self.event_log = RoutingData.EventView(self)
+        # Derived indexes, built on first use
+        self.leg_rows = None
+        self.move_order = None
+        self.move_bounds = None
 
     def __str__(self):
         fin = ""
@@ -147,6 +335,9 @@ class RoutingData:
             fin += str(e) + "\n"
         return fin[:-1]
 
+    def __len__(self):
+        return len(self.times)
+
     # Make iterable
     def __iter__(self):
         self.iter = self.event_log.__iter__()
@@ -164,58 +355,195 @@ class RoutingData:
 
     @staticmethod
     def from_object(data):
-        ret = RoutingData()
+        times = []
+        vehicles = []
+        events = []
+        locations = []
         for d in data:
             if not d["Vehicle_name"]:
                 continue
-            ret.event_log.append(RoutingData.RoutingEvent.from_dict(d))
+            times.append(d["time"])
+            vehicles.append(d["Vehicle_name"])
+            events.append(d["event"])
+            locations.append(d["location"])
+
+        ret = RoutingData()
+        ret.times = np.array(times, dtype=np.float64)
+        ret.vehicles, ret.vehicle_table = _factorize(vehicles)
+        ret.events, ret.event_table = _factorize(events)
+        ret.locations, ret.location_table = _factorize(locations)
+        ret.location_nodes, ret.node_table = _factorize([l.split("_")[0] for l in ret.location_table])
+        vehicle_models, ret.model_table = _factorize([v.split(" ")[0] for v in ret.vehicle_table])
+        ret.models = vehicle_models[ret.vehicles]
         return ret
 
 
+    # Get event kind (see ROUTING_EVENTS) of every row, -1 for unknown events
+    def _event_kinds(self) -> np.ndarray:
+        table = np.array([ROUTING_EVENTS.get(e, -1) for e in self.event_table] + [-1], dtype=np.int32)
+        return table[self.events]
+
+    # Get row indices of the departure and arrival of every leg, in order of arrival
+    def get_leg_rows(self) -> tuple[np.ndarray, np.ndarray]:
+        if self.leg_rows is None:
+            self.leg_rows = self._find_leg_rows()
+        return self.leg_rows
+
+    def _find_leg_rows(self) -> tuple[np.ndarray, np.ndarray]:
+        kinds = self._event_kinds()
+        # Order movement events by vehicle, keeping log order within each vehicle
+        rows = np.flatnonzero((kinds == EVENT_ARRIVING) | (kinds == EVENT_TAKING_OFF))
+        rows = rows[np.argsort(self.vehicles[rows], kind="stable")]
+        vehicles = self.vehicles[rows]
+        kinds_sorted = kinds[rows]
+        # A vehicle is away if its previous movement event was taking off
+        away = np.zeros(len(rows), dtype=bool)
+        away[1:] = (vehicles[1:] == vehicles[:-1]) & (kinds_sorted[:-1] == EVENT_TAKING_OFF)
+        is_leg = (kinds_sorted == EVENT_ARRIVING) & away
+
+        # Report the first invalid event in log order
+        errors = [
+                (np.flatnonzero(kinds < 0), "Unknown event '%s'", "event"),
+                (rows[(kinds_sorted == EVENT_TAKING_OFF) & away], "Vehicle leaing again without arriving '%s'", "vehicle_id"),
+                (rows[(kinds_sorted == EVENT_ARRIVING) & ~away & (self.times[rows] != 0.0)], "Vehicle arriving without leaving '%s'", "vehicle_id"),
+            ]
+        errors = [(bad.min(), msg, attr) for bad, msg, attr in errors if len(bad) > 0]
+        if errors:
+            row, msg, attr = min(errors)
+            e = self.event_log[row]
+            if e.event == "arriving":
+                print(e)
+            raise ValueError(msg % getattr(e, attr))
+
+        ends = rows[is_leg]
+        starts = rows[np.flatnonzero(is_leg) - 1]
+        order = np.argsort(ends, kind="stable")
+        return (starts[order], ends[order])
+
+    # Get legs combined by node pair, unordered unless directed
+    def get_leg_index(self, directed: bool = False):
+        starts, ends = self.get_leg_rows()
+        nodes = np.asarray(self.location_nodes, dtype=np.int64)
+        a = nodes[self.locations[starts]]
+        b = nodes[self.locations[ends]]
+        if not directed:
+            a, b = np.minimum(a, b), np.maximum(a, b)
+        keys, first, inverse, counts = np.unique(a * len(self.node_table) + b, return_index=True, return_inverse=True, return_counts=True)
+        first_times = np.full(len(keys), np.inf)
+        last_times = np.full(len(keys), -np.inf)
+        np.minimum.at(first_times, inverse, self.times[starts])
+        np.maximum.at(last_times, inverse, self.times[ends])
+        # Order by first appearance in the log
+        order = np.argsort(first, kind="stable")
+        return RoutingData.LegIndex(self.node_table, a[first][order], b[first][order], counts[order], first_times[order], last_times[order], directed)
+
     def get_legs(self) -> list[tuple[str, str]]:
-        ret = []
-        vehicles = {}
-        for e in self.event_log:
-            if e.event == "taking off":
-                if e.vehicle_id in vehicles:
-                    raise ValueError("Vehicle leaing again without arriving '%s'" % e.vehicle_id)
-                vehicles[e.vehicle_id] = e.location
-            elif e.event == "arriving":
-                if not e.vehicle_id in vehicles:
-                    if e.time == 0.0:
-                        continue
-                    print(e)
-                    raise ValueError("Vehicle arriving without leaving '%s'" % e.vehicle_id)
-                ret.append((vehicles[e.vehicle_id], e.location))
-                vehicles.pop(e.vehicle_id)
-            elif e.event == "loading cargo" or e.event == "Unloading cargo":
-                continue
-            else:
-                raise ValueError("Unknown event '%s'" % e.event)
-        return ret
+        starts, ends = self.get_leg_rows()
+        table = self.location_table
+        return [(table[a], table[b]) for a, b in zip(self.locations[starts].tolist(), self.locations[ends].tolist())]
 
     def get_vehicles(self) -> list:
         ret = []
-        for e in self.event_log:
-            # print("Move for %s at %f" % (v.vehicle_id, e.time))
-            done = False
-            for v in ret:
-                if v.vehicle_id == e.vehicle_id:
-                    v.insert_move(e.time, e.location)
-                    done = True
-                    break
-            if not done:
-                v = self.RoutingVehicle(e.vehicle_id, e.vehicle_model)
-                v.insert_move(e.time, e.location)
-                ret.append(v)
+        for vehicle_id, (model, moves) in self.group_moves().items():
+            v = self.RoutingVehicle(vehicle_id, model)
+            v.moves = moves
+            ret.append(v)
         return ret
 
+    # Group events into a time sorted move list for each vehicle, keyed by
+    # vehicle id in order of first appearance. Moves at equal times are kept
+    # newest first, matching RoutingVehicle.insert_move
+    def group_moves(self) -> dict[str, tuple[str, list[tuple[float, str]]]]:
+        order, bounds = self.get_move_order()
+        times = self.times[order].tolist()
+        locations = np.array(self.location_table, dtype=object)[self.locations[order]].tolist()
+        models = np.zeros(len(self.vehicle_table), dtype=np.int32)
+        models[self.vehicles] = self.models
+        groups = {}
+        for v in range(len(self.vehicle_table)):
+            start, end = bounds[v], bounds[v + 1]
+            moves = list(zip(times[start:end], locations[start:end]))
+            groups[self.vehicle_table[v]] = (self.model_table[models[v]], moves)
+        return groups
+
+    # Get row order sorting events by vehicle then time (newest first on
+    # ties), and the start of each vehicle's rows in that order
+    def get_move_order(self) -> tuple[np.ndarray, np.ndarray]:
+        if self.move_order is None:
+            self.move_order = np.lexsort((-np.arange(len(self.times)), self.times, self.vehicles))
+            self.move_bounds = np.searchsorted(self.vehicles[self.move_order], np.arange(len(self.vehicle_table) + 1))
+        return (self.move_order, self.move_bounds)
+
+    # Get time intervals in which any vehicle is moving between locations, as
+    # sorted non-overlapping (start, end) rows
+    def get_motion_intervals(self) -> np.ndarray:
+        order, bounds = self.get_move_order()
+        times = self.times[order]
+        locations = self.locations[order]
+        vehicles = self.vehicles[order]
+        moving = np.flatnonzero((vehicles[1:] == vehicles[:-1]) & (locations[1:] != locations[:-1]))
+        return _merge_intervals(times[moving], times[moving + 1])
+
     def get_end_time(self) -> float:
-        ret = 0.0
-        for e in self.event_log:
-            if e.time > ret:
-                ret = e.time
-        return ret
+        if len(self.times) == 0:
+            return 0.0
+        return max(0.0, float(self.times.max()))
+
+
+    # Legs combined by node pair, with trip counts, first departure, and last arrival
+    class LegIndex:
+        def __init__(self, node_table, start_nodes, end_nodes, counts, first_times, last_times, directed):
+            self.node_table = node_table
+            self.start_nodes = start_nodes
+            self.end_nodes = end_nodes
+            self.counts = counts
+            self.first_times = first_times
+            self.last_times = last_times
+            self.directed = directed
+
+        def __len__(self):
+            return len(self.counts)
+
+        # Get start and end node names of a leg
+        def get_names(self, i: int) -> tuple[str, str]:
+            return (self.node_table[self.start_nodes[i]], self.node_table[self.end_nodes[i]])
+
+
+    # Read only sequence of RoutingEvent objects built from event columns
+    class EventView:
+        def __init__(self, data):
+            self.data = data
+
+        def __len__(self):
+            return len(self.data.times)
+
+        def __getitem__(self, i: int):
+            d = self.data
+            e = RoutingData.RoutingEvent()
+            e.vehicle_id = d.vehicle_table[d.vehicles[i]]
+            e.vehicle_model = d.model_table[d.models[i]]
+            e.event = d.event_table[d.events[i]]
+            e.time = float(d.times[i])
+            e.location = d.location_table[d.locations[i]]
+            return e
+
+        def __iter__(self):
+            d = self.data
+            columns = zip(
+                    d.times.tolist(),
+                    np.array(d.vehicle_table, dtype=object)[d.vehicles].tolist(),
+                    np.array(d.model_table, dtype=object)[d.models].tolist(),
+                    np.array(d.event_table, dtype=object)[d.events].tolist(),
+                    np.array(d.location_table, dtype=object)[d.locations].tolist(),
+                )
+            for time, vehicle_id, model, event, location in columns:
+                e = RoutingData.RoutingEvent()
+                e.time = time
+                e.vehicle_id = vehicle_id
+                e.vehicle_model = model
+                e.event = event
+                e.location = location
+                yield e
 
 
     class RoutingEvent:
@@ -267,6 +595,9 @@ class CargoData:
     def __init__(self):
         self.init = {}
         self.levels = {}
+        self.maximums = {}
+        # Cargo aboard each vehicle, from loading until unloading
+        self.vehicles = {}
 
     @staticmethod
     def from_pickle(filename: str, verbose: bool = False):
@@ -278,64 +609,97 @@ class CargoData:
 
     @staticmethod
     def from_object(data):
-        events = {}
+        times = []
+        nodes = []
+        vehicles = []
+        move_types = []
+        cargo_types = []
+        quantities = []
         for d in data:
             if d["Cargo"] == "empty":
                 continue
-            event = CargoData.Event(d)
-            if event.location in events:
-                events[event.location].append(event)
+            times.append(d["time"])
+            nodes.append(d["location"].split("_")[0])
+            vehicles.append(d["Vehicle_name"])
+            move_types.append(d["event"])
+            cargo_types.append(d["Cargo"][0]["c_type"])
+            quantities.append(d["Cargo"][0]["cargo_moved"])
+
+        # Signed change of each cargo type for every event, at the node and aboard the vehicle
+        move_codes, move_table = _factorize(move_types)
+        signs = []
+        vehicle_signs = []
+        for m in move_table:
+            if m == "arriving":
+                signs.append(1)
+                vehicle_signs.append(0)
+            elif m == "taking off":
+                signs.append(-1)
+                vehicle_signs.append(0)
+            elif m == "loading cargo":
+                signs.append(0)
+                vehicle_signs.append(1)
+            elif m == "Unloading cargo":
+                signs.append(0)
+                vehicle_signs.append(-1)
             else:
-                events[event.location] = [event]
+                raise ValueError("Unknown move type '%s'" % (m))
+        type_codes, type_table = _factorize(cargo_types)
+        for t in type_table:
+            if not t in CARGO_TYPES:
+                raise ValueError("Unknown cargo type '%s'" % (t))
+        type_codes = np.array([CARGO_TYPES.index(t) for t in type_table] + [0], dtype=np.int32)[type_codes]
+        rows = np.arange(len(times))
+        quantities = np.array(quantities, dtype=np.float64)
+        changes = np.zeros((len(times), len(CARGO_TYPES)))
+        changes[rows, type_codes] = np.array(signs + [0])[move_codes] * quantities
+        vehicle_changes = np.zeros((len(times), len(CARGO_TYPES)))
+        vehicle_changes[rows, type_codes] = np.array(vehicle_signs + [0])[move_codes] * quantities
+        times = np.array(times, dtype=np.float64)
 
         ret = CargoData()
-        # Get starting levels for nodes
-        init = {}
-        for node in events:
-            current = {
-                    "PAX": 0, # passengers
-                    "cargo": 0, # short tons
-                    "out": 0, # sq ft
-                }
-            minimum = dict(current)
-            for e in events[node]:
-                if e.move_type == "arriving":
-                    current[e.cargo_type] += e.quantity
-                elif e.move_type == "taking off":
-                    current[e.cargo_type] -= e.quantity
-                elif e.move_type == "loading cargo" or e.move_type == "Unloading cargo":
-                    pass
-                else:
-                    raise ValueError("Unknown move type '%s'" % (e.move_type))
-                if current[e.cargo_type] < minimum[e.cargo_type]:
-                    minimum[e.cargo_type] = current[e.cargo_type]
-            init[node] = {}
-            for t in minimum:
-                init[node][t] = abs(minimum[t])
-        # Calculate levels over time
-        ret.levels = {}
-        ret.maximums = dict(init)
-        for node in events:
-            ret.levels[node] = []
-            current = dict(init[node])
-            ret.levels[node].append(CargoData.CargoLevels(0, current))
-            for e in events[node]:
-                if e.move_type == "arriving":
-                    current[e.cargo_type] += e.quantity
-                elif e.move_type == "taking off":
-                    current[e.cargo_type] -= e.quantity
-                elif e.move_type == "loading cargo" or e.move_type == "Unloading cargo":
-                    pass
-                else:
-                    raise ValueError("Unknown move type '%s'" % (e.move_type))
-                level = CargoData.CargoLevels(e.time, current)
-                ret.levels[node].append(level)
-                for t in ret.maximums[node]:
-                    ret.maximums[node][t] = max(ret.maximums[node][t], current[t])
-        for n in ret.levels:
-            ret.levels[n].sort(key=attrgetter("time"))
+        for name, (init, levels) in _group_levels(nodes, times, changes).items():
+            ret.init[name] = dict(zip(CARGO_TYPES, init.tolist()))
+            ret.maximums[name] = dict(zip(CARGO_TYPES, levels.levels.max(axis=0).tolist()))
+            ret.levels[name] = levels
+        # Only loading and unloading change cargo aboard vehicles
+        aboard = np.flatnonzero(np.array(vehicle_signs + [0])[move_codes])
+        for name, (init, levels) in _group_levels([vehicles[i] for i in aboard], times[aboard], vehicle_changes[aboard]).items():
+            ret.vehicles[name] = levels
         return ret
 
+    # Get cargo aboard a vehicle at a given time, by cargo type (empty if it
+    # never carries any)
+    def get_vehicle_cargo(self, vehicle: str, time: float) -> dict[str, float]:
+        if not vehicle in self.vehicles:
+            return {}
+        return self.vehicles[vehicle].at(time).levels
+
+    # Get sorted times at which the cargo level of any node changes
+    def get_change_times(self) -> np.ndarray:
+        times = [np.zeros(0)]
+        for node in self.levels.values():
+            changed = np.any(node.levels[1:] != node.levels[:-1], axis=1)
+            times.append(node.times[1:][changed])
+        return np.unique(np.concatenate(times))
+
+    # Cargo levels at a node (or aboard a vehicle) over time, one row of
+    # CARGO_TYPES levels per time
+    class NodeLevels:
+        def __init__(self, times, levels):
+            self.times = times
+            self.levels = levels
+
+        def __len__(self):
+            return len(self.times)
+
+        def __getitem__(self, i: int):
+            return CargoData.CargoLevels(float(self.times[i]), dict(zip(CARGO_TYPES, self.levels[i].tolist())))
+
+        # Get levels at a given time, the starting levels before any change
+        def at(self, time: float):
+            return self[max(int(np.searchsorted(self.times, time, side="right")) - 1, 0)]
+
     class CargoLevels:
         def __init__(self, time, levels):
             self.time = time
@@ -343,14 +707,3 @@ class CargoData:
 
         def __str__(self):
             return "T%02.3f %s" % (self.time, str(self.levels))
-
-    class Event:
-        def __init__(self, log):
-            self.time = log["time"]
-            self.location = log["location"].split("_")[0]
-            self.move_type = log["event"]
-            self.cargo_type = log["Cargo"][0]["c_type"]
-            self.quantity = log["Cargo"][0]["cargo_moved"]
-
-        def __str__(self):
-            return "%02.3f %s %s [%s %s]" % (self.time, self.location, self.move_type, self.cargo_type, self.quantity)
@@ -0,0 +1,213 @@
+import os
+import math
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+from time import perf_counter
+
+from animation.cache import ParsedLog
+from animation.clock import frame_times
+from animation.window import WorldMap
+
+
+VIDEO_CODECS = {
+        ".mp4": "libx264",
+        ".mkv": "libx264",
+        ".mov": "libx264",
+        ".webm": "libvpx-vp9",
+    }
+CHUNKS_PER_PROCESS = 4 # More chunks than processes keeps every core busy until the end
+
+
+# Export and headless map of a worker process, setup once per process
+_worker = None
+
+def _init_worker(export):
+    global _worker
+    _worker = (export, export.setup_map())
+
+def _render_chunk(chunk):
+    return export_chunk(_worker[0], _worker[1], chunk)
+
+# Render and encode a chunk of frames, given as (first frame index, times, segment path),
+# returning the number of frames
+def export_chunk(export, world: WorldMap, chunk) -> int:
+    (first, times, path) = chunk
+    if export.format == "png":
+        for i, time in enumerate(times):
+            world.render_frame(time).save(os.path.join(export.output, "frame_%06d.png" % (first + i)))
+    elif export.format == "gif":
+        frames = [world.render_frame(time) for time in times]
+        # Frames with the first frame's palette use the global color table,
+        # which join_gif copies into them
+        frames[0].save(path, save_all=True, append_images=frames[1:], duration=round(1000 / export.fps), loop=0, include_color_table=True)
+    else:
+        cmd = ["ffmpeg", "-loglevel", "error", "-y",
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", "%dx%d" % (export.width, export.height), "-r", str(export.fps), "-i", "-",
+                "-c:v", VIDEO_CODECS[export.ext], "-pix_fmt", "yuv420p", path]
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        for time in times:
+            proc.stdin.write(world.render_frame(time).tobytes())
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise ValueError("Unable to encode video segment '%s'" % path)
+    return len(times)
+
+# Get offset of the first frame in a GIF, after the header, color table and extensions
+def _gif_frames_start(data: bytes) -> int:
+    flags = data[10]
+    i = 13
+    if flags & 0x80:
+        i += 3 * 2**((flags & 0x07) + 1)
+    while data[i] == 0x21 and data[i + 1] != 0xF9:
+        i = _gif_skip_blocks(data, i + 2)
+    return i
+
+# Get offset after a run of data sub-blocks, ending with an empty block
+def _gif_skip_blocks(data: bytes, i: int) -> int:
+    while data[i] != 0:
+        i += data[i] + 1
+    return i + 1
+
+# Get the frames of a GIF (without the trailer), with the global color table
+# copied to every frame without its own color table. Frames of joined
+# segments would otherwise use the first segment's global color table.
+def _gif_local_frames(data: bytes) -> bytes:
+    flags = data[10]
+    table = data[13:13 + 3 * 2**((flags & 0x07) + 1)] if flags & 0x80 else None
+    ret = bytearray()
+    i = _gif_frames_start(data)
+    while data[i] != 0x3B:
+        if data[i] == 0x21:
+            # Extension, with a label byte before its sub-blocks
+            end = _gif_skip_blocks(data, i + 2)
+            ret += data[i:end]
+        elif data[i] == 0x2C:
+            # Image descriptor, then an optional color table, LZW code size and image data
+            packed = data[i + 9]
+            if packed & 0x80 or table is None:
+                ret += data[i:i + 10]
+            else:
+                ret += data[i:i + 9] + bytes([packed | 0x80 | (flags & 0x07)]) + table
+            start = i + 10
+            if packed & 0x80:
+                start += 3 * 2**((packed & 0x07) + 1)
+            end = _gif_skip_blocks(data, start + 1)
+            ret += data[i + 10:end]
+        else:
+            raise ValueError("Invalid GIF block at offset %d" % i)
+        i = end
+    return bytes(ret)
+
+
+# Export of an animation to PNG frames, an animated GIF, or a video; rendered
+# in chunks by parallel worker processes
+class AnimationExport:
+    style = None
+    icons = False
+
+    def __init__(self, xlsx: str, log_file: str, output: str, width: int, height: int, fps: int = 30, speed: int = 1):
+        self.xlsx = xlsx
+        self.log_file = log_file
+        self.output = output
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.speed = speed
+        self.ext = os.path.splitext(output)[1].lower()
+        if self.ext == ".gif":
+            self.format = "gif"
+        elif self.ext in VIDEO_CODECS:
+            self.format = "video"
+        elif self.ext == "":
+            self.format = "png"
+        else:
+            raise ValueError("Unknown export format '%s'" % self.ext)
+
+    # Set style by style name ('light', 'dark', or 'satellite')
+    def set_style(self, style_name: str, icons: bool):
+        self.style = style_name
+        self.icons = icons
+
+    # Create headless map ready to render frames
+    def setup_map(self) -> WorldMap:
+        world = WorldMap(self.xlsx, self.log_file, headless=True)
+        world.crop(-5, -120)
+        world.style(self.style, self.icons)
+        world.add_cargo_charts()
+        world.display_headless(self.width, self.height)
+        return world
+
+    # Render and join all frames, returning the number of frames
+    def run(self, processes: int = None, verbose: bool = False) -> int:
+        if self.format == "video" and not shutil.which("ffmpeg"):
+            raise ValueError("ffmpeg is required for '%s' export, use a GIF or PNG frames instead" % self.ext)
+        processes = processes or os.cpu_count() or 1
+        # Parse log once so workers all read the cache
+        parsed = ParsedLog.load(self.log_file, self.xlsx, verbose=verbose)
+        times = frame_times(parsed.routing.get_end_time(), self.fps, self.speed)
+        size = max(1, math.ceil(len(times) / (processes * CHUNKS_PER_PROCESS)))
+
+        if self.format == "png":
+            os.makedirs(self.output, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix="shs-export-")
+        try:
+            chunks = []
+            for first in range(0, len(times), size):
+                path = os.path.join(tmp_dir, "segment_%05d%s" % (len(chunks), self.ext))
+                chunks.append((first, times[first:first + size], path))
+            if verbose:
+                print("Rendering %d frames in %d chunks with %d processes" % (len(times), len(chunks), processes))
+
+            start = perf_counter()
+            done = 0
+            if processes == 1:
+                world = self.setup_map()
+                results = (export_chunk(self, world, c) for c in chunks)
+                pool = None
+            else:
+                pool = multiprocessing.Pool(processes, _init_worker, (self,))
+                results = pool.imap_unordered(_render_chunk, chunks)
+            try:
+                for count in results:
+                    done += count
+                    elapsed = perf_counter() - start
+                    print("Rendered %d/%d frames (%.1f fps)" % (done, len(times), done / elapsed))
+            finally:
+                if pool:
+                    pool.terminate()
+                    pool.join()
+
+            segments = [c[2] for c in chunks]
+            if self.format == "gif":
+                self.join_gif(segments)
+            elif self.format == "video":
+                self.join_video(segments, tmp_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return len(times)
+
+    # Join GIF segments, keeping the first header and every segment's frames,
+    # each given its segment's color table
+    def join_gif(self, segments: list[str]):
+        tmp = self.output + ".tmp%d" % os.getpid()
+        with open(tmp, "wb") as f:
+            for i, path in enumerate(segments):
+                with open(path, "rb") as segment:
+                    data = segment.read()
+                if i == 0:
+                    f.write(data[:_gif_frames_start(data)])
+                f.write(_gif_local_frames(data))
+            f.write(b";")
+        os.replace(tmp, self.output)
+
+    # Join video segments without re-encoding
+    def join_video(self, segments: list[str], tmp_dir: str):
+        list_file = os.path.join(tmp_dir, "segments.txt")
+        with open(list_file, "w") as f:
+            for path in segments:
+                f.write("file '%s'\n" % path)
+        cmd = ["ffmpeg", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_file, "-c", "copy", self.output]
+        if subprocess.run(cmd).returncode != 0:
+            raise ValueError("Unable to join video segments into '%s'" % self.output)
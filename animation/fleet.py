@@ -0,0 +1,269 @@
+import heapq
+import numpy as np
+
+
+VEHICLE_KINDS = ["Airplane", "Ship", "Train", "Truck"]
+USAGE_STATES = ["Loading", "Moving", "Done"]
+USAGE_LOADING = 0
+USAGE_MOVING = 1
+USAGE_DONE = 2
+SCHEDULE_COMPACT = 4 # Queue entries per vehicle before skipped entries are dropped
+
+
+# Positions and usage of every vehicle, calculated for all vehicles at once, or
+# only for vehicles which are moving or have passed a move since the last frame
+class FleetState:
+    time = None
+
+    # Create from routing data, the kind of each vehicle, and pixel locations by node ID
+    def __init__(self, routing, kinds: list[str], node_px: np.ndarray):
+        order, bounds = routing.get_move_order()
+        self.count = len(bounds) - 1
+        sizes = np.diff(bounds)
+        self.starts = np.asarray(bounds[:-1], dtype=np.int64)
+        self.ends = self.starts + sizes - 1
+        self.kinds = np.array([VEHICLE_KINDS.index(k) for k in kinds], dtype=np.int64)
+
+        # Flat move arrays, each vehicle's moves back to back
+        self.times = np.asarray(routing.times[order], dtype=np.float64)
+        locations = routing.locations[order]
+        self.nodes = np.asarray(routing.location_nodes, dtype=np.int64)[locations]
+        self.set_node_px(node_px)
+        # Whether the next move is at the same location, ie. not moving
+        self.stays = np.zeros(len(locations), dtype=bool)
+        self.stays[:-1] = locations[:-1] == locations[1:]
+
+        # Offset each vehicle's times so one sorted search covers every vehicle
+        if len(self.times) > 0:
+            self.span = self.times.max() - min(self.times.min(), 0) + 1
+        else:
+            self.span = 1.0
+        self.offsets = np.arange(self.count) * self.span
+        self.keys = self.times + np.repeat(self.offsets, sizes)
+        self.last_times = self.times[self.ends] if self.count else np.zeros(0)
+        self.first_time = min(self.times.min(), 0) if len(self.times) else 0.0
+        self.last_time = self.times.max() if len(self.times) else 0.0
+
+        self.x = np.full(self.count, -1, dtype=np.int64)
+        self.y = np.full(self.count, -1, dtype=np.int64)
+        self.visible = np.zeros(self.count, dtype=bool)
+        self.state = np.zeros(self.count, dtype=np.int64)
+        self.moving = np.zeros(self.count, dtype=bool)
+        self.lo = np.full(self.count, -np.inf)
+        self.hi = np.full(self.count, np.inf)
+        self.scheduled = False
+
+    # Set pixel locations by node ID, eg. after the view changes
+    def set_node_px(self, node_px: np.ndarray):
+        self.px = node_px[self.nodes] if len(self.nodes) else np.zeros((0, 2))
+        self.time = None
+
+    # Calculate index into flat moves of vehicles (all by default) at a given
+    # time, this matches MapVehicle._index_at_time with -1 before the first move
+    def indexes_at(self, time: float, vehicles: np.ndarray = None) -> np.ndarray:
+        return self._search(time, vehicles)[0]
+
+    # Search moves of vehicles at a given time, giving their index, and the
+    # indexes of their first move at or after and first move after the time
+    def _search(self, time: float, vehicles: np.ndarray = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if vehicles is None:
+            vehicles = slice(None)
+        # Times outside all moves are clamped between vehicles' keys, so they
+        # aren't found in the neighbouring vehicle's moves
+        clamped = min(max(time, self.first_time - 0.5), self.last_time + 0.5)
+        query = self.offsets[vehicles] + clamped
+        left = np.searchsorted(self.keys, query, "left")
+        right = np.searchsorted(self.keys, query, "right")
+        # Use the first of equal times, except at or after the last move
+        index = np.where(left < right, left, right - 1)
+        index = np.where(time >= self.last_times[vehicles], self.ends[vehicles], index)
+        return index, left, right
+
+    # Calculate positions, usage, and the times between which they stay the
+    # same (unless moving) of vehicles at a given time
+    def _compute(self, time: float, vehicles: np.ndarray = None) -> tuple[np.ndarray, ...]:
+        index, left, right = self._search(time, vehicles)
+        if vehicles is None:
+            vehicles = slice(None)
+        starts = self.starts[vehicles]
+        ends = self.ends[vehicles]
+        before = index < starts
+        done = index >= ends
+        i0 = np.maximum(index, starts)
+        i1 = np.minimum(i0 + 1, ends)
+        # Interpolate between moves, vehicles not moving stay at the first point
+        moving = ~(before | done | self.stays[i0])
+        dt = self.times[i1] - self.times[i0]
+        ratio = np.zeros(len(index))
+        np.divide(time - self.times[i0], dt, out=ratio, where=moving & (dt > 0))
+        p0 = self.px[i0]
+        p1 = self.px[i1]
+        x = p0[:, 0] + (p1[:, 0] - p0[:, 0]) * ratio
+        y = p0[:, 1] + (p1[:, 1] - p0[:, 1]) * ratio
+        visible = ~(np.isnan(x) | np.isnan(y))
+        x = np.where(visible, x, -1).astype(np.int64)
+        y = np.where(visible, y, -1).astype(np.int64)
+        state = np.where(done, USAGE_DONE, np.where(moving, USAGE_MOVING, USAGE_LOADING))
+        # Exactly at a move time only that time is the same, otherwise
+        # everything is the same until the next or since the previous move
+        lo = np.where(left > starts, self.times[np.maximum(left - 1, 0)], -np.inf)
+        hi = np.where(right <= ends, self.times[np.minimum(right, len(self.times) - 1)], np.inf)
+        exact = left < right
+        lo = np.where(exact, time, lo)
+        hi = np.where(exact, time, hi)
+        return x, y, visible, state, moving, lo, hi
+
+    # Calculate positions and usage of all vehicles at a given time
+    def compute(self, time: float):
+        if time == self.time:
+            return
+        self.time = time
+        (self.x, self.y, self.visible, self.state, self.moving, self.lo, self.hi) = self._compute(time)
+        self.scheduled = False
+
+    # Track vehicles which are moving, and queue when every other vehicle next
+    # changes, playing forwards (by next move) or backwards (by previous move)
+    def _schedule(self):
+        self.active = np.flatnonzero(self.moving)
+        self.generation = np.zeros(self.count, dtype=np.int64)
+        self.later = []
+        self.earlier = []
+        self._queue(np.flatnonzero(~self.moving))
+        self.scheduled = True
+
+    # Queue vehicles which aren't moving, entries of vehicles queued again
+    # since are skipped once reached
+    def _queue(self, vehicles: np.ndarray):
+        self.generation[vehicles] += 1
+        for v, lo, hi, gen in zip(vehicles.tolist(), self.lo[vehicles].tolist(), self.hi[vehicles].tolist(), self.generation[vehicles].tolist()):
+            if hi != np.inf:
+                heapq.heappush(self.later, (hi, v, gen))
+            if lo != -np.inf:
+                heapq.heappush(self.earlier, (-lo, v, gen))
+        # Drop skipped entries once they outnumber vehicles
+        if len(self.later) + len(self.earlier) > SCHEDULE_COMPACT * self.count + 1000:
+            self._schedule()
+
+    # Take vehicles from a queue with keys up to a given key
+    def _due(self, queue: list, key: float) -> list[int]:
+        due = []
+        while queue and queue[0][0] <= key:
+            (at, v, gen) = heapq.heappop(queue)
+            if gen == self.generation[v]:
+                due.append(v)
+        return due
+
+    # Get vehicles whose pixel location changed since the last calculation,
+    # as (vehicle index, location) with None for vehicles that aren't shown.
+    # Only vehicles which are moving, or have reached their next (or
+    # previous) move, are calculated again.
+    def get_changes(self, time: float) -> list[tuple[int, tuple[int, int]]]:
+        if self.time is None:
+            x, y, visible = self.x, self.y, self.visible
+            self.compute(time)
+            changed = np.flatnonzero((self.x != x) | (self.y != y) | (self.visible != visible))
+            return self._changes(changed)
+        if time == self.time:
+            return []
+        if not self.scheduled:
+            self._schedule()
+        self.time = time
+        due = self._due(self.later, time) + self._due(self.earlier, -time)
+        vehicles = np.union1d(self.active, np.array(due, dtype=np.int64))
+        (x, y, visible, state, moving, lo, hi) = self._compute(time, vehicles)
+        changed = vehicles[(self.x[vehicles] != x) | (self.y[vehicles] != y) | (self.visible[vehicles] != visible)]
+        self.x[vehicles] = x
+        self.y[vehicles] = y
+        self.visible[vehicles] = visible
+        self.state[vehicles] = state
+        self.moving[vehicles] = moving
+        self.lo[vehicles] = lo
+        self.hi[vehicles] = hi
+        self.active = vehicles[moving]
+        self._queue(vehicles[~moving])
+        return self._changes(changed)
+
+    def _changes(self, changed: np.ndarray) -> list[tuple[int, tuple[int, int]]]:
+        ret = []
+        for i, x, y, shown in zip(changed.tolist(), self.x[changed].tolist(), self.y[changed].tolist(), self.visible[changed].tolist()):
+            ret.append((i, (x, y) if shown else None))
+        return ret
+
+    # Count vehicles of each kind in each usage state at a given time. Every
+    # vehicle is calculated, without changing the state kept for get_changes
+    # (UsageCounter counts usage for each frame).
+    def get_usage(self, time: float) -> dict[str, list[int]]:
+        state = self._compute(time)[3]
+        counts = np.bincount(state * len(VEHICLE_KINDS) + self.kinds, minlength=len(USAGE_STATES) * len(VEHICLE_KINDS))
+        counts = counts.reshape(len(USAGE_STATES), len(VEHICLE_KINDS)).tolist()
+        return dict(zip(USAGE_STATES, counts))
+
+
+# Vehicle usage counts kept up to date from sorted usage transitions, so each
+# frame only applies the transitions passed since the last frame (either way)
+class UsageCounter:
+    # Create from a fleet's moves, matching FleetState.get_usage at every time
+    def __init__(self, fleet: FleetState):
+        count = len(fleet.times)
+        flat = np.arange(count)
+        vehicle = np.repeat(np.arange(fleet.count), fleet.ends - fleet.starts + 1)
+        is_end = flat == fleet.ends[vehicle]
+        states = np.where(is_end, USAGE_DONE, np.where(fleet.stays, USAGE_LOADING, USAGE_MOVING))
+        # Between equal times the first index is used at that exact time, and
+        # the last index just after it
+        first = np.ones(count, dtype=bool)
+        first[1:] = (vehicle[1:] != vehicle[:-1]) | (fleet.times[1:] != fleet.times[:-1])
+        last = np.ones(count, dtype=bool)
+        last[:-1] = (vehicle[:-1] != vehicle[1:]) | (fleet.times[:-1] != fleet.times[1:])
+        at_end = fleet.times == fleet.last_times[vehicle]
+
+        # Transitions at each time (phase 0), then just after it (phase 1)
+        index = np.concatenate([np.flatnonzero(first), np.flatnonzero(last & ~at_end)])
+        phase = np.concatenate([np.zeros(first.sum(), dtype=np.int8), np.ones((last & ~at_end).sum(), dtype=np.int8)])
+        to = np.concatenate([np.where(at_end[first], USAGE_DONE, states[first]), states[last & ~at_end]])
+        # Order within each vehicle, to find the state each transition is from
+        order = np.lexsort((phase, index))
+        index, phase, to = index[order], phase[order], to[order]
+        from_ = np.full(len(to), USAGE_LOADING)
+        same = np.zeros(len(to), dtype=bool)
+        same[1:] = vehicle[index[1:]] == vehicle[index[:-1]]
+        from_[1:] = np.where(same[1:], to[:-1], USAGE_LOADING)
+        keep = from_ != to
+
+        # Sort all transitions by time then phase, keeping vehicle order
+        times = fleet.times[index[keep]]
+        phase = phase[keep]
+        order = np.lexsort((phase, times))
+        self.times = times[order]
+        self.phase = phase[order]
+        kinds = fleet.kinds[vehicle[index[keep]]][order]
+        size = len(VEHICLE_KINDS)
+        self.from_keys = from_[keep][order] * size + kinds
+        self.to_keys = to[keep][order] * size + kinds
+        self.counts = np.zeros(len(USAGE_STATES) * size, dtype=np.int64)
+        self.counts[USAGE_LOADING * size:(USAGE_LOADING + 1) * size] = np.bincount(fleet.kinds, minlength=size)
+        self.position = 0
+
+    # Get number of transitions which have happened at a given time
+    def position_at(self, time: float) -> int:
+        i = int(np.searchsorted(self.times, time, "left"))
+        end = len(self.times)
+        while i < end and self.times[i] == time and self.phase[i] == 0:
+            i += 1
+        return i
+
+    # Count vehicles of each kind in each usage state at a given time
+    def get_usage(self, time: float) -> dict[str, list[int]]:
+        position = self.position_at(time)
+        size = len(self.counts)
+        if position > self.position:
+            changes = slice(self.position, position)
+            self.counts -= np.bincount(self.from_keys[changes], minlength=size)
+            self.counts += np.bincount(self.to_keys[changes], minlength=size)
+        elif position < self.position:
+            changes = slice(position, self.position)
+            self.counts -= np.bincount(self.to_keys[changes], minlength=size)
+            self.counts += np.bincount(self.from_keys[changes], minlength=size)
+        self.position = position
+        counts = self.counts.reshape(len(USAGE_STATES), len(VEHICLE_KINDS)).tolist()
+        return dict(zip(USAGE_STATES, counts))
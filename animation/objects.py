@@ -1,9 +1,15 @@
 import re
+import math
 import tkinter
+import numpy as np
 from tkinter import ttk
 from tkinter import font
 
-from animation.canvas import MapCanvas, ICON_SIZE, DYNAMIC_LEG_DISPLAY
+from animation.data import CargoData, CARGO_TYPES
+from animation.canvas import MapCanvas, ICON_SIZE, DYNAMIC_LEG_DISPLAY, LEG_WIDTH_SCALE
+from animation.canvas import CLUSTER_CELL_PX, CLUSTER_MIN, CLUSTER_MAX_ZOOM
+from animation.timeline import TimeIndex
+from animation.spatial import grid_clusters, grid_cell_count
 
 
 AIRPLANE_REGEX = re.compile("^(plane|C17|B777)$")
@@ -24,11 +30,27 @@ class MapNode:
         self.lat = lat
         self.lon = lon
 
-    def display(self, world: MapCanvas):
-        (x, y) = world.coord.calc_px(self.lat, self.lon)
-        p1 = (x - world.style.node_radius, y - world.style.node_radius)
-        p2 = (x + world.style.node_radius, y + world.style.node_radius)
-        self.canvas_dot = world.canvas.create_oval(p1, p2, fill=world.style.text, outline=world.style.text)
+    # Create canvas item at a pixel location from MapCanvas.calc_locs, hidden
+    # for None (outside the view)
+    def display(self, world: MapCanvas, loc: tuple[int, int]):
+        self.canvas_dot = world.canvas.create_oval(0, 0, 0, 0, fill=world.style.text, outline=world.style.text, state="hidden")
+        self.move_to(world, loc)
+
+    # Move node on canvas to a pixel location, hiding it for None
+    def move_to(self, world: MapCanvas, loc: tuple[int, int]):
+        if loc:
+            (x, y) = loc
+            r = world.style.node_radius
+            world.updates.coords(self.canvas_dot, x - r, y - r, x + r, y + r)
+        world.updates.show(self.canvas_dot, loc is not None)
+
+    # Get lines describing the node at a given time, for tooltips
+    def get_info(self, time: float, cargo: CargoData) -> list[str]:
+        lines = [self.name]
+        if cargo and self.name in cargo.levels:
+            levels = cargo.levels[self.name].at(time).levels
+            lines.append(", ".join("%s %g" % (c, round(levels[c], 2)) for c in CARGO_TYPES))
+        return lines
 
     def hide(self, world: MapCanvas):
         world.canvas.itemconfig(self.canvas_dot, state="hidden")
@@ -36,22 +58,52 @@ class MapNode:
         world.canvas.itemconfig(self.canvas_dot, state="normal")
 
 
-# Single travel leg; with start node, end node, and canvas object
+# Single travel route; with start node, end node, trip count, and canvas object
 class MapLeg:
     start_node = ""
     end_node = ""
+    trips = 1
+    max_trips = 1
     canvas_line = None
 
-    def __init__(self, start_node: str, end_node: str):
+    def __init__(self, start_node: str, end_node: str, trips: int = 1, max_trips: int = 1):
         self.start_node = start_node
         self.end_node = end_node
+        self.trips = trips
+        self.max_trips = max_trips
+
+    # Get line width, scaled logarithmically by traffic relative to the busiest leg
+    def get_width(self, canvas: MapCanvas) -> int:
+        if self.max_trips <= 1:
+            return canvas.style.line_width
+        weight = math.log(self.trips) / math.log(self.max_trips)
+        return max(1, round(canvas.style.line_width * (1 + LEG_WIDTH_SCALE * weight)))
 
     def display(self, canvas: MapCanvas):
         if DYNAMIC_LEG_DISPLAY:
             return
+        self.canvas_line = canvas.canvas.create_line(0, 0, 0, 0, fill=canvas.style.text, width=self.get_width(canvas), state="hidden")
+        self.reproject(canvas)
+
+    # Get pixel locations of the ends, None if either is outside the view
+    def get_ends(self, canvas: MapCanvas) -> tuple[tuple[int, int], tuple[int, int]]:
         p1 = canvas.get_named_px(self.start_node)
         p2 = canvas.get_named_px(self.end_node)
-        self.canvas_line = canvas.canvas.create_line(p1, p2, fill=canvas.style.text, width=canvas.style.line_width)
+        if p1 and p2:
+            return (p1, p2)
+        return None
+
+    # Get lines describing the leg, for tooltips
+    def get_info(self) -> list[str]:
+        return ["%s to %s" % (self.start_node, self.end_node), "%d trips" % self.trips]
+
+    # Move line to the current pixel locations of its nodes, hidden if either
+    # is outside the view
+    def reproject(self, canvas: MapCanvas):
+        ends = self.get_ends(canvas)
+        if ends:
+            canvas.updates.coords(self.canvas_line, *ends[0], *ends[1])
+        canvas.updates.show(self.canvas_line, ends is not None)
 
 
 # Single vehicle; with model, movement over time, and canvas object
@@ -62,15 +114,16 @@ class MapVehicle:
     icon_img = None
     canvas_icon = None
     canvas_line = None
-    cached_time_index = -9
     cached_px_index = -9
     cached_usage_index = -9
     current_loc = None
+    clustered = False
 
     def __init__(self, vehicle_id: str, model: str, moves: list[tuple[float, str]]):
         self.vehicle_id = vehicle_id
         self.model = model
         self.moves = moves
+        self.time_index = TimeIndex([m[0] for m in moves])
         if AIRPLANE_REGEX.match(model):
             self.kind = "Airplane"
         elif SHIP_REGEX.match(model):
@@ -84,22 +137,7 @@ class MapVehicle:
 
     # Calculate index of move at give time
     def _index_at_time(self, time: float) -> int:
-        if time < self.moves[0][0]:
-            return -1
-        if time >= self.moves[-1][0]:
-            return len(self.moves) - 1
-        if self.cached_time_index > 0:
-            if time > self.moves[self.cached_time_index][0]:
-                if time < self.moves[self.cached_time_index + 1][0]:
-                    return self.cached_time_index
-        i = 0
-        while i < len(self.moves) - 1:
-            if time == self.moves[i][0]:
-                break
-            if time > self.moves[i][0] and time < self.moves[i + 1][0]:
-                break
-            i += 1
-        return i
+        return self.time_index.index_at(time)
 
     # Get vehicle location at a given time, return None if vehicle is out of use
     def get_location_at(self, time: float, world: MapCanvas) -> tuple[int, int]:
@@ -159,40 +197,201 @@ class MapVehicle:
         self.cached_usage = "Moving"
         return "Moving"
 
-    def draw_img(self, loc):
-        self.canvas_icon = self.canvas.canvas.create_image(loc, image=self.icon_img)
+    # Get lines describing the vehicle at a given time, for tooltips
+    def get_info(self, time: float, cargo: CargoData) -> list[str]:
+        index = self._index_at_time(time)
+        here = self.moves[max(index, 0)][1].split("_")[0]
+        if index == -1:
+            leg = "Waiting at %s" % here
+        elif index == len(self.moves) - 1:
+            leg = "Done at %s" % here
+        elif self.moves[index + 1][1].split("_")[0] == here:
+            leg = "At %s" % here
+        else:
+            leg = "%s to %s" % (here, self.moves[index + 1][1].split("_")[0])
+        aboard = cargo.get_vehicle_cargo(self.vehicle_id, time) if cargo else {}
+        # Levels are sums of quantities, rounded to hide float error
+        aboard = ", ".join("%s %g" % (c, round(q, 2)) for c, q in aboard.items() if round(q, 2) > 0)
+        return [self.vehicle_id, "%s (%s)" % (self.model, self.kind), leg, "Cargo: %s" % (aboard or "none")]
 
-    def draw_dot(self, loc):
+    # Get canvas item coordinates for an icon at a pixel location
+    def img_coords(self, loc: tuple[int, int]) -> tuple[int, ...]:
+        return loc
+
+    # Get canvas item coordinates for a dot at a pixel location
+    def dot_coords(self, loc: tuple[int, int]) -> tuple[int, ...]:
         (x, y) = loc
-        p1 = (x - self.canvas.style.vehicle_radius, y - self.canvas.style.vehicle_radius)
-        p2 = (x + self.canvas.style.vehicle_radius, y + self.canvas.style.vehicle_radius)
-        color = self.canvas.style.vehicles[self.kind]
-        self.canvas_icon = self.canvas.canvas.create_oval(p1, p2, fill=color, outline=color)
+        r = self.canvas.style.vehicle_radius
+        return (x - r, y - r, x + r, y + r)
 
 
-    # Show on canvas if vehicle exists at time 0
+    # Create canvas item, shown if vehicle exists at time 0
     def display(self, canvas: MapCanvas):
         self.canvas = canvas
         if self.canvas.style.icons:
             if not self.icon_img:
-                self.icon_img = tkinter.PhotoImage(file=self.canvas.style.get_icon_file(self.kind))
-            self.draw = self.draw_img
+                self.icon_img = self.canvas.load_image(self.canvas.style.get_icon_file(self.kind))
+            self.item_coords = self.img_coords
+            self.canvas_icon = self.canvas.canvas.create_image(0, 0, image=self.icon_img, state="hidden")
         else:
-            self.draw = self.draw_dot
-
-        loc = self.get_location_at(0, canvas)
-        self.current_loc = loc
-        if loc:
-            self.draw(loc)
+            self.item_coords = self.dot_coords
+            color = self.canvas.style.vehicles[self.kind]
+            self.canvas_icon = self.canvas.canvas.create_oval(0, 0, 0, 0, fill=color, outline=color, state="hidden")
+        self.move_to(self.get_location_at(0, canvas))
 
     # Update vehicle on canvas for current time
     def step(self, canvas: MapCanvas, time: float):
         if DYNAMIC_LEG_DISPLAY:
             self.canvas.canvas.delete(self.canvas_line)
-        loc = self.get_location_at(time, canvas)
+        self.move_to(self.get_location_at(time, canvas))
+
+    # Move vehicle on canvas to a pixel location, hiding it for None
+    def move_to(self, loc: tuple[int, int]):
         if loc == self.current_loc:
             return
         self.current_loc = loc
-        self.canvas.canvas.delete(self.canvas_icon)
         if loc:
-            self.draw(loc)
+            self.canvas.updates.coords(self.canvas_icon, *self.item_coords(loc))
+        self.canvas.updates.show(self.canvas_icon, loc is not None and not self.clustered)
+
+    # Hide vehicle while it's drawn as part of a cluster badge
+    def set_clustered(self, clustered: bool):
+        self.clustered = clustered
+        self.canvas.updates.show(self.canvas_icon, self.current_loc is not None and not clustered)
+
+
+# Badges drawn in place of vehicles crowded together, with the number of
+# vehicles and a pie of their kinds. Vehicles are bucketed each frame by cells
+# of a screen grid, so crowds split up as the map is zoomed in. Badge items are
+# created as more crowds are shown at once and reused after, and there's at
+# most a badge per cell of the canvas however large the fleet is.
+class VehicleClusters:
+    enabled = True
+
+    def __init__(self, vehicles: list[MapVehicle], kinds: list[str]):
+        self.vehicles = vehicles
+        self.kinds = kinds
+        self.kind_index = np.array([kinds.index(v.kind) for v in vehicles], dtype=np.int64)
+        self.clustered = np.zeros(len(vehicles), dtype=bool)
+        self.shown = [] # (x, y, size, kind counts) of each badge shown
+        self.vehicle_badges = np.full(len(vehicles), -1, dtype=np.int64) # Badge of each vehicle, -1 if not clustered
+        self.centers = np.zeros((0, 2)) # Pixel location of each badge shown
+        self.firsts = np.zeros(0, dtype=np.int64) # A vehicle in each badge shown
+
+    # Setup badges, they're created below a marker item so they stay above
+    # vehicles and below anything displayed later
+    def display(self, canvas: MapCanvas):
+        self.canvas = canvas
+        self.cell = CLUSTER_CELL_PX * canvas.coord.scale
+        self.r = canvas.style.vehicle_radius + canvas.style.font_px
+        self.max_badges = grid_cell_count(canvas.coord.px_width_full, canvas.coord.px_height_full, self.cell)
+        self.badges = []
+        self.marker = canvas.canvas.create_text(0, 0, text="", state="hidden")
+
+    def toggle(self):
+        self.enabled = not self.enabled
+
+    # Cluster vehicles at pixel locations for a frame, vehicles aren't
+    # clustered once zoomed in enough to tell them apart. Gives the vehicles
+    # which joined or left a cluster.
+    def step(self, x: np.ndarray, y: np.ndarray, visible: np.ndarray, zoom: float) -> list[int]:
+        badges = np.full(len(self.vehicles), -1, dtype=np.int64)
+        shown = []
+        self.centers = np.zeros((0, 2))
+        self.firsts = np.zeros(0, dtype=np.int64)
+        # Tiles may limit zoom to less than CLUSTER_MAX_ZOOM, clusters split up at the largest zoom
+        if self.enabled and zoom < min(CLUSTER_MAX_ZOOM, self.canvas.coord.max_zoom):
+            on_map = np.flatnonzero(visible)
+            (groups, sizes) = grid_clusters(x[on_map], y[on_map], self.cell, CLUSTER_MIN, self.max_badges)
+            members = on_map[groups >= 0]
+            groups = groups[groups >= 0]
+            badges[members] = groups
+            count = len(sizes)
+            center_x = np.bincount(groups, weights=x[members], minlength=count) / sizes
+            center_y = np.bincount(groups, weights=y[members], minlength=count) / sizes
+            self.centers = np.column_stack([center_x.astype(int), center_y.astype(int)])
+            self.firsts = members[np.unique(groups, return_index=True)[1]]
+            kinds = np.bincount(groups * len(self.kinds) + self.kind_index[members], minlength=count * len(self.kinds))
+            kinds = kinds.reshape(count, len(self.kinds))
+            while len(self.badges) < count:
+                self.badges.append(self._create_badge())
+            for i in range(count):
+                shown.append((int(center_x[i]), int(center_y[i]), int(sizes[i]), kinds[i].tolist()))
+                self._show_badge(self.badges[i], *shown[i])
+        for i in range(len(shown), len(self.shown)):
+            self._hide_badge(self.badges[i])
+        self.shown = shown
+        self.vehicle_badges = badges
+        clustered = badges >= 0
+        changed = np.flatnonzero(clustered != self.clustered).tolist()
+        for i in changed:
+            self.vehicles[i].set_clustered(bool(clustered[i]))
+        self.clustered = clustered
+        return changed
+
+    # Get the badge at a pixel location, None if there isn't one. Badges are
+    # given by a vehicle in them, since badges are handed out again every
+    # frame, so a badge pinned by the vehicle follows its crowd.
+    def find(self, x: int, y: int) -> int:
+        if not len(self.centers):
+            return None
+        dist = (self.centers[:, 0] - x) ** 2 + (self.centers[:, 1] - y) ** 2
+        nearest = int(np.argmin(dist))
+        if dist[nearest] > self.r ** 2:
+            return None
+        return int(self.firsts[nearest])
+
+    # Get pixel location of the badge a vehicle is in, None if it isn't in one
+    def get_loc(self, vehicle: int) -> tuple[int, int]:
+        badge = self.vehicle_badges[vehicle]
+        if badge < 0:
+            return None
+        return self.shown[badge][:2]
+
+    # Get lines describing the vehicles in the badge a vehicle is in, for tooltips
+    def get_info(self, vehicle: int) -> list[str]:
+        (x, y, size, kinds) = self.shown[self.vehicle_badges[vehicle]]
+        return ["%d vehicles" % size] + ["%s %d" % (k, n) for k, n in zip(self.kinds, kinds) if n > 0]
+
+    # Create hidden badge items, filled with their most common kind with arcs
+    # for the others
+    def _create_badge(self) -> tuple:
+        canvas = self.canvas.canvas
+        style = self.canvas.style
+        oval = canvas.create_oval(0, 0, 0, 0, outline=style.text, state="hidden")
+        arcs = []
+        for k in self.kinds:
+            color = style.vehicles[k]
+            arcs.append(canvas.create_arc(0, 0, 0, 0, start=90, extent=0, fill=color, outline=color, state="hidden"))
+        text = canvas.create_text(0, 0, text="", fill=style.bg, state="hidden")
+        for item in [oval] + arcs + [text]:
+            canvas.tag_lower(item, self.marker)
+        return (oval, arcs, text)
+
+    def _show_badge(self, badge: tuple, x: int, y: int, size: int, kinds: list[int]):
+        (oval, arcs, text) = badge
+        updates = self.canvas.updates
+        coords = (x - self.r, y - self.r, x + self.r, y + self.r)
+        most = kinds.index(max(kinds))
+        updates.coords(oval, *coords)
+        updates.config(oval, fill=self.canvas.style.vehicles[self.kinds[most]])
+        updates.show(oval, True)
+        # Arcs go clockwise from the top, after the most common kind
+        start = 90 - 360 * kinds[most] / size
+        for k, arc in enumerate(arcs):
+            if k == most or kinds[k] == 0:
+                updates.show(arc, False)
+                continue
+            extent = 360 * kinds[k] / size
+            updates.coords(arc, *coords)
+            updates.config(arc, start=start - extent, extent=extent)
+            updates.show(arc, True)
+            start -= extent
+        updates.coords(text, x, y)
+        updates.config(text, text=str(size))
+        updates.show(text, True)
+
+    def _hide_badge(self, badge: tuple):
+        (oval, arcs, text) = badge
+        for item in [oval, text] + arcs:
+            self.canvas.updates.show(item, False)
@@ -5,11 +5,15 @@ from tkinter import font
 
 from animation.data import *
 from animation.canvas import MapCanvas, ICON_SIZE
+from animation.timeline import TimeIndex
+from animation.telemetry import FrameTelemetry, TELEMETRY_PERCENTILES
 
 
 
 # Timeline bar display position in the simulation output
 class TimelineBar:
+    seek = None
+
     def __init__(self, max_time):
         self.max_time = max_time
 
@@ -21,17 +25,48 @@ class TimelineBar:
         p1 = (0, canvas.coord.px_height_full - self.cursor_h)
         p2 = (canvas.coord.px_width_full, canvas.coord.px_height_full)
         self.bar = self.canvas.canvas.create_rectangle(p1, p2, fill="black", outline="black")
-        self._draw_cursor(0.0)
+        self.cursor = self.canvas.canvas.create_rectangle(self._cursor_coords(0.0), fill="white", outline="white")
+        self.skips = {}
 
-    def _draw_cursor(self, time: float):
+    def _cursor_coords(self, time: float) -> tuple[int, int, int, int]:
         pos = self.cursor_max * time / self.max_time
-        p1 = (pos, self.canvas.coord.px_height_full - self.cursor_h)
-        p2 = (pos + self.cursor_w, self.canvas.coord.px_height_full)
-        self.cursor = self.canvas.canvas.create_rectangle(p1, p2, fill="white", outline="white")
+        return (pos, self.canvas.coord.px_height_full - self.cursor_h, pos + self.cursor_w, self.canvas.coord.px_height_full)
 
     def step(self, time: float):
-        self.canvas.canvas.delete(self.cursor)
-        self._draw_cursor(time)
+        self.canvas.updates.coords(self.cursor, *self._cursor_coords(time))
+
+    # Check if a pixel y position is on the bar
+    def contains(self, y: int) -> bool:
+        return y >= self.canvas.coord.px_height_full - self.cursor_h
+
+    # Get time at a pixel x position on the bar
+    def time_at(self, x: int) -> float:
+        pos = min(max(x - self.cursor_w/2, 0), self.cursor_max)
+        return self.max_time * pos / self.cursor_max
+
+    # Mark a skipped period on the bar, each period is only marked once
+    def mark_skip(self, start: float, end: float):
+        if (start, end) in self.skips:
+            return
+        x1 = self.cursor_max * start / self.max_time + self.cursor_w/2
+        x2 = self.cursor_max * end / self.max_time + self.cursor_w/2
+        y2 = self.canvas.coord.px_height_full
+        y1 = y2 - self.cursor_h/3
+        item = self.canvas.canvas.create_rectangle(x1, y1, x2, y2, fill="gray40", outline="gray40")
+        self.skips[(start, end)] = item
+        self.canvas.canvas.tag_raise(self.cursor)
+        if self.seek:
+            self._bind_seek(item)
+
+    # Call seek with the time clicked or dragged to on the bar
+    def bind_seek(self, seek):
+        self.seek = seek
+        for item in [self.bar, self.cursor]:
+            self._bind_seek(item)
+
+    def _bind_seek(self, item: int):
+        self.canvas.canvas.tag_bind(item, "<Button-1>", lambda e: self.seek(self.time_at(self.canvas.canvas.canvasx(e.x))))
+        self.canvas.canvas.tag_bind(item, "<B1-Motion>", lambda e: self.seek(self.time_at(self.canvas.canvas.canvasx(e.x))))
 
 
 # On map key for vehicle types
@@ -44,7 +79,7 @@ class VehicleKey:
         for i in range(0, 4):
             if world.style.icons:
                 x, y = world.coord.calc_percent_px(1 + 0.5*ICON_SIZE, 90 - 4*ICON_SIZE + (2 + ICON_SIZE)*i)
-                self.icon_images[i] = tkinter.PhotoImage(file=world.style.get_icon_file(vehicles[i]))
+                self.icon_images[i] = world.load_image(world.style.get_icon_file(vehicles[i]))
                 self.canvas_icons[i] = world.canvas.create_image(x, y, image=self.icon_images[i])
                 self.canvas_texts[i] = world.canvas.create_text(x + world.style.vehicle_radius * (2 + 2*ICON_SIZE), y, fill=world.style.text, text=vehicles[i], anchor=tkinter.W)
             else:
@@ -102,42 +137,49 @@ class BarGraph:
         for i in range(len(self.bar_names)):
             label = canvas.canvas.create_text(self.x_px + (self.x_frac*(2 + 3*i)), self.y_floor + canvas.style.font_px, text=self.bar_names[i], fill=canvas.style.text)
             self.bar_labels.append(label)
-        self._draw_bars(canvas)
-
-    def _draw_bars(self):
+        # Create layers of bars, shown when they have values
         self.bars = []
+        for i in range(len(self.bar_names)):
+            layers = []
+            for color in self.layer_colors:
+                layers.append(canvas.canvas.create_rectangle(0, 0, 0, 0, fill=color, outline=color, state="hidden"))
+            self.bars.append(layers)
+        self._update_bars()
+
+    def _update_bars(self):
+        updates = self.canvas.updates
         for bar, vals in self.data_source().items():
             bar_index = self.bar_names.index(bar)
             start = self.x_px + self.x_frac + (3*bar_index*self.x_frac)
             end = self.x_px + (3*self.x_frac*(bar_index + 1))
-            layers = []
             sum_height = 0
-            # Create layers of bars
             for i in range(len(vals)):
+                rect = self.bars[bar_index][i]
                 if vals[i] == 0:
+                    updates.show(rect, False)
                     continue
-                p1 = (start, self.y_floor - int(self.bar_h*sum_height / self.max_height))
-                p2 = (end, self.y_floor - int(self.bar_h*(sum_height + vals[i]) / self.max_height))
-                color = self.layer_colors[i]
-                rect = self.canvas.canvas.create_rectangle(p1, p2, fill=color, outline=color)
-                layers.append(rect)
+                y1 = self.y_floor - int(self.bar_h*sum_height / self.max_height)
+                y2 = self.y_floor - int(self.bar_h*(sum_height + vals[i]) / self.max_height)
+                updates.coords(rect, start, y1, end, y2)
+                updates.show(rect, True)
                 sum_height += vals[i]
-            self.bars.append(layers)
+
+    # Bar graphs stay in place when the map moves
+    def reproject(self):
+        pass
 
     def step(self, time: float):
-        for layers in self.bars:
-            for l in layers:
-                self.canvas.canvas.delete(l)
-        self._draw_bars()
+        self._update_bars()
 
 
 class PieChart:
-    cached_time_index = -9
     cached_level_index = -9
 
     def __init__(self, node: str, cargo: CargoData, lat, lon):
         self.node = node
-        self.levels = cargo.levels[node]
+        self.times = cargo.levels[node].times
+        self.levels = cargo.levels[node].levels
+        self.time_index = TimeIndex(self.times)
         self.maximums = dict(cargo.maximums[node])
         self.lat = lat
         self.lon = lon
@@ -147,25 +189,11 @@ class PieChart:
         self.pie_names = params["pies"]
         self.colors = params["colors"]
 
-    # Calculate index of move at give time
+    # Calculate index of levels at give time
     def _index_at_time(self, time: float) -> int:
-        if time < self.levels[0].time:
-            return 0
-        if time >= self.levels[-1].time:
-            return len(self.levels) - 1
-        if self.cached_time_index > 0:
-            if time > self.levels[self.cached_time_index].time:
-                if time < self.levels[self.cached_time_index + 1].time:
-                    return self.cached_time_index
-        i = 0
-        while i < len(self.levels) - 1:
-            if time == self.levels[i].time:
-                break
-            if time > self.levels[i].time and time < self.levels[i + 1].time:
-                break
-            i += 1
-        return i
+        return max(self.time_index.index_at(time), 0)
 
+    # Get levels of each cargo type at a given time, in order of maximums
     def get_level_at(self, time):
         index = self._index_at_time(time)
         if index == self.cached_level_index:
@@ -175,39 +203,51 @@ class PieChart:
         self.cached_level = level
         return level
 
-    def draw_pies(self, level):
-        self.canvas_pies = []
-        i = 0
-        for m in self.maximums:
-            p1 = (self.pie_x0 + self.pie_r * (3 * i - 1), self.pie_y - self.pie_r)
-            p2 = (self.pie_x0 + self.pie_r * (3 * i + 1), self.pie_y + self.pie_r)
-            if level.levels[m] == 0:
-                pass
-            elif level.levels[m] == self.maximums[m]:
-                self.canvas_pies.append(self.canvas.canvas.create_oval(p1, p2, fill=self.colors[m], outline=self.colors[m]))
+    def _update_pies(self, level):
+        updates = self.canvas.updates
+        for i, m in enumerate(self.maximums):
+            full, arc, text = self.canvas_pies[i]
+            if level[i] == 0:
+                updates.show(full, False)
+                updates.show(arc, False)
+            elif level[i] == self.maximums[m]:
+                updates.show(full, True)
+                updates.show(arc, False)
             else:
-                extent = 360 * level.levels[m] / self.maximums[m]
-                self.canvas_pies.append(self.canvas.canvas.create_arc(p1, p2, start=0, extent=extent, fill=self.colors[m], outline=self.colors[m]))
-            p = (self.pie_x0 + self.pie_r * 3 * i, self.pie_y)
-            self.canvas_pies.append(self.canvas.canvas.create_text(p, text=int(level.levels[m]), fill=self.canvas.style.bg))
-            i += 1
+                updates.config(arc, extent=360 * level[i] / self.maximums[m])
+                updates.show(full, False)
+                updates.show(arc, True)
+            updates.config(text, text=int(level[i]))
+
+    # Create a canvas item at coordinates relative to the chart's anchor, so it
+    # moves with the anchor
+    def _create(self, create, *coords, **options) -> int:
+        coords = [c for p in coords for c in p]
+        item = create(*self._place(coords), **options)
+        self.placed.append((item, coords))
+        return item
+
+    def _place(self, coords: list[float]) -> list[float]:
+        return [c + (self.y_px if i % 2 else self.x_px) for i, c in enumerate(coords)]
 
     def display(self, canvas: MapCanvas):
         self.canvas = canvas
         self.x_px, self.y_px = canvas.coord.calc_px(self.lat, self.lon)
+        self.placed = []
         # Draw line to base
         self.canvas_line = canvas.canvas.create_line((self.x_px, self.y_px), canvas.get_named_px(self.node), fill=canvas.style.text, width=canvas.style.line_width)
 
+        create = canvas.canvas
         self.pie_r = 4*canvas.style.font_px
         self.w_px = self.pie_r * len(self.maximums) * 3
         self.h_px = self.pie_r * 3 + 3*canvas.style.font_px
-        p1 = (self.x_px - self.w_px/2, self.y_px - self.h_px/2)
-        p2 = (self.x_px + self.w_px/2, self.y_px + self.h_px/2)
-        self.bg = canvas.canvas.create_rectangle(p1, p2, fill=canvas.style.bg, outline=canvas.style.text)
-        self.title_item = canvas.canvas.create_text(self.x_px, self.y_px + canvas.style.font_px * 2 - self.h_px/2, text=self.title, fill=canvas.style.text)
+        p1 = (-self.w_px/2, -self.h_px/2)
+        p2 = (self.w_px/2, self.h_px/2)
+        self.bg = self._create(create.create_rectangle, p1, p2, fill=canvas.style.bg, outline=canvas.style.text)
+        self.title_item = self._create(create.create_text, (0, canvas.style.font_px * 2 - self.h_px/2), text=self.title, fill=canvas.style.text)
         # Create pies
-        self.pie_x0 = self.x_px + int(self.pie_r * 1.5 - self.w_px/2)
-        self.pie_y = self.y_px + 2 * canvas.style.font_px + int(self.pie_r * 1.5 - self.h_px/2)
+        self.pie_x0 = int(self.pie_r * 1.5 - self.w_px/2)
+        self.pie_y = 2 * canvas.style.font_px + int(self.pie_r * 1.5 - self.h_px/2)
         self.pie_backs = []
         self.pie_labels = []
         i = 0
@@ -215,16 +255,118 @@ class PieChart:
             # Create chart backgrounds
             p1 = (self.pie_x0 + self.pie_r * (3 * i - 1) - canvas.coord.scale, self.pie_y - self.pie_r - canvas.coord.scale)
             p2 = (self.pie_x0 + self.pie_r * (3 * i + 1) + canvas.coord.scale, self.pie_y + self.pie_r + canvas.coord.scale)
-            self.pie_backs.append(canvas.canvas.create_oval(p1, p2, fill=canvas.style.text, outline=canvas.style.text))
+            self.pie_backs.append(self._create(create.create_oval, p1, p2, fill=canvas.style.text, outline=canvas.style.text))
             # Create chart labels
-            self.pie_labels.append(canvas.canvas.create_text(self.pie_x0 + self.pie_r * 3 * i, self.y_px + self.h_px/2 - canvas.style.font_px * 2, text=self.pie_names[m], fill=canvas.style.text))
+            self.pie_labels.append(self._create(create.create_text, (self.pie_x0 + self.pie_r * 3 * i, self.h_px/2 - canvas.style.font_px * 2), text=self.pie_names[m], fill=canvas.style.text))
             i += 1
-        level = self.get_level_at(0)
-        self.draw_pies(level)
+        # Create pies as a full circle or partial arc, shown depending on level
+        self.canvas_pies = []
+        i = 0
+        for m in self.maximums:
+            p1 = (self.pie_x0 + self.pie_r * (3 * i - 1), self.pie_y - self.pie_r)
+            p2 = (self.pie_x0 + self.pie_r * (3 * i + 1), self.pie_y + self.pie_r)
+            full = self._create(create.create_oval, p1, p2, fill=self.colors[m], outline=self.colors[m], state="hidden")
+            arc = self._create(create.create_arc, p1, p2, start=0, extent=0, fill=self.colors[m], outline=self.colors[m], state="hidden")
+            text = self._create(create.create_text, (self.pie_x0 + self.pie_r * 3 * i, self.pie_y), text="", fill=canvas.style.bg)
+            self.canvas_pies.append((full, arc, text))
+            i += 1
+        self._update_pies(self.get_level_at(0))
+
+    # Move chart to its location in the current view, it may be partly or
+    # completely off the canvas, the line to its node is hidden if the node is
+    def reproject(self):
+        self.x_px, self.y_px = self.canvas.coord.calc_px(self.lat, self.lon, clip=False)
+        for item, coords in self.placed:
+            self.canvas.updates.coords(item, *self._place(coords))
+        node = self.canvas.get_named_px(self.node)
+        if node:
+            self.canvas.updates.coords(self.canvas_line, self.x_px, self.y_px, *node)
+        self.canvas.updates.show(self.canvas_line, node is not None)
 
     def step(self, time: float):
-        level = self.get_level_at(time)
-        for p in self.canvas_pies:
-            self.canvas.canvas.delete(p)
-        self.draw_pies(level)
+        self._update_pies(self.get_level_at(time))
+
+
+
+# On map frame rate and timing statistics, shown or hidden with toggle
+class TelemetryOverlay:
+    shown = False
+    interval = 0.25 # Seconds between text updates
+    last_update = None
+
+    def __init__(self, telemetry: FrameTelemetry, shown: bool = False):
+        self.telemetry = telemetry
+        self.shown = shown
+
+    def display(self, canvas: MapCanvas):
+        self.canvas = canvas
+        self.x_px, self.y_px = canvas.coord.calc_percent_px(99, 5)
+        self.w_px = canvas.style.font_px * 24
+        self.line_h = canvas.style.font_px * 2
+        state = "normal" if self.shown else "hidden"
+        self.bg = canvas.canvas.create_rectangle(self.x_px - self.w_px, self.y_px, self.x_px, self.y_px, fill=canvas.style.bg, outline=canvas.style.text, state=state)
+        self.text = canvas.canvas.create_text(self.x_px - self.w_px + canvas.style.font_px, self.y_px + canvas.style.font_px, text="", fill=canvas.style.text, anchor=tkinter.NW, state=state)
+
+    def toggle(self):
+        self.shown = not self.shown
+        self.canvas.updates.show(self.bg, self.shown)
+        self.canvas.updates.show(self.text, self.shown)
+        self.last_update = None
+
+    def get_text(self) -> list[str]:
+        lines = ["FPS %.1f" % self.telemetry.get_fps()]
+        lines.append("Frame " + " ".join("p%d %.1f" % p for p in zip(TELEMETRY_PERCENTILES, self.telemetry.get_percentiles())) + " ms")
+        lines.append("Items %d" % len(self.canvas.canvas.find_all()))
+        for stage, ms in self.telemetry.get_stage_means().items():
+            lines.append("%s %.2f ms" % (stage, ms))
+        return lines
+
+    def step(self, time: float):
+        if not self.shown:
+            return
+        # Limit updates, counting items and formatting text isn't free
+        now = self.telemetry.now()
+        if self.last_update is not None and now - self.last_update < self.interval:
+            return
+        self.last_update = now
+        lines = self.get_text()
+        self.canvas.updates.config(self.text, text="\n".join(lines))
+        self.canvas.updates.coords(self.bg, self.x_px - self.w_px, self.y_px, self.x_px, self.y_px + self.line_h * (len(lines) + 1))
+
+
+# Tooltip describing a map item, next to its pixel location
+class InspectTooltip:
+    shown = False
+
+    def display(self, canvas: MapCanvas):
+        self.canvas = canvas
+        self.pad = canvas.style.font_px
+        self.line_h = canvas.style.font_px * 1.7
+        self.char_w = canvas.style.font_px * 0.8
+        self.bg = canvas.canvas.create_rectangle(0, 0, 0, 0, fill=canvas.style.bg, outline=canvas.style.text, state="hidden")
+        self.text = canvas.canvas.create_text(0, 0, text="", fill=canvas.style.text, anchor=tkinter.NW, state="hidden")
+
+    # Show lines of text beside a pixel location, flipped to the other side
+    # when they would go off the canvas
+    def show(self, lines: list[str], loc: tuple[int, int]):
+        w = self.char_w * max(len(l) for l in lines) + self.pad * 2
+        h = self.line_h * len(lines) + self.pad * 2
+        offset = self.canvas.style.vehicle_radius * 2
+        x = loc[0] + offset
+        if x + w > self.canvas.coord.px_width_full:
+            x = loc[0] - offset - w
+        y = loc[1] + offset
+        if y + h > self.canvas.coord.px_height_full:
+            y = loc[1] - offset - h
+        self.canvas.updates.config(self.text, text="\n".join(lines))
+        self.canvas.updates.coords(self.bg, x, y, x + w, y + h)
+        self.canvas.updates.coords(self.text, x + self.pad, y + self.pad)
+        self._show(True)
+
+    def hide(self):
+        self._show(False)
 
+    def _show(self, shown: bool):
+        self.shown = shown
+        self.canvas.updates.show(self.bg, shown)
+        self.canvas.updates.show(self.text, shown)
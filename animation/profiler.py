@@ -0,0 +1,96 @@
+import io
+import sys
+import pstats
+import cProfile
+from time import perf_counter
+from contextlib import contextmanager
+
+
+PROFILE_TOP = 15 # Functions listed per phase in hotspot reports
+PROFILE_MIN_SECONDS = 0.01 # Phases spending less time outside nested phases are left out of hotspots
+
+
+# Timings of named startup phases, with optional cProfile hotspots of each phase.
+# Phases can be nested, each phase's hotspots only include time outside of its
+# nested phases.
+class StartupProfiler:
+    enabled = False
+    hotspots = False
+    report_file = None
+    reported = False
+
+    def __init__(self):
+        self.created = perf_counter()
+        self.phases = [] # [name, depth, seconds (start time until stopped), profile]
+        self.stack = []
+
+    # Enable reporting, to a file or stdout, and cProfile for phases starting after this
+    def enable(self, hotspots: bool = False, report_file: str = None):
+        self.enabled = True
+        self.hotspots = hotspots
+        self.report_file = report_file
+
+    # Collect cProfile hotspots of phases starting after this, before
+    # arguments are parsed (so imports can be profiled). They're only reported
+    # once enabled.
+    def collect_hotspots(self, hotspots: bool = True):
+        self.hotspots = hotspots
+
+    # Start a phase, ended by the next call to stop
+    def start(self, name: str):
+        entry = [name, len(self.stack), perf_counter(), None]
+        self.phases.append(entry)
+        if self.hotspots:
+            # Only one profile can be active, pause the outer phase's
+            if self.stack and self.stack[-1][3]:
+                self.stack[-1][3].disable()
+            entry[3] = cProfile.Profile()
+            entry[3].enable()
+        self.stack.append(entry)
+
+    # End the most recently started phase
+    def stop(self):
+        entry = self.stack.pop()
+        if entry[3]:
+            entry[3].disable()
+            if self.stack and self.stack[-1][3]:
+                self.stack[-1][3].enable()
+        entry[2] = perf_counter() - entry[2]
+
+    @contextmanager
+    def phase(self, name: str):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def get_report(self) -> str:
+        out = io.StringIO()
+        out.write("Startup profile (%.3f s since start)\n" % (perf_counter() - self.created))
+        for name, depth, seconds, profile in self.phases:
+            out.write("%-40s %8.3f s\n" % ("  " * (depth + 1) + name, seconds))
+        for name, depth, seconds, profile in self.phases:
+            if not profile:
+                continue
+            stats = pstats.Stats(profile, stream=out)
+            if stats.total_tt < PROFILE_MIN_SECONDS:
+                continue
+            out.write("\nHotspots in '%s' (%.3f s)\n" % (name, seconds))
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        return out.getvalue()
+
+    # Write report once, when enabled
+    def finish(self):
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        if self.report_file:
+            with open(self.report_file, "w") as f:
+                f.write(self.get_report())
+            print("Wrote startup profile (%s)" % self.report_file)
+        else:
+            sys.stdout.write(self.get_report())
+
+
+PROFILER = StartupProfiler()
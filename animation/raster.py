@@ -0,0 +1,249 @@
+import os
+import re
+import glob
+from PIL import Image, ImageDraw, ImageFont
+
+from animation.canvas import MapCanvas, CanvasUpdates, WorldStyle, MAP_SCALES
+
+
+RASTER_FONT_SIZE = 9 # Font size in points, matching the usual Tk default
+RASTER_MIN_FONT_PX = 6 # Smallest text drawn, in pixels
+TEXT_ANCHORS = {
+        "center": "mm",
+        "n": "mt",
+        "s": "mb",
+        "e": "rm",
+        "w": "lm",
+        "ne": "rt",
+        "nw": "lt",
+        "se": "rb",
+        "sw": "lb",
+    }
+
+
+# Flatten nested coordinate tuples, as Tk canvas item methods accept them
+def _flatten(values) -> list[float]:
+    ret = []
+    for v in values:
+        if isinstance(v, (tuple, list)):
+            ret.extend(_flatten(v))
+        else:
+            ret.append(float(v))
+    return ret
+
+# Get bounding box with corners in order, Tk accepts either order
+def _bbox(coords: list[float]) -> tuple[float, float, float, float]:
+    (x1, y1, x2, y2) = coords[:4]
+    return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+
+# Offscreen canvas drawn with Pillow, supporting the subset of the Tk canvas
+# interface used by map items
+class RasterCanvas:
+    def __init__(self, width: int, height: int, bg: str = "black", font_px: int = 12):
+        self.width = width
+        self.height = height
+        self.bg = bg
+        self.font = ImageFont.load_default(size=font_px)
+        self.items = {}
+        self.next_id = 1
+        # Items which have changed since being created, and an image of all
+        # items drawn before the first changed one (usually the map, nodes,
+        # and legs)
+        self.changed = set()
+        self.base = None
+        self.base_items = set()
+
+    def _create(self, kind: str, coords, options: dict) -> int:
+        item = self.next_id
+        self.next_id += 1
+        self.items[item] = [kind, _flatten(coords), dict(options)]
+        return item
+
+    # Mark an item as changed, dropping the base image if it contains it
+    def _change(self, item: int):
+        self.changed.add(item)
+        if item in self.base_items:
+            self.base = None
+
+    def create_line(self, *coords, **options) -> int:
+        return self._create("line", coords, options)
+
+    def create_oval(self, *coords, **options) -> int:
+        return self._create("oval", coords, options)
+
+    def create_rectangle(self, *coords, **options) -> int:
+        return self._create("rectangle", coords, options)
+
+    def create_arc(self, *coords, **options) -> int:
+        return self._create("arc", coords, options)
+
+    def create_text(self, *coords, **options) -> int:
+        return self._create("text", coords, options)
+
+    def create_image(self, *coords, **options) -> int:
+        return self._create("image", coords, options)
+
+    def coords(self, item: int, *coords):
+        if not coords:
+            return list(self.items[item][1])
+        self.items[item][1] = _flatten(coords)
+        self._change(item)
+
+    def itemconfig(self, item: int, cnf: dict = None, **options):
+        if cnf:
+            options.update(cnf)
+        self.items[item][2].update(options)
+        self._change(item)
+
+    # Move an item to be drawn just before another, items are drawn in the
+    # order of the items dict
+    def tag_lower(self, item: int, below: int):
+        items = {}
+        for i, values in self.items.items():
+            if i == below:
+                items[item] = self.items[item]
+            if i != item:
+                items[i] = values
+        self.items = items
+        self._change(item)
+        if below in self.base_items:
+            self.base = None
+
+    def find_all(self) -> tuple[int, ...]:
+        return tuple(self.items)
+
+    def delete(self, *items):
+        for item in items:
+            if item in self.items:
+                del self.items[item]
+                self._change(item)
+
+    # Draw one item onto an image
+    def _draw_item(self, img: Image.Image, draw: ImageDraw.ImageDraw, kind: str, coords: list[float], options: dict):
+        if options.get("state") == "hidden":
+            return
+        fill = options.get("fill") or None
+        if kind == "line":
+            draw.line(coords, fill=fill or "black", width=max(1, round(float(options.get("width", 1)))))
+        elif kind == "oval":
+            draw.ellipse(_bbox(coords), fill=fill, outline=options.get("outline", "black") or None)
+        elif kind == "rectangle":
+            draw.rectangle(_bbox(coords), fill=fill, outline=options.get("outline", "black") or None)
+        elif kind == "arc":
+            # Tk angles go counterclockwise, Pillow angles go clockwise
+            start = float(options.get("start", 0))
+            extent = float(options.get("extent", 90))
+            if extent == 0:
+                return
+            draw.pieslice(_bbox(coords), -(start + extent), -start, fill=fill, outline=options.get("outline", "black") or None)
+        elif kind == "text":
+            anchor = TEXT_ANCHORS[options.get("anchor", "center")]
+            text = str(options.get("text", ""))
+            if not "\n" in text:
+                draw.text(coords[:2], text, fill=fill or "black", font=self.font, anchor=anchor)
+                return
+            # Pillow can only anchor multiline text by its first line, so
+            # position it from the size of all lines
+            (left, top, right, bottom) = draw.multiline_textbbox((0, 0), text, font=self.font, anchor="la")
+            x = coords[0] - left - (right - left) * "lmr".index(anchor[0]) / 2
+            y = coords[1] - top - (bottom - top) * "tmb".index(anchor[1]) / 2
+            draw.multiline_text((x, y), text, fill=fill or "black", font=self.font, anchor="la")
+        elif kind == "image":
+            image = options["image"]
+            (x, y) = coords[:2]
+            anchor = options.get("anchor", "center")
+            if anchor != "nw":
+                x -= image.width / 2
+                y -= image.height / 2
+            img.paste(image, (int(x), int(y)), image if image.mode == "RGBA" else None)
+
+    def _draw_items(self, img: Image.Image, items: list[int]):
+        draw = ImageDraw.Draw(img)
+        for item in items:
+            self._draw_item(img, draw, *self.items[item])
+
+    # Render all items to an image
+    def render(self) -> Image.Image:
+        if self.base is None:
+            base = []
+            for item in self.items:
+                if item in self.changed:
+                    break
+                base.append(item)
+            self.base_items = set(base)
+            self.base = Image.new("RGB", (self.width, self.height), self.bg)
+            self._draw_items(self.base, base)
+        img = self.base.copy()
+        self._draw_items(img, [item for item in self.items if not item in self.base_items])
+        return img
+
+
+# Map canvas drawn offscreen, for rendering without a display
+class RasterMapCanvas(MapCanvas):
+    # Load an image file for canvas items, each file is only loaded once
+    def load_image(self, file: str):
+        if not file in self.images:
+            self.images[file] = Image.open(file).convert("RGBA")
+        return self.images[file]
+
+    # Tiles are drawn as Pillow images
+    def make_image(self, img):
+        return img
+
+    def get_font_size(self) -> int:
+        return RASTER_FONT_SIZE
+
+    # Set size of the canvas. Map images are resized to any size, so below the
+    # smallest map scale the map is fitted to the canvas, and item sizes
+    # shrink with it so panels and charts keep their place on it (Tk can't
+    # draw there without tiles, and its text doesn't follow font_px).
+    def set_px(self, max_width: int, max_height: int):
+        try:
+            super().set_px(max_width, max_height)
+        except ValueError:
+            self.coord.set_px(max_width, max_height, True)
+        smallest = MAP_SCALES[-1][0]
+        if self.coord.px_width < smallest:
+            self.coord.scale = self.coord.px_width / smallest
+
+    # Load background map at a given size, scaling the closest available map
+    # image if there isn't one of that size
+    def load_map(self, w: int, h: int) -> Image.Image:
+        file = self.style.get_map_file(w, h)
+        if os.path.exists(file):
+            return Image.open(file).convert("RGB")
+        sizes = []
+        for f in glob.glob(re.sub(r"\d+x\d+\.png$", "*x*.png", file)):
+            match = re.search(r"_(\d+)x(\d+)\.png$", f)
+            if match:
+                sizes.append((int(match.group(1)), f))
+        if not sizes:
+            raise ValueError("No map images for style '%s'" % self.style.map)
+        sizes.sort()
+        larger = [s for s in sizes if s[0] >= w]
+        file = larger[0][1] if larger else sizes[-1][1]
+        return Image.open(file).convert("RGB").resize((w, h), Image.LANCZOS)
+
+    def display(self, parent=None, verbose: bool = False):
+        if not self.style:
+            self.style = WorldStyle(None)
+        self.style.set_px(self)
+        # Tk font sizes are in points, Pillow's are in pixels
+        self.canvas = RasterCanvas(self.coord.px_width_full, self.coord.px_height_full, "black", max(RASTER_MIN_FONT_PX, round(self.style.font_px * 4 / 3)))
+        self.updates = CanvasUpdates(self.canvas)
+        if self.has_tiles():
+            self.add_tile_items()
+            self.show_tiles()
+        else:
+            img_width = self.coord.px_width * self.coord.zoom
+            img_height = self.coord.px_height * self.coord.zoom
+            self.bg_img = self.load_map(img_width, img_height)
+            self.bg_item = self.canvas.create_image(self.coord.calc_world_offset_px(), image=self.bg_img, anchor="nw")
+        if verbose:
+            self.print_center()
+
+    # Render current canvas contents to an image
+    def render(self) -> Image.Image:
+        self.updates.flush()
+        return self.canvas.render()
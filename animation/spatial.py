@@ -0,0 +1,139 @@
+import numpy as np
+
+
+SPATIAL_CELL_PX = 32 # Width and height of grid cells in pixels
+
+
+# Uniform grid over canvas pixels, for finding the map item nearest a pixel
+# location without checking every item. Items are points or line segments,
+# indexed by every cell they pass through, and can be moved one at a time.
+# Lookups only check cells within the search radius, so take about constant
+# time however many items there are.
+class SpatialGrid:
+    def __init__(self, cell: int = SPATIAL_CELL_PX):
+        self.cell = cell
+        self.cells = {} # (col, row) -> set of item keys
+        self.items = {} # key -> (x1, y1, x2, y2), points have both ends the same
+        self.item_cells = {} # key -> cells the item is in
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key) -> bool:
+        return key in self.items
+
+    def clear(self):
+        self.cells = {}
+        self.items = {}
+        self.item_cells = {}
+
+    # Add or move a point, None removes it. Points staying in the same cell
+    # only have their location updated.
+    def move(self, key, loc: tuple[float, float]):
+        if loc is None:
+            self.remove(key)
+            return
+        (x, y) = loc
+        # Float cells hash the same as int cells, so aren't converted
+        cells = ((x // self.cell, y // self.cell),)
+        if self.item_cells.get(key) != cells:
+            self.remove(key)
+            self._insert(key, cells)
+        self.items[key] = (x, y, x, y)
+
+    # Add or move a line segment between two pixel locations
+    def add_segment(self, key, p1: tuple[float, float], p2: tuple[float, float]):
+        self.remove(key)
+        self._insert(key, self._segment_cells(*p1, *p2))
+        self.items[key] = (*p1, *p2)
+
+    def remove(self, key):
+        cells = self.item_cells.pop(key, None)
+        if cells is None:
+            return
+        del self.items[key]
+        for c in cells:
+            keys = self.cells[c]
+            keys.discard(key)
+            if not keys:
+                del self.cells[c]
+
+    def _insert(self, key, cells: tuple):
+        self.item_cells[key] = cells
+        for c in cells:
+            if c in self.cells:
+                self.cells[c].add(key)
+            else:
+                self.cells[c] = {key}
+
+    # Get cells a line segment passes through, a column at a time
+    def _segment_cells(self, x1: float, y1: float, x2: float, y2: float) -> tuple:
+        if x2 < x1:
+            (x1, y1, x2, y2) = (x2, y2, x1, y1)
+        cells = []
+        for col in range(int(x1 // self.cell), int(x2 // self.cell) + 1):
+            # Part of the segment inside the column
+            left = max(x1, col * self.cell)
+            right = min(x2, (col + 1) * self.cell)
+            if x1 == x2:
+                (top, bottom) = (y1, y2)
+            else:
+                top = y1 + (left - x1) * (y2 - y1) / (x2 - x1)
+                bottom = y1 + (right - x1) * (y2 - y1) / (x2 - x1)
+            for row in range(int(min(top, bottom) // self.cell), int(max(top, bottom) // self.cell) + 1):
+                cells.append((col, row))
+        return tuple(cells)
+
+    # Get key of the item nearest a pixel location, if any are within a radius
+    def nearest(self, x: float, y: float, radius: float):
+        best = None
+        best_dist = radius * radius
+        seen = set()
+        for col in range(int((x - radius) // self.cell), int((x + radius) // self.cell) + 1):
+            for row in range(int((y - radius) // self.cell), int((y + radius) // self.cell) + 1):
+                for key in self.cells.get((col, row), ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    dist = _segment_dist2(x, y, *self.items[key])
+                    if dist < best_dist or (best is None and dist == best_dist):
+                        best = key
+                        best_dist = dist
+        return best
+
+
+# Get squared distance from a point to a line segment
+def _segment_dist2(x: float, y: float, x1: float, y1: float, x2: float, y2: float) -> float:
+    (dx, dy) = (x2 - x1, y2 - y1)
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        t = 0
+    else:
+        t = min(max(((x - x1) * dx + (y - y1) * dy) / length2, 0), 1)
+    (px, py) = (x1 + t * dx - x, y1 + t * dy - y)
+    return px * px + py * py
+
+
+# Get the number of grid cells covering a width and height, including points
+# on the far edges
+def grid_cell_count(width: float, height: float, cell: float) -> int:
+    return (int(width // cell) + 1) * (int(height // cell) + 1)
+
+# Group points by the grid cells they're in, for cells with at least
+# min_count points, keeping only the largest max_groups groups if given.
+# Gives the group of each point (-1 for points not grouped), and the number of
+# points in each group.
+def grid_clusters(x, y, cell: float, min_count: int, max_groups: int = None) -> tuple[np.ndarray, np.ndarray]:
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) == 0:
+        return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    cells = np.column_stack([np.floor(x / cell), np.floor(y / cell)])
+    (uniques, inverse, counts) = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    kept = np.flatnonzero(counts >= min_count)
+    if max_groups is not None and len(kept) > max_groups:
+        kept = kept[np.argsort(-counts[kept], kind="stable")[:max_groups]]
+        kept.sort()
+    groups = np.full(len(counts), -1, dtype=np.int64)
+    groups[kept] = np.arange(len(kept))
+    return (groups[inverse.ravel()], counts[kept])
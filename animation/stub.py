@@ -0,0 +1,56 @@
+from animation.canvas import MapCanvas, CanvasUpdates
+
+
+# Canvas that only counts calls, so drawing can be timed or tested without Tk
+class StubCanvas:
+    def __init__(self):
+        self.next_id = 1
+        self.creates = 0
+        self.updates = 0
+
+    def _create(self, *coords, **options) -> int:
+        self.creates += 1
+        self.next_id += 1
+        return self.next_id - 1
+
+    create_line = _create
+    create_oval = _create
+    create_rectangle = _create
+    create_arc = _create
+    create_text = _create
+    create_image = _create
+
+    def coords(self, item: int, *coords):
+        self.updates += 1
+
+    def itemconfig(self, item: int, cnf: dict = None, **options):
+        self.updates += 1
+
+    def tag_lower(self, item: int, below: int = None):
+        self.updates += 1
+
+    def find_all(self) -> tuple[int, ...]:
+        return tuple(range(1, self.next_id))
+
+    def delete(self, *items):
+        self.updates += 1
+
+
+# Map canvas drawn on a stub canvas, item updates sent to it are kept in
+# updates.sent
+class StubMapCanvas(MapCanvas):
+    def load_image(self, file: str):
+        return None
+
+    def make_image(self, img):
+        return None
+
+    def get_font_size(self) -> int:
+        return 9
+
+    def display(self, parent=None, verbose: bool = False):
+        self.style.set_px(self)
+        self.canvas = StubCanvas()
+        self.updates = CanvasUpdates(self.canvas)
+        if self.has_tiles():
+            self.add_tile_items()
@@ -0,0 +1,57 @@
+import random
+
+
+SYNTHETIC_MODELS = ["C17", "LMSR", "train_US", "truck_US"]
+SYNTHETIC_CARGO_TYPES = ["PAX", "cargo", "out"]
+# Area nodes are placed in, matching the usual map crop (min lat/lon, max lat/lon)
+SYNTHETIC_AREA = (0, -115, 80, 55)
+
+
+# Generate named nodes at random locations, as (name, lat, lon)
+def synthetic_nodes(count: int, seed: int = 0) -> list[tuple[str, float, float]]:
+    rand = random.Random(seed)
+    (min_lat, min_lon, max_lat, max_lon) = SYNTHETIC_AREA
+    nodes = []
+    for i in range(count):
+        nodes.append(("S%04d" % i, rand.uniform(min_lat, max_lat), rand.uniform(min_lon, max_lon)))
+    return nodes
+
+# Generate a movement log in the simulator's format, with vehicles flying
+# between random nodes. Events are split evenly between vehicles, and the given
+# fraction of trips carry cargo (loaded, flown, and unloaded).
+def synthetic_log(nodes: list[str], vehicles: int, events: int, cargo: float = 0.3, seed: int = 0) -> list[dict]:
+    rand = random.Random(seed)
+    log = []
+    for v in range(vehicles):
+        name = "%s %d" % (SYNTHETIC_MODELS[v % len(SYNTHETIC_MODELS)], v // len(SYNTHETIC_MODELS))
+        node = rand.choice(nodes)
+        # Vehicles start at a node at time 0, and leave at a random time
+        log.append(_event(0.0, name, "arriving", node))
+        time = rand.uniform(0, 5)
+        count = 1
+        target = events // vehicles
+        while count + 2 <= target:
+            dest = rand.choice(nodes)
+            if dest == node:
+                continue
+            moved = None
+            if rand.random() < cargo and count + 4 <= target:
+                moved = [{"c_type": rand.choice(SYNTHETIC_CARGO_TYPES), "cargo_moved": float(rand.randint(1, 500))}]
+                log.append(_event(time, name, "loading cargo", node, moved))
+                count += 1
+            time += rand.uniform(0.1, 2)
+            log.append(_event(time, name, "taking off", node, moved))
+            time += rand.uniform(0.5, 5)
+            log.append(_event(time, name, "arriving", dest, moved))
+            count += 2
+            if moved:
+                log.append(_event(time, name, "Unloading cargo", dest, moved))
+                count += 1
+            node = dest
+    # Log is written in simulation time order
+    log.sort(key=lambda e: e["time"])
+    log.insert(0, _event(0, None, "Starting Sim", "Everywhere"))
+    return log
+
+def _event(time: float, vehicle: str, event: str, location: str, cargo: list = None) -> dict:
+    return {"time": time, "Vehicle_name": vehicle, "event": event, "location": location, "Cargo": cargo or "empty"}
@@ -0,0 +1,92 @@
+import os
+import csv
+import json
+from time import perf_counter
+import numpy as np
+
+
+TELEMETRY_WINDOW = 120 # Frames included in live statistics
+TELEMETRY_PERCENTILES = [50, 95, 99]
+
+
+# Per-stage timings of animation frames, timed as laps between stages
+class FrameTelemetry:
+    frame = None
+
+    # Create with wall clock in seconds, keeping every frame if record is set
+    def __init__(self, record: bool = False, now=perf_counter):
+        self.record = record
+        self.now = now
+        self.stages = []
+        self.frames = []
+        self.recent = []
+        self.last_end = None
+
+    # Start timing a frame at a simulation time, time since the last frame
+    # ended is counted as Tk idle time
+    def start_frame(self, time: float):
+        now = self.now()
+        self.frame = {"time": time, "start": now}
+        if self.last_end is not None:
+            self.frame["idle"] = now - self.last_end
+            if not "idle" in self.stages:
+                self.stages.append("idle")
+        self.lap_start = now
+
+    # Count time since the last lap towards a stage
+    def lap(self, stage: str):
+        if self.frame is None:
+            return
+        now = self.now()
+        if not stage in self.stages:
+            self.stages.append(stage)
+        self.frame[stage] = self.frame.get(stage, 0) + now - self.lap_start
+        self.lap_start = now
+
+    def end_frame(self):
+        if self.frame is None:
+            return
+        now = self.now()
+        self.frame["total"] = now - self.frame["start"]
+        self.last_end = now
+        self.recent.append(self.frame)
+        if len(self.recent) > TELEMETRY_WINDOW:
+            del self.recent[0]
+        if self.record:
+            self.frames.append(self.frame)
+        self.frame = None
+
+    # Get frames per second over recent frames
+    def get_fps(self) -> float:
+        if len(self.recent) < 2:
+            return 0.0
+        elapsed = self.recent[-1]["start"] - self.recent[0]["start"]
+        return (len(self.recent) - 1) / elapsed if elapsed > 0 else 0.0
+
+    # Get percentiles of recent frame times in milliseconds
+    def get_percentiles(self, stage: str = "total") -> list[float]:
+        values = [f.get(stage, 0) * 1000 for f in self.recent]
+        if not values:
+            return [0.0] * len(TELEMETRY_PERCENTILES)
+        return np.percentile(values, TELEMETRY_PERCENTILES).tolist()
+
+    # Get mean time in milliseconds of each stage over recent frames
+    def get_stage_means(self) -> dict[str, float]:
+        count = max(len(self.recent), 1)
+        return {s: sum(f.get(s, 0) for f in self.recent) * 1000 / count for s in self.stages}
+
+    # Write recorded frames to a CSV or JSON file, by file extension
+    def dump(self, filename: str):
+        columns = ["time", "total"] + self.stages
+        if os.path.splitext(filename)[1].lower() == ".json":
+            with open(filename, "w") as f:
+                json.dump({
+                        "stages": self.stages,
+                        "frames": [{c: f[c] for c in columns if c in f} for f in self.frames],
+                    }, f, indent=1)
+            return
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame"] + columns)
+            for i, frame in enumerate(self.frames):
+                writer.writerow([i] + [frame.get(c, "") for c in columns])
@@ -0,0 +1,248 @@
+import pytest
+import numpy as np
+from PIL import Image
+from canvas import *
+from tiles import TileLayer, make_tiles
+from animation.data import LocationsData, RoutingData, CargoData
+from animation.cache import ParsedLog
+from animation.synthetic import synthetic_nodes, synthetic_log
+from animation.stub import StubMapCanvas
+from animation.raster import RasterCanvas, RasterMapCanvas
+from animation.window import WorldMap
+
+
+def make_coord() -> WorldCoordinates:
+    coord = WorldCoordinates(-5, -120, 2)
+    coord.set_px(960, 540, True)
+    return coord
+
+# Map of a synthetic log drawn on a stub canvas, with tiles so it can zoom
+def make_world(tmp_path, clusters: bool = False) -> WorldMap:
+    nodes = synthetic_nodes(20, 1)
+    log = synthetic_log([n[0] for n in nodes], 30, 1000, 0.5, 1)
+    parsed = ParsedLog()
+    for name, lat, lon in nodes:
+        node = LocationsData.Node()
+        node.name = name
+        node.lat = lat
+        node.lon = lon
+        parsed.locations.nodes.append(node)
+    parsed.routing = RoutingData.from_object(log)
+    parsed.cargo = CargoData.from_object(log)
+    world = WorldMap(None, parsed)
+    world.canvas = StubMapCanvas()
+    world.crop(-5, -120)
+    world.style("dark", False)
+    source = str(tmp_path / "map_2000x1000.png")
+    Image.new("RGB", (2000, 1000)).save(source)
+    make_tiles(source, str(tmp_path / "tiles"))
+    world.canvas.tiles = TileLayer(str(tmp_path / "tiles"))
+    for name, lat, lon in nodes[:4]:
+        world.add_cargo_piechart(name, lat, lon)
+    world.add_vehicle_clusters(clusters)
+    world.display(None, 960, 540)
+    return world
+
+
+def test_zoom_at():
+    coord = make_coord()
+    (lats, lons) = coord.calc_latlon_array([300, 700], [200, 400], clip=False)
+    coord.zoom_at(300, 200, 1.5)
+    assert coord.zoom == 3
+    # Point under the mouse stays in place, others move away from it
+    (x, y) = coord.calc_px_array(lats, lons, clip=False)
+    assert np.allclose([x[0], y[0]], [300, 200])
+    assert np.allclose([x[1], y[1]], [300 + 400 * 1.5, 200 + 200 * 1.5])
+    # Zoom is limited to between the whole world and the largest zoom
+    coord.zoom_at(300, 200, 1000)
+    assert coord.zoom == MAX_ZOOM
+    coord.max_zoom = 5
+    coord.zoom_at(300, 200, 2)
+    assert coord.zoom == 5
+    coord.zoom_at(300, 200, 0.001)
+    assert coord.zoom == 1
+    assert (coord.min_lat, coord.min_lon, coord.max_lat, coord.max_lon) == (-90, -180, 90, 180)
+
+def test_view_in_world():
+    coord = make_coord()
+    coord.set_view(-100, -300, 4)
+    assert (coord.min_lat, coord.min_lon, coord.max_lat, coord.max_lon) == (-90, -180, -45, -90)
+    coord.set_view(80, 170, 4)
+    assert (coord.min_lat, coord.min_lon, coord.max_lat, coord.max_lon) == (45, 90, 90, 180)
+    # Panning stops at the edges of the world
+    for dx, dy in [(5000, 0), (-5000, 0), (0, 5000), (0, -5000), (123, -45)]:
+        coord.pan_px(dx, dy)
+        assert -90 <= coord.min_lat and coord.max_lat <= 90
+        assert -180 <= coord.min_lon and coord.max_lon <= 180
+        assert coord.max_lat - coord.min_lat == pytest.approx(45)
+        assert coord.max_lon - coord.min_lon == pytest.approx(90)
+
+def test_small_screen():
+    coord = make_coord()
+    assert (coord.px_width, coord.px_height, coord.scale) == (960, 480, 1)
+    # Map images are only made at the map scales, so small maps need tiles
+    # (or to be drawn offscreen, where map images are resized)
+    with pytest.raises(ValueError):
+        coord.set_px(960, 540)
+    canvas = StubMapCanvas()
+    canvas.crop(-5, -120)
+    with pytest.raises(ValueError):
+        canvas.set_px(960, 540)
+    canvas.set_px(1920, 1080)
+    assert (canvas.coord.px_width, canvas.coord.px_height) == (1800, 900)
+    canvas = RasterMapCanvas()
+    canvas.crop(-5, -120)
+    canvas.set_px(960, 540)
+    assert (canvas.coord.px_width, canvas.coord.px_height, canvas.coord.scale) == (960, 480, 960 / 1800)
+
+
+# Get coordinates last sent for canvas items
+def sent_coords(world: WorldMap, items: list[int]) -> np.ndarray:
+    return np.array([world.canvas.updates.sent[(item, "coords")] for item in items], dtype=np.float64)
+
+def test_reproject(tmp_path):
+    world = make_world(tmp_path)
+    nodes = [n.canvas_dot for n in world.nodes]
+    legs = [l.canvas_line for l in world.legs]
+    assert len(nodes) == 20 and len(legs) > 0 and len(world.graphs) == 4
+    before = [sent_coords(world, items) for items in [nodes, legs]]
+    anchors = np.array([(g.x_px, g.y_px) for g in world.graphs])
+    creates = world.canvas.canvas.creates
+    # Panning moves every item by the same amount, within rounding
+    world.pan(40, -25)
+    world.draw()
+    for items, old in zip([nodes, legs], before):
+        moved = sent_coords(world, items) - old
+        assert np.abs(moved[:, 0::2] - 40).max() <= 1
+        assert np.abs(moved[:, 1::2] + 25).max() <= 1
+    moved = np.array([(g.x_px, g.y_px) for g in world.graphs]) - anchors
+    assert np.abs(moved - [40, -25]).max() <= 1
+    for g in world.graphs:
+        for item, coords in g.placed:
+            assert world.canvas.updates.sent[(item, "coords")] == tuple(int(c) for c in g._place(coords))
+    # Zooming moves nodes to their new locations, hiding those out of view
+    world.zoom(480, 270, 2)
+    world.draw()
+    for n in world.nodes:
+        loc = world.canvas.get_named_px(n.name)
+        state = world.canvas.updates.sent[(n.canvas_dot, "state")]
+        assert state == ("normal" if loc else "hidden")
+        if loc:
+            r = world.canvas.style.node_radius
+            assert world.canvas.updates.sent[(n.canvas_dot, "coords")] == (loc[0] - r, loc[1] - r, loc[0] + r, loc[1] + r)
+    assert world.canvas.coord.zoom == 4
+    assert sum(world.canvas.get_named_px(n.name) is not None for n in world.nodes) < 20
+    # Items are moved, not created again
+    assert world.canvas.canvas.creates == creates
+
+def test_batch_projection():
+    coord = make_coord()
+    coord.set_view(10, -100, 3)
+    rand = np.random.default_rng(0)
+    lats = rand.uniform(-90, 90, 2000)
+    lons = rand.uniform(-180, 180, 2000)
+    (x, y) = coord.calc_px_array(lats, lons)
+    # Same pixels as projecting one point at a time, NaN outside the view
+    outside = 0
+    for lat, lon, px, py in zip(lats, lons, x, y):
+        try:
+            assert (int(px), int(py)) == coord.calc_px(lat, lon)
+        except ValueError:
+            assert np.isnan(px) and np.isnan(py)
+            outside += 1
+    assert 0 < outside < len(lats)
+    (x, y) = coord.calc_px_array(lats, lons, clip=False)
+    assert not np.isnan(x).any()
+    # Pixels project back to the same latitudes/longitudes
+    (lats2, lons2) = coord.calc_latlon_array(x, y, clip=False)
+    assert np.allclose(lats2, lats) and np.allclose(lons2, lons)
+    (lats2, lons2) = coord.calc_latlon_array(x, y)
+    assert np.array_equal(np.isnan(lats2), np.isnan(coord.calc_px_array(lats, lons)[0]))
+
+def test_named_locs(tmp_path):
+    world = make_world(tmp_path)
+    canvas = world.canvas
+    canvas.add_named_locs(["A", "B", "C"], [10, 20, 89], [-50, 0, 179])
+    assert canvas.get_named_px("A") == canvas.coord.calc_px(10, -50)
+    assert canvas.get_named_px("B_1") == canvas.coord.calc_px(20, 0)
+    # Outside the view
+    assert canvas.get_named_px("C") is None
+    assert canvas.calc_locs([10, 89], [-50, 179]) == [canvas.coord.calc_px(10, -50), None]
+    with pytest.raises(ValueError):
+        canvas.add_named_locs(["D_1"], [0], [0])
+
+def test_hover_while_playing(tmp_path):
+    world = make_world(tmp_path)
+    world.add_inspect()
+    # Find a vehicle about to leave where it is
+    world.time = 0.0
+    world.draw()
+    for t in np.arange(0.5, 20, 0.5):
+        world.time = t
+        world.draw()
+        moving = [i for i, v in enumerate(world.vehicles) if world.fleet.visible[i] and v.current_loc not in world.canvas.named.values()]
+        if moving:
+            break
+    i = moving[0]
+    (x, y) = world.vehicles[i].current_loc
+    world.hover_at(x, y)
+    assert world.hover == ("vehicle", i)
+    # The mouse stays still while the vehicle moves away from it
+    world.time += 3
+    world.draw()
+    assert world.vehicles[i].current_loc != (x, y)
+    assert world.hover != ("vehicle", i)
+    world.hover_at(None, None)
+    assert world.hover is None and world.mouse is None
+
+def test_pinned_cluster(tmp_path):
+    world = make_world(tmp_path, True)
+    world.add_inspect()
+    clusters = world.clusters
+    # Badges are only created once crowds are shown
+    assert clusters.badges == []
+    assert clusters.find(500, 300) is None
+    # Two crowds, the second in an earlier cell than the first once it moves
+    count = len(world.vehicles)
+    x = np.full(count, 500.0)
+    y = np.full(count, 300.0)
+    x[10:20] = 700
+    visible = np.ones(count, dtype=bool)
+    clusters.step(x, y, visible, 2)
+    assert len(clusters.badges) == 2
+    assert clusters.find(500 + clusters.r, 300) == 0
+    assert clusters.find(500 + clusters.r + 1, 300) is None
+    world.click_at(700, 300)
+    assert world.pinned == ("cluster", 10)
+    assert world.get_item_loc(world.pinned) == (700, 300)
+    assert world.get_item_info(world.pinned)[0] == "10 vehicles"
+    x[10:20] = 100
+    clusters.step(x, y, visible, 2)
+    # The pinned cluster follows its vehicles to another badge
+    assert world.get_item_loc(world.pinned) == (100, 300)
+    assert world.get_item_info(world.pinned)[0] == "10 vehicles"
+    # Badges are reused as crowds move
+    creates = world.canvas.canvas.creates
+    x[10:20] = 300
+    clusters.step(x, y, visible, 2)
+    assert world.canvas.canvas.creates == creates
+    assert world.get_item_loc(world.pinned) == (300, 300)
+    # Every crowded cell gets a badge
+    x = np.arange(count) // 4 * clusters.cell % 960
+    y = np.arange(count) // 4 * clusters.cell // 960 * clusters.cell
+    clusters.step(x, y, visible, 2)
+    assert len(clusters.shown) == len(clusters.badges) == count // 4
+    assert not any(v.clustered for v in world.vehicles[count // 4 * 4:])
+
+def test_raster_lower():
+    canvas = RasterCanvas(20, 20)
+    below = canvas.create_rectangle(0, 0, 20, 20, fill="red", outline="")
+    above = canvas.create_rectangle(0, 0, 20, 20, fill="blue", outline="")
+    assert canvas.render().getpixel((10, 10)) == (0, 0, 255)
+    # Items lowered after the base image is drawn are drawn beneath the items above them
+    late = canvas.create_rectangle(0, 0, 20, 20, fill="lime", outline="")
+    assert canvas.render().getpixel((10, 10)) == (0, 255, 0)
+    canvas.tag_lower(late, above)
+    assert canvas.render().getpixel((10, 10)) == (0, 0, 255)
+    canvas.itemconfig(above, state="hidden")
+    assert canvas.render().getpixel((10, 10)) == (0, 255, 0)
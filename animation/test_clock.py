@@ -0,0 +1,106 @@
+import pytest
+import numpy as np
+from clock import *
+
+
+def test_tick_follows_wall_clock(wall):
+    clock = AnimationClock(10.0, speed=16, now=wall)
+    assert clock.tick() == 0.0
+    wall.t += 0.05
+    assert abs(clock.tick() - 0.05 * DAYS_PER_SECOND * 16) < 1e-9
+    # Slow frames skip ahead instead of slowing playback
+    wall.t += 0.2
+    assert abs(clock.tick() - 0.25 * DAYS_PER_SECOND * 16) < 1e-9
+    assert clock.skipped > 0
+
+def test_tick_limits(wall):
+    clock = AnimationClock(1.0, speed=-4, now=wall)
+    clock.tick()
+    wall.t += 0.1
+    assert clock.tick() == 0.0
+    clock.set_speed(16)
+    for i in range(100):
+        wall.t += 0.1
+        clock.tick()
+    assert clock.time == 1.0
+    # Stalls play as a usual frame
+    clock.seek(0.0)
+    wall.t += 60
+    assert clock.tick() == pytest.approx(0.1 * DAYS_PER_SECOND * 16)
+    wall.t += 0.1
+    assert clock.tick() == pytest.approx(0.2 * DAYS_PER_SECOND * 16)
+
+def test_slow_frames(wall):
+    clock = AnimationClock(100.0, speed=1, now=wall)
+    clock.tick()
+    # Frames slower than stalls at first follow the wall clock after a few frames
+    for i in range(20):
+        wall.t += 0.5
+        clock.tick()
+    assert clock.time > 16 * 0.5 * DAYS_PER_SECOND
+    before = clock.time
+    wall.t += 0.5
+    assert clock.tick() == pytest.approx(before + 0.5 * DAYS_PER_SECOND)
+    assert clock.skipped > 16 * 20
+
+def test_pause(wall):
+    clock = AnimationClock(10.0, now=wall)
+    clock.tick()
+    clock.pause()
+    wall.t += 1
+    assert clock.tick() == 0.0
+    clock.set_speed(1)
+    wall.t += 0.01
+    assert abs(clock.tick() - 0.01 * DAYS_PER_SECOND) < 1e-9
+
+def test_delay(wall):
+    clock = AnimationClock(10.0, fps=50, now=wall)
+    clock.tick()
+    assert clock.get_delay() == 20
+    for i in range(50):
+        clock.tick()
+        wall.t += 0.015
+        clock.get_delay()
+    assert clock.get_delay() == 5
+    clock.tick()
+    wall.t += 0.05
+    assert clock.get_delay() == 1
+
+def test_frame_times():
+    times = frame_times(1.0, fps=10, speed=1)
+    assert times[0] == 0.0
+    assert times[-1] == 1.0
+    assert abs(times[1] - DAYS_PER_SECOND / 10) < 1e-9
+    assert len(times) == 51
+    times = frame_times(0.5, fps=1, speed=1)
+    assert times == [0.0, 0.2, 0.4, 0.5]
+
+def test_idle_gaps():
+    busy = np.array([[1.0, 2.0], [4.0, 5.0]])
+    gaps = idle_gaps(busy, np.array([3.0, 4.5]), 8.0)
+    assert gaps.tolist() == [[0.0, 1.0], [2.0, 3.0], [3.0, 4.0], [5.0, 8.0]]
+    assert idle_gaps(np.zeros((0, 2)), np.zeros(0), 2.0).tolist() == [[0.0, 2.0]]
+
+def test_skip_idle(wall):
+    clock = AnimationClock(10.0, speed=1, now=wall)
+    clock.set_idle(np.array([[0.05, 0.1], [1.0, 9.0]]))
+    clock.seek(1.5)
+    lead = IDLE_LEAD_SECONDS * DAYS_PER_SECOND
+    assert abs(clock.tick() - (9.0 - lead)) < 1e-9
+    assert clock.last_skip == (1.0, 9.0)
+    wall.t += 0.01
+    clock.tick()
+    assert clock.last_skip is None
+    # Backwards to the start, short periods aren't skipped
+    clock.set_speed(-1)
+    clock.seek(8.5)
+    wall.t += 0.01
+    assert abs(clock.tick() - (1.0 + lead)) < 1e-9
+    clock.seek(0.08)
+    wall.t += 0.01
+    clock.tick()
+    assert clock.last_skip is None
+    clock.toggle_skip_idle()
+    clock.seek(5.0)
+    wall.t += 0.01
+    assert abs(clock.tick() - (5.0 - 0.01 * DAYS_PER_SECOND)) < 1e-9
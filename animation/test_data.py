@@ -1,6 +1,8 @@
 import pytest
+import os
 import math
 from data import *
+from cache import stamped_hashes, cache_key
 
 # Helper function to compare floats
 def approx_eq_floats(a: float, b: float) -> bool:
@@ -79,3 +81,176 @@ def test_parse_coord_comma():
     a, b = parse_coord("N26°21'34\",E127°46'06\"")
     assert approx_eq_floats(a, 26.3594)
     assert approx_eq_floats(b, 127.7683)
+
+
+# Build routing data from (vehicle, time, location[, event]) tuples
+def make_routing(moves: list[tuple]) -> RoutingData:
+    log = [{"time": 0, "Vehicle_name": None, "event": "Starting Sim", "location": "Everywhere", "Cargo": "empty"}]
+    for m in moves:
+        event = m[3] if len(m) > 3 else "arriving"
+        log.append({"time": m[1], "Vehicle_name": m[0], "event": event, "location": m[2], "Cargo": "empty"})
+    return RoutingData.from_object(log)
+
+def test_get_vehicles_matches_insert_move():
+    moves = [
+            ("C17 0", 1.0, "KFCS"),
+            ("C17 1", 0.5, "KBGR"),
+            ("C17 0", 0.0, "KGRK"),
+            ("C17 0", 1.0, "ETAD"),
+            ("C17 1", 0.5, "ETAR"),
+            ("C17 0", 0.5, "EPKK"),
+        ]
+    expected = {}
+    for vehicle, time, location in moves:
+        if not vehicle in expected:
+            expected[vehicle] = RoutingData.RoutingVehicle(vehicle, "C17")
+        expected[vehicle].insert_move(time, location)
+    vehicles = make_routing(moves).get_vehicles()
+    assert [v.vehicle_id for v in vehicles] == ["C17 0", "C17 1"]
+    for v in vehicles:
+        assert v.model == "C17"
+        assert v.moves == expected[v.vehicle_id].moves
+
+def test_routing_event_view():
+    routing = make_routing([("C17 0", 0.0, "KFCS"), ("truck_US 3", 2.5, "KJAX", "loading cargo")])
+    assert len(routing) == 2
+    events = list(routing)
+    assert [str(e) for e in events] == [str(routing.event_log[0]), str(routing.event_log[1])]
+    assert events[1].vehicle_id == "truck_US 3"
+    assert events[1].vehicle_model == "truck_US"
+    assert events[1].event == "loading cargo"
+    assert events[1].location == "KJAX"
+    assert approx_eq_floats(routing.get_end_time(), 2.5)
+
+def test_get_legs():
+    routing = make_routing([
+            ("C17 0", 0.0, "KFCS"),
+            ("C17 1", 0.0, "KBGR"),
+            ("C17 0", 1.0, "KFCS", "taking off"),
+            ("C17 1", 1.5, "KBGR", "taking off"),
+            ("C17 1", 2.0, "ETAD"),
+            ("C17 0", 2.5, "KBGR"),
+            ("C17 0", 3.0, "KBGR", "loading cargo"),
+            ("C17 0", 3.5, "KBGR", "taking off"),
+            ("C17 0", 4.0, "ETAR"),
+        ])
+    assert routing.get_legs() == [("KBGR", "ETAD"), ("KFCS", "KBGR"), ("KBGR", "ETAR")]
+
+def test_get_legs_invalid():
+    with pytest.raises(ValueError):
+        make_routing([("C17 0", 1.0, "KFCS", "taking off"), ("C17 0", 2.0, "KBGR", "taking off")]).get_legs()
+    with pytest.raises(ValueError):
+        make_routing([("C17 0", 1.0, "KFCS")]).get_legs()
+    with pytest.raises(ValueError):
+        make_routing([("C17 0", 1.0, "KFCS", "refueling")]).get_legs()
+
+
+# Build a cargo log entry
+def cargo_event(time: float, location: str, event: str, c_type: str, quantity: float) -> dict:
+    return {"time": time, "Vehicle_name": "C17 0", "event": event, "location": location, "Cargo": [{"c_type": c_type, "cargo_moved": quantity}]}
+
+def test_cargo_levels():
+    cargo = CargoData.from_object([
+            cargo_event(2.0, "KFCS_1", "taking off", "PAX", 30),
+            cargo_event(1.0, "KBGR", "arriving", "cargo", 5),
+            cargo_event(3.0, "KFCS", "arriving", "PAX", 50),
+            cargo_event(3.5, "KFCS", "Unloading cargo", "out", 10),
+            cargo_event(4.0, "KFCS", "taking off", "out", 10),
+            {"time": 4.0, "Vehicle_name": "C17 0", "event": "arriving", "location": "KFCS", "Cargo": "empty"},
+        ])
+    assert list(cargo.levels) == ["KFCS", "KBGR"]
+    kfcs = cargo.levels["KFCS"]
+    assert list(kfcs.times) == [0.0, 2.0, 3.0, 3.5, 4.0]
+    assert kfcs[0].levels == {"PAX": 30, "cargo": 0, "out": 10}
+    assert kfcs[2].levels == {"PAX": 50, "cargo": 0, "out": 10}
+    assert kfcs[4].levels == {"PAX": 50, "cargo": 0, "out": 0}
+    assert cargo.maximums["KFCS"] == {"PAX": 50, "cargo": 0, "out": 10}
+    assert cargo.maximums["KBGR"] == {"PAX": 0, "cargo": 5, "out": 0}
+
+def test_vehicle_cargo():
+    cargo = CargoData.from_object([
+            cargo_event(1.0, "KFCS", "loading cargo", "PAX", 30),
+            cargo_event(1.5, "KFCS_1", "taking off", "PAX", 30),
+            cargo_event(2.0, "KBGR", "arriving", "PAX", 30),
+            cargo_event(2.5, "KBGR", "taking off", "PAX", 30),
+            cargo_event(3.0, "ETAD", "arriving", "PAX", 30),
+            cargo_event(3.0, "ETAD", "Unloading cargo", "PAX", 30),
+        ])
+    assert list(cargo.vehicles) == ["C17 0"]
+    # Cargo stays aboard through stops until it's unloaded
+    assert cargo.get_vehicle_cargo("C17 0", 0.5) == {"PAX": 0, "cargo": 0, "out": 0}
+    assert cargo.get_vehicle_cargo("C17 0", 1.0)["PAX"] == 30
+    assert cargo.get_vehicle_cargo("C17 0", 2.2)["PAX"] == 30
+    assert cargo.get_vehicle_cargo("C17 0", 3.0)["PAX"] == 0
+    assert cargo.get_vehicle_cargo("C17 1", 2.0) == {}
+
+def test_cargo_unknown_move():
+    with pytest.raises(ValueError):
+        CargoData.from_object([cargo_event(1.0, "KFCS", "refueling", "PAX", 1)])
+
+def test_routing_nodes():
+    routing = make_routing([("C17 0", 0.0, "KFCS"), ("C17 0", 1.0, "KFCS_parking_plane"), ("C17 1", 0.0, "KBGR")])
+    assert routing.location_table == ["KFCS", "KFCS_parking_plane", "KBGR"]
+    assert routing.node_table == ["KFCS", "KBGR"]
+    assert list(routing.location_nodes) == [0, 0, 1]
+
+def test_get_leg_index():
+    routing = make_routing([
+            ("C17 0", 1.0, "KFCS_parking_plane", "taking off"),
+            ("C17 0", 2.0, "KBGR"),
+            ("C17 1", 2.5, "KBGR", "taking off"),
+            ("C17 1", 3.0, "KFCS"),
+            ("C17 0", 3.5, "KBGR", "taking off"),
+            ("C17 0", 4.0, "ETAD"),
+        ])
+    legs = routing.get_leg_index()
+    assert len(legs) == 2
+    assert legs.get_names(0) == ("KFCS", "KBGR")
+    assert legs.get_names(1) == ("KBGR", "ETAD")
+    assert list(legs.counts) == [2, 1]
+    assert list(legs.first_times) == [1.0, 3.5]
+    assert list(legs.last_times) == [3.0, 4.0]
+    directed = routing.get_leg_index(directed=True)
+    assert len(directed) == 3
+    assert list(directed.counts) == [1, 1, 1]
+
+def test_motion_intervals():
+    routing = make_routing([
+            ("C17 0", 0.0, "KFCS"),
+            ("C17 0", 1.0, "KFCS", "taking off"),
+            ("C17 0", 2.0, "KBGR"),
+            ("C17 1", 0.0, "KBGR"),
+            ("C17 1", 1.5, "KBGR", "taking off"),
+            ("C17 1", 3.0, "ETAD"),
+            ("C17 0", 5.0, "KBGR", "taking off"),
+            ("C17 0", 6.0, "ETAD"),
+        ])
+    assert routing.get_motion_intervals().tolist() == [[1.0, 3.0], [5.0, 6.0]]
+
+def test_cargo_change_times():
+    cargo = CargoData.from_object([
+            cargo_event(2.0, "KFCS", "taking off", "PAX", 30),
+            cargo_event(1.0, "KBGR", "arriving", "cargo", 5),
+            cargo_event(3.5, "KFCS", "Unloading cargo", "out", 10),
+            cargo_event(2.0, "KBGR", "taking off", "cargo", 5),
+        ])
+    assert cargo.get_change_times().tolist() == [1.0, 2.0]
+
+def test_stamped_hashes(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    log = tmp_path / "log.pkl"
+    xlsx = tmp_path / "input.xlsx"
+    log.write_bytes(b"log 1")
+    xlsx.write_bytes(b"xlsx")
+    (log_hash, xlsx_hash) = stamped_hashes([str(log), str(xlsx)], cache_dir)
+    assert log_hash == file_hash(str(log))
+    key = cache_key(str(log), str(xlsx), cache_dir)
+    # Files with the same modified time and size aren't hashed again
+    stat = os.stat(log)
+    log.write_bytes(b"log 2")
+    os.utime(log, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert stamped_hashes([str(log)], cache_dir) == [log_hash]
+    assert cache_key(str(log), str(xlsx), cache_dir) == key
+    os.utime(log, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert stamped_hashes([str(log)], cache_dir) == [file_hash(str(log))]
+    assert cache_key(str(log), str(xlsx), cache_dir) != key
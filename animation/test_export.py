@@ -0,0 +1,20 @@
+from PIL import Image, ImageChops, ImageSequence
+from export import AnimationExport
+
+
+def read_gif(path: str) -> list[Image.Image]:
+    return [f.convert("RGB") for f in ImageSequence.Iterator(Image.open(path))]
+
+
+def test_parallel_gif(tmp_path):
+    frames = {}
+    for jobs in [1, 3]:
+        path = str(tmp_path / ("jobs_%d.gif" % jobs))
+        export = AnimationExport("files/simulation_input_planes.xlsx", "files/movement_log_planes.pkl", path, 480, 270, 4, 20)
+        export.set_style("dark", False)
+        assert export.run(jobs) > 3 * jobs
+        frames[jobs] = read_gif(path)
+    # Segments after the first keep their own colors when joined
+    assert len(frames[1]) == len(frames[3])
+    for i, (a, b) in enumerate(zip(frames[1], frames[3])):
+        assert ImageChops.difference(a, b).getbbox() is None, "Frame %d differs" % i
@@ -0,0 +1,106 @@
+import pytest
+import random
+import numpy as np
+from data import RoutingData
+from fleet import *
+
+
+NAMED_PX = {"KFCS": (0, 0), "KBGR": (100, 50), "ETAD": (200, 0), "Nowhere": (np.nan, np.nan)}
+
+def make_fleet() -> FleetState:
+    moves = [
+            ("C17 0", 1.0, "KFCS"), ("C17 0", 2.0, "KFCS"), ("C17 0", 4.0, "KBGR"),
+            ("truck 0", 0.0, "KBGR"), ("truck 0", 2.0, "ETAD_parking"), ("truck 0", 3.0, "ETAD_parking"),
+            ("ship 0", 1.0, "Nowhere"), ("ship 0", 5.0, "Nowhere"),
+        ]
+    log = []
+    for vehicle, time, location in moves:
+        log.append({"time": time, "Vehicle_name": vehicle, "event": "arriving", "location": location, "Cargo": "empty"})
+    routing = RoutingData.from_object(log)
+    node_px = np.array([NAMED_PX[n] for n in routing.node_table], dtype=np.float64)
+    return FleetState(routing, ["Airplane", "Truck", "Ship"], node_px)
+
+def make_random_fleet(rand: random.Random, count: int = 20) -> FleetState:
+    log = []
+    for v in range(count):
+        time = 0.0
+        for i in range(rand.randint(1, 8)):
+            # Repeated times and locations cover equal times and loading
+            time += rand.choice([0.0, 0.5, 1.0])
+            log.append({"time": time, "Vehicle_name": "C17 %d" % v, "event": "arriving", "location": rand.choice(["KFCS", "KBGR", "Nowhere"]), "Cargo": "empty"})
+    routing = RoutingData.from_object(log)
+    node_px = np.array([NAMED_PX[n] for n in routing.node_table], dtype=np.float64)
+    return FleetState(routing, ["Airplane"] * count, node_px)
+
+
+def test_fleet_positions():
+    fleet = make_fleet()
+    fleet.compute(0.5)
+    assert list(fleet.x[:2]) == [0, 125] and list(fleet.y[:2]) == [0, 37]
+    assert list(fleet.visible) == [True, True, False]
+    fleet.compute(3.0)
+    assert (fleet.x[0], fleet.y[0]) == (50, 25)
+    assert (fleet.x[1], fleet.y[1]) == (200, 0)
+
+def test_fleet_usage():
+    fleet = make_fleet()
+    assert fleet.get_usage(1.0) == {"Loading": [1, 1, 0, 0], "Moving": [0, 0, 0, 1], "Done": [0, 0, 0, 0]}
+    assert fleet.get_usage(2.5) == {"Loading": [0, 1, 0, 1], "Moving": [1, 0, 0, 0], "Done": [0, 0, 0, 0]}
+    assert fleet.get_usage(9.0) == {"Loading": [0, 0, 0, 0], "Moving": [0, 0, 0, 0], "Done": [1, 1, 0, 1]}
+
+def test_fleet_changes():
+    fleet = make_fleet()
+    fleet.compute(0.0)
+    assert fleet.get_changes(0.0) == []
+    assert fleet.get_changes(1.0) == [(1, (150, 25))]
+
+def test_fleet_seek():
+    times = [5.0, 0.0, 2.5, 2.5, 9.0, 1.0, 3.0, 0.5]
+    expected = []
+    for t in times:
+        fleet = make_fleet()
+        fleet.compute(t)
+        expected.append((list(fleet.x), list(fleet.y), list(fleet.visible), list(fleet.state)))
+    # Jumping around gives the same state as computing from scratch
+    fleet = make_fleet()
+    fleet.compute(0.0)
+    for t, (x, y, visible, state) in zip(times, expected):
+        before = (fleet.x.copy(), fleet.y.copy(), fleet.visible.copy())
+        changes = fleet.get_changes(t)
+        assert (list(fleet.x), list(fleet.y), list(fleet.visible), list(fleet.state)) == (x, y, visible, state)
+        changed = [i for i in range(fleet.count) if (before[0][i], before[1][i], before[2][i]) != (x[i], y[i], visible[i])]
+        assert [c[0] for c in changes] == changed
+
+def test_usage_counter():
+    fleet = make_fleet()
+    counter = UsageCounter(fleet)
+    times = [0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 4.0, 5.0, 9.0, 4.0, 2.0, 1.0, 0.0, -1.0, 3.5, 1.0]
+    for t in times:
+        assert counter.get_usage(t) == fleet.get_usage(t), t
+
+def test_fleet_scheduler():
+    rand = random.Random(2)
+    fleet = make_random_fleet(rand)
+    full = make_random_fleet(random.Random(2))
+    fleet.compute(0.0)
+    time = 0.0
+    for i in range(300):
+        # Play forwards and backwards in small steps, with some jumps and exact move times
+        time = rand.choice([time + 0.1, time - 0.1, time + 0.05, rand.uniform(-1, 10), rand.randint(0, 16) / 2])
+        before = (fleet.x.copy(), fleet.y.copy(), fleet.visible.copy())
+        # Counting usage in between doesn't change what's reported next
+        if i % 3 == 0:
+            fleet.get_usage(rand.uniform(-1, 10))
+        changes = fleet.get_changes(time)
+        full.compute(time)
+        assert (list(fleet.x), list(fleet.y), list(fleet.visible), list(fleet.state)) == (list(full.x), list(full.y), list(full.visible), list(full.state)), time
+        changed = np.flatnonzero((before[0] != full.x) | (before[1] != full.y) | (before[2] != full.visible))
+        assert [c[0] for c in changes] == list(changed)
+
+def test_usage_counter_random():
+    rand = random.Random(1)
+    fleet = make_random_fleet(rand)
+    counter = UsageCounter(fleet)
+    for i in range(200):
+        t = rand.choice([rand.uniform(-1, 10), rand.randint(0, 16) / 2])
+        assert counter.get_usage(t) == fleet.get_usage(t), t
@@ -0,0 +1,108 @@
+import random
+import numpy as np
+from spatial import *
+
+
+# Find nearest item by checking every item
+def brute_nearest(items: dict, x: float, y: float, radius: float):
+    best = None
+    for key, coords in items.items():
+        dist = ((x - coords[0]) ** 2 + (y - coords[1]) ** 2) if len(coords) == 2 else seg_dist(x, y, *coords)
+        if dist <= radius * radius and (best is None or dist < best[0]):
+            best = (dist, key)
+    return best
+
+def seg_dist(x, y, x1, y1, x2, y2) -> float:
+    # Closest of the ends and the projection onto the line, if it's between them
+    dists = [(x - x1) ** 2 + (y - y1) ** 2, (x - x2) ** 2 + (y - y2) ** 2]
+    t = ((x - x1) * (x2 - x1) + (y - y1) * (y2 - y1)) / ((x2 - x1) ** 2 + (y2 - y1) ** 2)
+    if 0 < t < 1:
+        dists.append((x1 + t * (x2 - x1) - x) ** 2 + (y1 + t * (y2 - y1) - y) ** 2)
+    return min(dists)
+
+
+def test_nearest_point():
+    grid = SpatialGrid(10)
+    grid.move("a", (5, 5))
+    grid.move("b", (25, 5))
+    assert grid.nearest(8, 5, 4) == "a"
+    assert grid.nearest(21, 5, 4) == "b"
+    assert grid.nearest(15, 5, 4) is None
+    # Moving within and between cells
+    grid.move("a", (6, 5))
+    grid.move("b", (45, 40))
+    assert grid.item_cells["b"] == ((4, 4),)
+    assert grid.nearest(24, 5, 4) is None
+    assert grid.nearest(44, 41, 3) == "b"
+    grid.move("b", None)
+    assert grid.nearest(44, 41, 3) is None
+    assert len(grid) == 1
+    assert (4, 4) not in grid.cells
+
+def test_nearest_segment():
+    grid = SpatialGrid(10)
+    grid.add_segment("leg", (0, 0), (100, 50))
+    # Every cell along the line (ending on the corner of cell (10, 5)), and no others
+    for x in range(101):
+        assert (x // 10, (x // 2) // 10) in grid.item_cells["leg"]
+    assert len(grid.item_cells["leg"]) == 16
+    assert grid.nearest(60, 32, 3) == "leg"
+    assert grid.nearest(60, 40, 3) is None
+    grid.add_segment("up", (70, 80), (70, 0))
+    assert grid.nearest(72, 20, 3) == "up"
+
+def test_nearest_random():
+    rand = random.Random(4)
+    grid = SpatialGrid(16)
+    items = {}
+    for i in range(200):
+        items[i] = (rand.uniform(0, 300), rand.uniform(0, 200))
+        grid.move(i, items[i])
+    for i in range(200, 230):
+        items[i] = (rand.uniform(0, 300), rand.uniform(0, 200), rand.uniform(0, 300), rand.uniform(0, 200))
+        grid.add_segment(i, items[i][:2], items[i][2:])
+    for step in range(300):
+        # Move some points, as vehicles do between frames
+        for i in rand.sample(range(200), 20):
+            items[i] = (rand.uniform(-10, 310), rand.uniform(-10, 210))
+            grid.move(i, items[i])
+        (x, y, radius) = (rand.uniform(0, 300), rand.uniform(0, 200), rand.uniform(1, 40))
+        expected = brute_nearest(items, x, y, radius)
+        found = grid.nearest(x, y, radius)
+        if expected is None:
+            assert found is None
+        else:
+            assert found is not None
+            assert abs(brute_nearest({found: items[found]}, x, y, radius)[0] - expected[0]) < 0.01
+
+def test_grid_clusters():
+    # Four points in cell (0, 0), two in cell (1, 0), three in cell (2, 1)
+    x = [1, 2, 3, 4, 12, 15, 25, 26, 29]
+    y = [1, 1, 5, 9, 1, 2, 11, 12, 19]
+    (groups, sizes) = grid_clusters(x, y, 10, 3)
+    assert groups.tolist() == [0, 0, 0, 0, -1, -1, 1, 1, 1]
+    assert sizes.tolist() == [4, 3]
+    (groups, sizes) = grid_clusters(x, y, 10, 2, max_groups=2)
+    assert groups.tolist() == [0, 0, 0, 0, -1, -1, 1, 1, 1]
+    (groups, sizes) = grid_clusters(x, y, 10, 3, max_groups=1)
+    assert groups.tolist() == [0, 0, 0, 0, -1, -1, -1, -1, -1]
+    assert sizes.tolist() == [4]
+    assert grid_clusters([], [], 10, 3)[0].tolist() == []
+
+def test_grid_clusters_bound():
+    # 300 crowded cells of 100 points each, and points spread over the canvas
+    rand = np.random.default_rng(0)
+    cells = rand.choice(48 * 27, 300, replace=False)
+    x = np.concatenate([np.repeat(cells % 48 * 40 + 20, 100), rand.uniform(0, 1920, 5000), [1920, 0]])
+    y = np.concatenate([np.repeat(cells // 48 * 40 + 20, 100), rand.uniform(0, 1080, 5000), [1080, 1080]])
+    count = grid_cell_count(1920, 1080, 40)
+    assert count >= 48 * 27
+    (groups, sizes) = grid_clusters(x, y, 40, 4, count)
+    # Every crowded cell is grouped, so few points per cell are left
+    assert len(sizes) >= 300 and sizes.sum() + (groups < 0).sum() == len(x)
+    (cols, rows) = (x // 40, y // 40)
+    left = {}
+    for col, row in zip(cols[groups < 0], rows[groups < 0]):
+        left[(col, row)] = left.get((col, row), 0) + 1
+    assert max(left.values()) <= 3
+    assert (groups < 0).sum() <= 3 * count
@@ -0,0 +1,29 @@
+from data import *
+from synthetic import *
+
+
+def test_synthetic_nodes():
+    nodes = synthetic_nodes(20, seed=1)
+    assert len(nodes) == 20
+    assert len(set(n[0] for n in nodes)) == 20
+    assert nodes == synthetic_nodes(20, seed=1)
+    for name, lat, lon in nodes:
+        assert not "_" in name
+        assert SYNTHETIC_AREA[0] <= lat <= SYNTHETIC_AREA[2]
+        assert SYNTHETIC_AREA[1] <= lon <= SYNTHETIC_AREA[3]
+
+def test_synthetic_log():
+    nodes = [n[0] for n in synthetic_nodes(10)]
+    log = synthetic_log(nodes, 8, 400, cargo=0.5)
+    assert log[0]["event"] == "Starting Sim"
+    times = [e["time"] for e in log]
+    assert times == sorted(times)
+    routing = RoutingData.from_object(log)
+    assert len(routing.get_vehicles()) == 8
+    assert 350 <= len(routing) <= 400
+    # Every trip is a valid leg
+    assert len(routing.get_legs()) == len([e for e in log if e["event"] == "taking off"])
+    cargo = CargoData.from_object(log)
+    assert len(cargo.levels) > 0
+    for node in cargo.levels:
+        assert cargo.levels[node].levels.min() >= 0
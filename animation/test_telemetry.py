@@ -0,0 +1,50 @@
+import os
+import csv
+import json
+from telemetry import *
+
+
+def run_frames(telemetry, wall, count):
+    for i in range(count):
+        telemetry.start_frame(i * 0.1)
+        wall.t += 0.001
+        telemetry.lap("vehicles")
+        wall.t += 0.003
+        telemetry.lap("graphs")
+        telemetry.end_frame()
+        wall.t += 0.006
+
+
+def test_stages(wall):
+    telemetry = FrameTelemetry(now=wall)
+    run_frames(telemetry, wall, 5)
+    assert telemetry.stages == ["vehicles", "graphs", "idle"]
+    assert abs(telemetry.get_fps() - 100) < 1e-6
+    means = telemetry.get_stage_means()
+    assert abs(means["vehicles"] - 1) < 1e-6
+    assert abs(means["graphs"] - 3) < 1e-6
+    assert abs(telemetry.get_percentiles()[0] - 4) < 1e-6
+    # Nothing kept unless recording
+    assert telemetry.frames == []
+
+def test_window(wall):
+    telemetry = FrameTelemetry(record=True, now=wall)
+    run_frames(telemetry, wall, TELEMETRY_WINDOW + 10)
+    assert len(telemetry.recent) == TELEMETRY_WINDOW
+    assert len(telemetry.frames) == TELEMETRY_WINDOW + 10
+
+def test_dump(tmp_path, wall):
+    telemetry = FrameTelemetry(record=True, now=wall)
+    run_frames(telemetry, wall, 3)
+    telemetry.dump(os.path.join(tmp_path, "frames.csv"))
+    with open(os.path.join(tmp_path, "frames.csv")) as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["frame", "time", "total", "vehicles", "graphs", "idle"]
+    assert len(rows) == 4
+    assert rows[1][-1] == ""
+    telemetry.dump(os.path.join(tmp_path, "frames.json"))
+    with open(os.path.join(tmp_path, "frames.json")) as f:
+        data = json.load(f)
+    assert data["stages"] == ["vehicles", "graphs", "idle"]
+    assert len(data["frames"]) == 3
+    assert abs(data["frames"][2]["idle"] - 0.006) < 1e-9
@@ -0,0 +1,79 @@
+import os
+from PIL import Image
+from tiles import *
+
+
+def make_source(tmp_path, width: int = 1000) -> str:
+    img = Image.new("RGB", (width, width // 2))
+    for x in range(0, width, 50):
+        img.paste((x % 256, 100, 200), (x, 0, x + 50, width // 2))
+    path = str(tmp_path / "map_1000x0500.png")
+    img.save(path)
+    return path
+
+
+def test_make_tiles(tmp_path):
+    count = make_tiles(make_source(tmp_path), str(tmp_path / "tiles"))
+    # Levels up to the first at least as wide as the source
+    assert count == 2 + 8
+    layer = TileLayer(str(tmp_path / "tiles"))
+    assert layer.levels == [0, 1]
+    assert Image.open(tile_file(layer.directory, 1, 1, 3)).size == (TILE_SIZE, TILE_SIZE)
+    assert layer.get_level(400) == 0
+    assert layer.get_level(600) == 1
+    assert layer.get_level(5000) == 1
+    assert not TileLayer(str(tmp_path / "missing")).exists()
+
+def test_tiles_in_view(tmp_path):
+    make_tiles(make_source(tmp_path), str(tmp_path / "tiles"))
+    layer = TileLayer(str(tmp_path / "tiles"))
+    # World shown 900 wide, viewing a 300x200 area from (350, 100)
+    tiles = layer.get_tiles(900, 350, 100, 300, 200)
+    assert sorted(key[1:3] for key, x, y in tiles) == [(0, 1), (0, 2), (1, 1), (1, 2)]
+    # Tiles are scaled to meet without gaps
+    for key, x, y in tiles:
+        (level, row, col, w, h) = key
+        assert x == round(col * TILE_SIZE * 900 / 1024) - 350
+        assert x + w == round((col + 1) * TILE_SIZE * 900 / 1024) - 350
+        assert layer.get_image(key).size == (w, h)
+    # Tiles outside the world aren't included
+    assert len(layer.get_tiles(900, -100, -100, 2000, 1000)) == 8
+
+def test_tile_cache(tmp_path):
+    make_tiles(make_source(tmp_path), str(tmp_path / "tiles"))
+    layer = TileLayer(str(tmp_path / "tiles"), cache_pixels=3 * TILE_SIZE**2)
+    keys = [key for key, x, y in layer.get_tiles(1024, 0, 0, 1024, 512)]
+    for key in keys[:3]:
+        layer.get_image(key)
+    layer.get_image(keys[0])
+    # Least recently used tile is dropped
+    layer.get_image(keys[3])
+    assert list(layer.cache) == [keys[2], keys[0], keys[3]]
+    layer.get_image(keys[0])
+    assert layer.loads == 4
+    assert layer.cache_used == 3 * TILE_SIZE**2
+    # Larger tiles take more of the cache
+    big = [key for key, x, y in layer.get_tiles(2048, 0, 0, 1024, 512)]
+    layer.get_image(big[0])
+    assert list(layer.cache) == [big[0]]
+    # Roughly scaled tiles aren't cached, but cached tiles are used when moving
+    fast = layer.get_image(big[1], fast=True)
+    assert fast.size == big[1][3:] and list(layer.cache) == [big[0]]
+    assert layer.get_image(big[0], fast=True) is layer.cache[big[0]]
+
+def test_tile_memory(tmp_path):
+    make_tiles(make_source(tmp_path), str(tmp_path / "tiles"))
+    layer = TileLayer(str(tmp_path / "tiles"))
+    layer.set_canvas_size(600, 300)
+    edge = 2 * TILE_SIZE * TILE_MAX_SCALE
+    assert layer.cache_pixels == TILE_CACHE_SCREENS * (600 + edge) * (300 + edge)
+    # Panning at the largest zoom keeps the cache within its size in pixels
+    world_width = layer.max_world_width()
+    assert world_width == 1024 * TILE_MAX_SCALE
+    layer.cache_pixels = 6 * (TILE_SIZE * TILE_MAX_SCALE)**2
+    for left in range(0, world_width - 600, 50):
+        for top in [0, 400, 700]:
+            for key, x, y in layer.get_tiles(world_width, left, top, 600, 300):
+                layer.get_image(key)
+            assert layer.cache_used <= layer.cache_pixels
+    assert layer.cache_used == sum(key[3] * key[4] for key in layer.cache)
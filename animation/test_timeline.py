@@ -0,0 +1,44 @@
+import pytest
+import random
+from timeline import *
+
+
+# Original linear search over times
+def linear_index_at(times: list[float], time: float) -> int:
+    if time < times[0]:
+        return -1
+    if time >= times[-1]:
+        return len(times) - 1
+    i = 0
+    while i < len(times) - 1:
+        if time == times[i]:
+            break
+        if time > times[i] and time < times[i + 1]:
+            break
+        i += 1
+    return i
+
+
+def test_index_at_single():
+    index = TimeIndex([2.0])
+    assert index.index_at(1.0) == -1
+    assert index.index_at(2.0) == 0
+    assert index.index_at(3.0) == 0
+
+def test_index_at_equal_times():
+    index = TimeIndex([0.0, 1.0, 1.0, 1.0, 2.0])
+    assert index.index_at(1.0) == 1
+    assert index.index_at(1.5) == 3
+    assert index.index_at(0.5) == 0
+    assert index.index_at(2.0) == 4
+
+def test_index_at_playback():
+    rand = random.Random(4)
+    times = sorted(rand.choice([rand.uniform(0, 20), float(rand.randint(0, 20))]) for _ in range(200))
+    index = TimeIndex(times)
+    # Play, rewind, then seek
+    queries = [i * 0.01 for i in range(-10, 2200)]
+    queries += [i * 0.07 for i in range(300, -10, -1)]
+    queries += [rand.uniform(-1, 21) for _ in range(500)] + [float(t) for t in times]
+    for q in queries:
+        assert index.index_at(q) == linear_index_at(times, q)
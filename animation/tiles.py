@@ -0,0 +1,148 @@
+import os
+import re
+from collections import OrderedDict
+from PIL import Image
+
+
+TILE_SIZE = 256 # Width and height of tiles in pixels
+TILE_DIR = "files/tiles"
+TILE_CACHE_SCREENS = 2 # Tile pixels kept in memory, as a multiple of the most tile pixels on the canvas at once
+TILE_MAX_SCALE = 2 # Most tiles of the largest level are scaled up, the view isn't zoomed in further
+
+
+# Get size of the whole world at a level of the tile pyramid, level 0 is two tiles
+def level_size(level: int) -> tuple[int, int]:
+    return (TILE_SIZE * 2 ** (level + 1), TILE_SIZE * 2 ** level)
+
+# Get file of a tile, levels are directories of '<row>_<col>.png' files
+def tile_file(directory: str, level: int, row: int, col: int) -> str:
+    return os.path.join(directory, str(level), "%d_%d.png" % (row, col))
+
+# Cut an equirectangular map image into a pyramid of tiles, with levels up to
+# the first at least as wide as the image, returning the number of tiles
+def make_tiles(source: str, directory: str, verbose: bool = False) -> int:
+    img = Image.open(source).convert("RGB")
+    count = 0
+    level = 0
+    while True:
+        (width, height) = level_size(level)
+        scaled = img.resize((width, height), Image.LANCZOS)
+        os.makedirs(os.path.join(directory, str(level)), exist_ok=True)
+        for row in range(height // TILE_SIZE):
+            for col in range(width // TILE_SIZE):
+                box = (col * TILE_SIZE, row * TILE_SIZE, (col + 1) * TILE_SIZE, (row + 1) * TILE_SIZE)
+                scaled.crop(box).save(tile_file(directory, level, row, col))
+                count += 1
+        if verbose:
+            print("Level %d (%dx%d)" % (level, width, height))
+        if width >= img.width:
+            return count
+        level += 1
+
+
+# Map background drawn from a tile pyramid, only loading tiles in view. Tiles
+# are scaled to the world size shown and kept in a least recently used cache.
+class TileLayer:
+    # Create from a directory made by make_tiles, make_image converts scaled
+    # tiles to images for the canvas. The cache holds scaled tiles of up to
+    # cache_pixels pixels in total.
+    def __init__(self, directory: str, make_image=None, cache_pixels: int = 64 * TILE_SIZE**2):
+        self.directory = directory
+        self.make_image = make_image or (lambda img: img)
+        self.cache_pixels = cache_pixels
+        self.cache_used = 0
+        self.cache = OrderedDict()
+        self.sources = OrderedDict()
+        self.loads = 0
+        self.levels = []
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if re.fullmatch(r"\d+", name):
+                    self.levels.append(int(name))
+        self.levels.sort()
+
+    # Check if there are any tiles to draw
+    def exists(self) -> bool:
+        return len(self.levels) > 0
+
+    # Get the most tiles shown at once on a canvas size, tiles are at least
+    # half size unless the whole world is smaller than level 0
+    def max_tiles(self, width: int, height: int) -> int:
+        return (width // (TILE_SIZE // 2) + 2) * (height // (TILE_SIZE // 2) + 2)
+
+    # Get the smallest level at least as wide as the world is shown, or the
+    # largest level
+    def get_level(self, world_width: int) -> int:
+        for level in self.levels:
+            if level_size(level)[0] >= world_width:
+                return level
+        return self.levels[-1]
+
+    # Get the widest the world can be shown, tiles are scaled up by at most
+    # TILE_MAX_SCALE
+    def max_world_width(self) -> int:
+        return level_size(self.levels[-1])[0] * TILE_MAX_SCALE
+
+    # Get tiles covering a view of the world shown at a width (and half the
+    # height), with the view's top left corner at (left, top) world pixels.
+    # Tiles are (key, x, y) with keys for get_image, and positions in the view.
+    def get_tiles(self, world_width: int, left: float, top: float, width: int, height: int) -> list[tuple[tuple, int, int]]:
+        level = self.get_level(world_width)
+        (level_width, level_height) = level_size(level)
+        world_height = world_width / 2
+        scale = world_width / level_width
+        # Tile edges are rounded the same way for neighbouring tiles, so they never overlap or leave gaps
+        edges_x = [round(c * TILE_SIZE * scale) for c in range(level_width // TILE_SIZE + 1)]
+        edges_y = [round(r * TILE_SIZE * scale) for r in range(level_height // TILE_SIZE + 1)]
+        tiles = []
+        for row in range(len(edges_y) - 1):
+            if edges_y[row + 1] <= top or edges_y[row] >= top + height or edges_y[row] >= world_height:
+                continue
+            for col in range(len(edges_x) - 1):
+                if edges_x[col + 1] <= left or edges_x[col] >= left + width:
+                    continue
+                size = (edges_x[col + 1] - edges_x[col], edges_y[row + 1] - edges_y[row])
+                tiles.append(((level, row, col) + size, int(round(edges_x[col] - left)), int(round(edges_y[row] - top))))
+        return tiles
+
+    # Set cache size to hold enough tiles for a canvas size, tiles on the
+    # canvas cover at most a tile of the largest size past each edge
+    def set_canvas_size(self, width: int, height: int):
+        edge = 2 * TILE_SIZE * TILE_MAX_SCALE
+        self.cache_pixels = TILE_CACHE_SCREENS * (width + edge) * (height + edge)
+
+    # Get a tile scaled to its size in a key from get_tiles. Fast scaling is
+    # rougher, for while the view is moving, and isn't cached since the view
+    # is refined with the cached tiles once it stops.
+    def get_image(self, key: tuple, fast: bool = False):
+        (level, row, col, width, height) = key
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        img = self._get_source(level, row, col)
+        if img.size != (width, height):
+            # Tiles are scaled by at most half, where bilinear is close to Lanczos and much faster
+            img = img.resize((width, height), Image.NEAREST if fast else Image.BILINEAR)
+        if fast:
+            return self.make_image(img)
+        self.cache[key] = self.make_image(img)
+        self.cache_used += width * height
+        while self.cache_used > self.cache_pixels and len(self.cache) > 1:
+            (old_key, old_img) = self.cache.popitem(last=False)
+            self.cache_used -= old_key[3] * old_key[4]
+        return self.cache[key]
+
+    # Get a tile at its own size, tiles are decoded once while in the cache
+    # so zooming only scales them
+    def _get_source(self, level: int, row: int, col: int) -> Image.Image:
+        key = (level, row, col)
+        if key in self.sources:
+            self.sources.move_to_end(key)
+            return self.sources[key]
+        img = Image.open(tile_file(self.directory, level, row, col))
+        img.load()
+        self.sources[key] = img
+        self.loads += 1
+        while len(self.sources) > max(1, self.cache_pixels // TILE_SIZE**2):
+            self.sources.popitem(last=False)
+        return img
@@ -0,0 +1,38 @@
+from array import array
+from bisect import bisect_left
+
+
+# Sorted times with a cursor, for looking up the index at a time during playback
+class TimeIndex:
+    def __init__(self, times: list[float]):
+        self.times = array("d", times)
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self.times)
+
+    # Get index of the last time before a given time (or of the first equal
+    # time), -1 if before all times, and the last index if at or after the end
+    def index_at(self, time: float) -> int:
+        times = self.times
+        last = len(times) - 1
+        if time < times[0]:
+            return -1
+        if time >= times[last]:
+            return last
+        # Check cursor and its neighbours, covering normal play and rewind
+        c = self.cursor
+        if c < last and times[c] < time < times[c + 1]:
+            return c
+        if c + 1 < last and times[c + 1] < time < times[c + 2]:
+            self.cursor = c + 1
+            return c + 1
+        if c > 0 and times[c - 1] < time < times[c]:
+            self.cursor = c - 1
+            return c - 1
+        # Seek with binary search
+        i = bisect_left(times, time)
+        if times[i] != time:
+            i -= 1
+        self.cursor = i
+        return i
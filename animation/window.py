@@ -1,41 +1,84 @@
 import tkinter
 from tkinter import ttk
+import numpy as np
 
 from animation.data import *
-from animation.canvas import MapCanvas, DYNAMIC_LEG_DISPLAY
+from animation.cache import ParsedLog
+from animation.canvas import MapCanvas, DYNAMIC_LEG_DISPLAY, DIRECTED_LEGS, ZOOM_STEP
 from animation.panels import *
 from animation.objects import *
+from animation.fleet import FleetState, UsageCounter, VEHICLE_KINDS
+from animation.clock import AnimationClock, idle_gaps
+from animation.telemetry import FrameTelemetry
+from animation.profiler import PROFILER
+from animation.raster import RasterMapCanvas
+from animation.spatial import SpatialGrid
 import windows.style
 
 
+CLICK_SLOP_PX = 4 # Mouse movement allowed during a click, moving further drags the map
+
+
 # Main map window, contains all map elements
 class WorldMap:
     time = 0.0
     end_time = 0.0
     paused = False
     speed = 1
+    fleet = None
+    usage = None
+    telemetry_file = None
+    skip_idle = False
+    cluster_vehicles = False
+    clusters = None
+    clusters_stale = False
+    view_changed = False
+    view_settling = False
+    pan_start = None
+    press = None
+    tooltip = None
+    hover = None
+    pinned = None
+    mouse = None
 
-    def __init__(self, xlsx, sim_log):
+    # Create from simulation input xlsx and movement log, either a pickle
+    # file name (loaded through the parsed log cache), a list of events, or an
+    # already parsed log; headless maps are rendered to images rather than a window
+    def __init__(self, xlsx, sim_log, verbose: bool = False, headless: bool = False):
         self.xlsx = xlsx
         self.sim_log = sim_log
-        self.canvas = MapCanvas()
+        if headless:
+            self.canvas = RasterMapCanvas()
+        else:
+            self.canvas = MapCanvas()
         self.graphs = []
         self.nodes = []
         self.legs = []
         self.vehicles = []
-        self.nodes = []
-        for n in LocationsData.from_xlsx(xlsx):
-            self.nodes.append(MapNode(n.name, n.lat, n.lon))
-        routing = RoutingData.from_object(sim_log)
-        if routing:
-            self.legs = []
-            for l in routing.get_legs():
-                self.legs.append(MapLeg(l[0], l[1]))
-            self.vehicles = []
-            for v in routing.get_vehicles():
-                self.vehicles.append(MapVehicle(v.vehicle_id, v.model, v.moves))
-            self.end_time = routing.get_end_time()
-        self.cargo_data = CargoData.from_object(sim_log)
+        self.telemetry = FrameTelemetry()
+        self.overlay = TelemetryOverlay(self.telemetry)
+        with PROFILER.phase("load log"):
+            if isinstance(sim_log, ParsedLog):
+                parsed = sim_log
+            elif type(sim_log) is str:
+                parsed = ParsedLog.load(sim_log, xlsx, verbose=verbose)
+            else:
+                parsed = ParsedLog.from_object(sim_log, xlsx, verbose)
+        with PROFILER.phase("map objects"):
+            for n in parsed.locations:
+                self.nodes.append(MapNode(n.name, n.lat, n.lon))
+            routing = parsed.routing
+            self.routing = routing
+            if routing:
+                legs = routing.get_leg_index(DIRECTED_LEGS)
+                max_trips = int(legs.counts.max()) if len(legs) else 1
+                for i in range(len(legs)):
+                    start, end = legs.get_names(i)
+                    self.legs.append(MapLeg(start, end, int(legs.counts[i]), max_trips))
+                for v in routing.get_vehicles():
+                    self.vehicles.append(MapVehicle(v.vehicle_id, v.model, v.moves))
+                self.end_time = routing.get_end_time()
+            self.cargo_data = parsed.cargo
 
 
     # Crop in map to show 1/4 of earth
@@ -46,6 +89,37 @@ class WorldMap:
     def style(self, style_name: str, icons: bool):
         self.canvas.set_style(style_name, icons)
 
+    # Show telemetry overlay at start, and write per frame timings to a CSV or
+    # JSON file on exit
+    def add_telemetry(self, shown: bool = True, dump_file: str = None):
+        self.overlay.shown = shown
+        if dump_file:
+            self.telemetry.record = True
+            self.telemetry_file = dump_file
+
+    # Skip periods where no vehicle moves and no cargo level changes, marking
+    # them on the timeline
+    def add_skip_idle(self, enabled: bool = True):
+        self.skip_idle = enabled
+
+    # Draw badges in place of vehicles crowded together at low zoom
+    def add_vehicle_clusters(self, enabled: bool = True):
+        self.cluster_vehicles = enabled
+
+    def toggle_clusters(self):
+        if not self.clusters:
+            return
+        self.clusters.toggle()
+        self.clusters_stale = True
+        if self.paused:
+            self.draw()
+
+    # Get periods where no vehicle moves and no cargo level changes
+    def get_idle_gaps(self) -> np.ndarray:
+        busy = self.routing.get_motion_intervals() if self.routing else np.zeros((0, 2))
+        events = self.cargo_data.get_change_times() if self.cargo_data else np.zeros(0)
+        return idle_gaps(busy, events, self.end_time)
+
     def add_vehicle_graph(self):
         graph = BarGraph(35, 80, 30, 20)
         graph.layout({
@@ -93,6 +167,8 @@ class WorldMap:
         self.add_cargo_piechart("EDWB", 70, 50)
 
     def get_vehicle_usage(self) -> dict[str, list[int]]:
+        if self.usage:
+            return self.usage.get_usage(self.time)
         vehicle_index = {"Airplane": 0, "Ship": 1, "Train": 2, "Truck": 3}
         usage = {
                 "Loading": [0]*4,
@@ -104,6 +180,58 @@ class WorldMap:
         return usage
 
 
+    # Display map and all items on the canvas at a given size
+    def display(self, parent, width: int, height: int, verbose: bool = False):
+        with PROFILER.phase("background"):
+            self.canvas.set_px(width, height)
+            # Add bases
+            self.canvas.add_named_locs([n.name for n in self.nodes], [n.lat for n in self.nodes], [n.lon for n in self.nodes])
+            self.canvas.display(parent, verbose)
+
+        # Setup overlay items
+        with PROFILER.phase("nodes and legs"):
+            node_count = 0
+            for n, loc in zip(self.nodes, self.get_node_locs()):
+                n.display(self.canvas, loc)
+                if loc:
+                    node_count += 1
+            if verbose:
+                print("Nodes displayed (%d)" % node_count)
+            if not DYNAMIC_LEG_DISPLAY:
+                for l in self.legs:
+                    l.display(self.canvas)
+                if verbose:
+                    print("Legs displayed (%d)" % len(self.legs))
+
+        # Setup vehicles
+        with PROFILER.phase("vehicles"):
+            self.canvas.set_nodes(self.routing.node_table)
+            self.fleet = FleetState(self.routing, [v.kind for v in self.vehicles], self.canvas.node_px)
+            self.fleet.compute(0.0)
+            self.usage = UsageCounter(self.fleet)
+            for v in self.vehicles:
+                v.display(self.canvas)
+            if verbose:
+                print("Vehicles displayed (%d)" % len(self.vehicles))
+            if self.cluster_vehicles and not DYNAMIC_LEG_DISPLAY:
+                self.clusters = VehicleClusters(self.vehicles, VEHICLE_KINDS)
+                self.clusters.display(self.canvas)
+                self.clusters_stale = True
+
+        # Add map decorations
+        with PROFILER.phase("decorations"):
+            self.key = VehicleKey()
+            self.key.display(self.canvas)
+            self.timebar = TimelineBar(self.end_time)
+            self.timebar.display(self.canvas)
+            for g in self.graphs:
+                g.display(self.canvas)
+            if verbose:
+                print("Graphs displayed (%d)" % len(self.graphs))
+            self.overlay.display(self.canvas)
+
+            self.canvas.updates.flush()
+
     # Run map display window
     def run(self, speed: int = 1, verbose: bool = False):
         self.verbose = verbose
@@ -113,94 +241,71 @@ class WorldMap:
                 sys.exit(1)
             print("WARNING: High speed '%s'" % speed)
         self.speed = speed
+        self.animation_clock = AnimationClock(self.end_time, speed)
+        self.animation_clock.set_idle(self.get_idle_gaps(), self.skip_idle)
 
 
-        self.tk = tkinter.Tk()
-        if self.tk.winfo_screenheight() == 1080:
-            SCALE = 1
-        elif self.tk.winfo_screenheight() == 2160:
-            SCALE = 2
-        else:
-            raise ValueError("Unknown screen resolution %dx%d" % (self.tk.winfo_screenheight(), self.tk.winfo_screenwidth()))
-        self.tk.title("SHS Demo")
-        style = windows.style.get_style()
-        self.tk.configure(bg=windows.style.BG_C1)
-        self.tk.grid()
-        # print("Displaying World, (0, 0) is", self.coord.calc_px(0, 0))
-
-        # Create toolbar
-        self.toolbar = ttk.Frame(self.tk, padding=(5*SCALE, 2*SCALE), style="OutBox.TFrame")
-        self.toolbar.pack(fill=tkinter.X)
-        # Clock
-        self.clock = ttk.Label(self.toolbar, text="Time: 0.0", padding=(10*SCALE, 0), style="OutBox.TLabel", width=24)
-        self.clock.pack(side="left")
-        # Spacer
-        ttk.Label(self.toolbar, style="OutBox.TLabel").pack(side="left", expand=True)
-        # Centeral buttons
-        buttons = [
-                ("Rewind x16", lambda: self.set_speed(-16)),
-                ("Rewind x8", lambda: self.set_speed(-8)),
-                ("Rewind x4", lambda: self.set_speed(-4)),
-                ("Rewind x2", lambda: self.set_speed(-2)),
-                ("Rewind", lambda: self.set_speed(-1)),
-                ("Pause", self.pause),
-                ("Play", lambda: self.set_speed(1)),
-                ("Speed x2", lambda: self.set_speed(2)),
-                ("Speed x4", lambda: self.set_speed(4)),
-                ("Speed x8", lambda: self.set_speed(8)),
-                ("Speed x16", lambda: self.set_speed(16)),
-            ]
-        for b in buttons:
-            ttk.Button(self.toolbar, text=b[0], style="Button.TButton", command=b[1]).pack(side="left", padx=15)
-        # Spacer (wider to balance clock)
-        ttk.Label(self.toolbar, style="OutBox.TLabel", width=9).pack(side="left", expand=True)
-        # Quit button
-        ttk.Button(self.toolbar, text="Quit", style="Button.TButton", command=self.tk.destroy).pack(side="left")
-
-
-        # Setup canvas
-        self.map_frame = ttk.Frame(self.tk, padding=0, borderwidth=0)
-        self.map_frame.pack(fill=tkinter.BOTH)
-        # Size map
-        canvas_w = self.tk.winfo_screenwidth() - 2
-        canvas_h = self.tk.winfo_screenheight() - 100*SCALE - 14
-        self.canvas.set_px(canvas_w, canvas_h)
-        # Add bases
-        for n in self.nodes:
-            self.canvas.add_named_loc(n.name, n.lat, n.lon)
-        self.canvas.display(self.map_frame, verbose)
+        with PROFILER.phase("window"):
+            self.tk = tkinter.Tk()
+            SCALE = 2 if self.tk.winfo_screenheight() >= 2160 else 1
+            self.tk.title("SHS Demo")
+            style = windows.style.get_style()
+            self.tk.configure(bg=windows.style.BG_C1)
+            self.tk.grid()
+            # print("Displaying World, (0, 0) is", self.coord.calc_px(0, 0))
 
-        # Setup overlay items
-        node_count = 0
-        for n in self.nodes:
-            try:
-                n.display(self.canvas)
-                node_count += 1
-            except:
-                pass
-        if verbose:
-            print("Nodes displayed (%d)" % node_count)
-        if not DYNAMIC_LEG_DISPLAY:
-            for l in self.legs:
-                l.display(self.canvas)
-            if verbose:
-                print("Legs displayed (%d)" % len(self.legs))
+            # Create toolbar
+            self.toolbar = ttk.Frame(self.tk, padding=(5*SCALE, 2*SCALE), style="OutBox.TFrame")
+            self.toolbar.pack(fill=tkinter.X)
+            # Clock
+            self.clock = ttk.Label(self.toolbar, text="Time: 0.0", padding=(10*SCALE, 0), style="OutBox.TLabel", width=24)
+            self.clock.pack(side="left")
+            # Spacer
+            ttk.Label(self.toolbar, style="OutBox.TLabel").pack(side="left", expand=True)
+            # Centeral buttons
+            buttons = [
+                    ("Rewind x16", lambda: self.set_speed(-16)),
+                    ("Rewind x8", lambda: self.set_speed(-8)),
+                    ("Rewind x4", lambda: self.set_speed(-4)),
+                    ("Rewind x2", lambda: self.set_speed(-2)),
+                    ("Rewind", lambda: self.set_speed(-1)),
+                    ("Pause", self.pause),
+                    ("Play", lambda: self.set_speed(1)),
+                    ("Speed x2", lambda: self.set_speed(2)),
+                    ("Speed x4", lambda: self.set_speed(4)),
+                    ("Speed x8", lambda: self.set_speed(8)),
+                    ("Speed x16", lambda: self.set_speed(16)),
+                ]
+            for b in buttons:
+                ttk.Button(self.toolbar, text=b[0], style="Button.TButton", command=b[1]).pack(side="left", padx=15)
+            # Spacer (wider to balance clock)
+            ttk.Label(self.toolbar, style="OutBox.TLabel", width=9).pack(side="left", expand=True)
+            # Quit button
+            ttk.Button(self.toolbar, text="Quit", style="Button.TButton", command=self.tk.destroy).pack(side="left")
+            self.tk.bind("<F3>", lambda e: self.overlay.toggle())
+            self.tk.bind("<F4>", lambda e: self.animation_clock.toggle_skip_idle())
+            self.tk.bind("<F5>", lambda e: self.toggle_clusters())
 
-        # Setup vehicles
-        for v in self.vehicles:
-            v.display(self.canvas)
-        if verbose:
-            print("Vehicles displayed (%d)" % len(self.vehicles))
 
-        # Add map decorations
-        self.key = VehicleKey()
-        self.key.display(self.canvas)
-        self.timebar = TimelineBar(self.end_time)
-        self.timebar.display(self.canvas)
-        for g in self.graphs:
-            g.display(self.canvas)
-        if verbose:
-            print("Graphs displayed (%d)" % len(self.graphs))
+            # Setup canvas
+            self.map_frame = ttk.Frame(self.tk, padding=0, borderwidth=0)
+            self.map_frame.pack(fill=tkinter.BOTH)
+            # Size map
+            canvas_w = self.tk.winfo_screenwidth() - 2
+            canvas_h = self.tk.winfo_screenheight() - 100*SCALE - 14
+        self.display(self.map_frame, canvas_w, canvas_h, verbose)
+        self.timebar.bind_seek(self.seek)
+        # Drag to pan, and scroll to zoom (Windows and macOS send MouseWheel, X11 sends buttons 4 and 5)
+        self.canvas.canvas.bind("<ButtonPress-1>", lambda e: self.start_pan(e.x, e.y))
+        self.canvas.canvas.bind("<B1-Motion>", lambda e: self.drag_pan(e.x, e.y))
+        self.canvas.canvas.bind("<ButtonRelease-1>", lambda e: self.end_pan(e.x, e.y))
+        self.canvas.canvas.bind("<MouseWheel>", lambda e: self.zoom(e.x, e.y, ZOOM_STEP if e.delta > 0 else 1/ZOOM_STEP))
+        self.canvas.canvas.bind("<Button-4>", lambda e: self.zoom(e.x, e.y, ZOOM_STEP))
+        self.canvas.canvas.bind("<Button-5>", lambda e: self.zoom(e.x, e.y, 1/ZOOM_STEP))
+        # Hover over items for tooltips, and click to keep one shown
+        self.add_inspect()
+        self.canvas.canvas.bind("<Motion>", lambda e: self.hover_at(e.x, e.y))
+        self.canvas.canvas.bind("<Leave>", lambda e: self.hover_at(None, None))
 
         # Print vehicle counts
         tmp = self.get_vehicle_usage()
@@ -211,6 +316,7 @@ class WorldMap:
             print(">", ["airplanes:", "ships:", "trains:", "trucks:"][i], count)
 
         # Run animation
+        PROFILER.finish()
         self.tk.after(0, self.step)
         if verbose:
             print("Running animation (T0 to T%.3f)" % (self.end_time))
@@ -218,35 +324,258 @@ class WorldMap:
         if self.verbose:
             if self.time < self.end_time:
                 print("Ended animation (T%.3f)" % self.time)
+            print("Skipped %d frames" % self.animation_clock.skipped)
+        if self.telemetry_file:
+            self.telemetry.dump(self.telemetry_file)
+            print("Wrote frame timings (%s)" % self.telemetry_file)
 
-    # Step animation
+    # Step animation, simulation time follows the wall clock so slow frames are skipped
     def step(self):
+        self.time = self.animation_clock.tick()
         if self.paused:
-            self.tk.after(10, self.step)
+            # Still draw view changes
+            if self.view_changed or self.view_settling:
+                self.draw()
+            self.tk.after(self.animation_clock.get_delay(), self.step)
             return
+        self.telemetry.start_frame(self.time)
+        if self.animation_clock.last_skip:
+            self.timebar.mark_skip(*self.animation_clock.last_skip)
+        self.clock["text"] = self.get_clock_text()
+        self.telemetry.lap("clock")
+        self.draw()
+        self.telemetry.end_frame()
+        self.tk.after(self.animation_clock.get_delay(), self.step)
+
+    # Update all items on the canvas for the current time
+    def draw(self):
+        if self.view_changed:
+            self.reproject(True)
+            self.telemetry.lap("view")
+        elif self.view_settling:
+            # View stopped moving, draw the map properly
+            self.view_settling = False
+            self.canvas.show_tiles()
+            self.telemetry.lap("view")
+        self.timebar.step(self.time)
+        self.telemetry.lap("timebar")
+        if DYNAMIC_LEG_DISPLAY:
+            for v in self.vehicles:
+                v.step(self.canvas, self.time)
+        else:
+            changes = self.fleet.get_changes(self.time)
+            for i, loc in changes:
+                self.vehicles[i].move_to(loc)
+        self.telemetry.lap("vehicles")
+        if self.clusters and (changes or self.clusters_stale):
+            self.clusters_stale = False
+            for i in self.clusters.step(self.fleet.x, self.fleet.y, self.fleet.visible, self.canvas.coord.zoom):
+                changes.append((i, self.vehicles[i].current_loc))
+            self.telemetry.lap("clusters")
+        if self.tooltip:
+            if DYNAMIC_LEG_DISPLAY:
+                changes = [(i, v.current_loc) for i, v in enumerate(self.vehicles)]
+            self.update_inspect(changes)
+            self.telemetry.lap("inspect")
+        for g in self.graphs:
+            g.step(self.time)
+            self.telemetry.lap(g.title)
+        self.overlay.step(self.time)
+        self.telemetry.lap("overlay")
+        self.canvas.updates.flush()
+        self.telemetry.lap("flush")
+
+    def get_clock_text(self) -> str:
         days = self.time
         hours = (days % 1) * 24
         minutes = (hours % 1) * 60
-        self.clock["text"] = "Day %.0f %02.0f:%02.0f" % (days, hours, minutes)
-        self.timebar.step(self.time)
+        return "Day %.0f %02.0f:%02.0f" % (days, hours, minutes)
 
-        for v in self.vehicles:
-            v.step(self.canvas, self.time)
-        for g in self.graphs:
-            g.step(self.time)
 
-        self.time += 0.002 * self.speed
-        if self.time > self.end_time:
-            self.time = self.end_time
-        elif self.time < 0:
-            self.time = 0
-        self.tk.after(10, self.step)
+    # Setup headless map for rendering frames at a given size
+    def display_headless(self, width: int, height: int, verbose: bool = False):
+        if not isinstance(self.canvas, RasterMapCanvas):
+            raise ValueError("Map must be created as headless to render frames")
+        self.display(None, width, height, verbose)
+        x, y = self.canvas.coord.calc_percent_px(1, 2)
+        self.clock_text = self.canvas.canvas.create_text(x, y, text=self.get_clock_text(), fill=self.canvas.style.text, anchor="w")
 
+    # Render a frame at a given time, after display_headless
+    def render_frame(self, time: float):
+        self.time = min(max(time, 0), self.end_time)
+        self.canvas.updates.config(self.clock_text, text=self.get_clock_text())
+        self.draw()
+        return self.canvas.render()
+
+    # Start dragging the map, except on the timeline. Presses only drag the
+    # map once the mouse moves, otherwise they're clicks.
+    def start_pan(self, x: int, y: int):
+        self.pan_start = None if self.timebar.contains(y) else (x, y)
+        self.press = self.pan_start
+
+    def drag_pan(self, x: int, y: int):
+        if not self.pan_start:
+            return
+        if self.press:
+            if abs(x - self.press[0]) <= CLICK_SLOP_PX and abs(y - self.press[1]) <= CLICK_SLOP_PX:
+                return
+            self.press = None
+        self.pan(x - self.pan_start[0], y - self.pan_start[1])
+        self.pan_start = (x, y)
+
+    def end_pan(self, x: int, y: int):
+        if self.press:
+            self.click_at(*self.press)
+        self.pan_start = None
+        self.press = None
+
+    # Move the map by a number of pixels, drawn on the next frame
+    def pan(self, dx: float, dy: float):
+        self.canvas.coord.pan_px(dx, dy)
+        self.view_changed = True
+
+    # Zoom the map by a factor around a pixel location, drawn on the next frame.
+    # Zoom needs map tiles (see make_tiles.py), otherwise it's ignored.
+    def zoom(self, x: float, y: float, factor: float):
+        if not self.canvas.can_zoom():
+            return
+        self.canvas.coord.zoom_at(x, y, factor)
+        self.view_changed = True
+
+    # Setup hit-testing of map items, vehicles are indexed as they move and
+    # nodes and legs when the view changes
+    def add_inspect(self):
+        self.vehicle_grid = SpatialGrid()
+        self.node_grid = SpatialGrid()
+        self.leg_grid = SpatialGrid()
+        self.static_indexed = False
+        for i, v in enumerate(self.vehicles):
+            self.vehicle_grid.move(i, None if v.clustered else v.current_loc)
+        self.tooltip = InspectTooltip()
+        self.tooltip.display(self.canvas)
+
+    # Index nodes and legs at their locations in the current view
+    def index_static(self):
+        self.node_grid.clear()
+        for i, loc in enumerate(self.get_node_locs()):
+            self.node_grid.move(i, loc)
+        self.leg_grid.clear()
+        if not DYNAMIC_LEG_DISPLAY:
+            for i, l in enumerate(self.legs):
+                ends = l.get_ends(self.canvas)
+                if ends:
+                    self.leg_grid.add_segment(i, *ends)
+        self.static_indexed = True
+
+    # Find the map item at a pixel location, as (kind, index), preferring
+    # vehicles and then nodes over legs drawn beneath them
+    def find_item(self, x: int, y: int) -> tuple[str, int]:
+        if not self.static_indexed:
+            self.index_static()
+        if self.clusters:
+            # Clusters are given by a vehicle in them
+            vehicle = self.clusters.find(x, y)
+            if vehicle is not None:
+                return ("cluster", vehicle)
+        radius = self.canvas.style.vehicle_radius + CLICK_SLOP_PX
+        for kind, grid in (("vehicle", self.vehicle_grid), ("node", self.node_grid), ("leg", self.leg_grid)):
+            key = grid.nearest(x, y, radius)
+            if key is not None:
+                return (kind, key)
+        return None
+
+    # Get current pixel location of a map item, None if it isn't shown
+    def get_item_loc(self, item: tuple[str, int]) -> tuple[int, int]:
+        (kind, i) = item
+        if kind == "cluster":
+            return self.clusters.get_loc(i)
+        if kind == "vehicle":
+            return self.vehicles[i].current_loc
+        if kind == "node":
+            return self.canvas.named.get(self.nodes[i].name)
+        ends = self.legs[i].get_ends(self.canvas)
+        if not ends:
+            return None
+        return ((ends[0][0] + ends[1][0]) // 2, (ends[0][1] + ends[1][1]) // 2)
+
+    def get_item_info(self, item: tuple[str, int]) -> list[str]:
+        (kind, i) = item
+        if kind == "cluster":
+            return self.clusters.get_info(i)
+        if kind == "vehicle":
+            return self.vehicles[i].get_info(self.time, self.cargo_data)
+        if kind == "node":
+            return self.nodes[i].get_info(self.time, self.cargo_data)
+        return self.legs[i].get_info()
+
+    # Show the tooltip of the item under the mouse, or the pinned item
+    def show_tooltip(self):
+        item = self.hover or self.pinned
+        loc = self.get_item_loc(item) if item else None
+        if loc:
+            self.tooltip.show(self.get_item_info(item), loc)
+        else:
+            self.tooltip.hide()
+
+    def hover_at(self, x: int, y: int):
+        self.mouse = None if x is None else (x, y)
+        self.hover = None if x is None else self.find_item(x, y)
+        self.show_tooltip()
+
+    # Pin the tooltip of the clicked item, or unpin it clicking elsewhere
+    def click_at(self, x: int, y: int):
+        self.pinned = self.find_item(x, y)
+        self.show_tooltip()
+
+    # Move vehicles in the hit-testing grid, and update the tooltip for the
+    # current time. Items move under a still mouse, so it's hit-tested again.
+    def update_inspect(self, changes: list[tuple[int, tuple[int, int]]]):
+        for i, loc in changes:
+            # Vehicles in clusters are found by their badge
+            self.vehicle_grid.move(i, None if self.vehicles[i].clustered else loc)
+        if self.mouse:
+            self.hover = self.find_item(*self.mouse)
+        if self.hover or self.pinned:
+            self.show_tooltip()
+
+    # Get pixel locations of nodes in the current view, None if outside it
+    def get_node_locs(self) -> list[tuple[int, int]]:
+        return self.canvas.calc_locs([n.lat for n in self.nodes], [n.lon for n in self.nodes])
+
+    # Move map items to the current view, each change is batched into one
+    # flush, and vehicles are moved by the next fleet update. The map is drawn
+    # roughly when fast (until the view stops changing).
+    def reproject(self, fast: bool = False):
+        self.view_changed = False
+        self.view_settling = fast and self.canvas.has_tiles()
+        self.canvas.reproject(fast)
+        for n, loc in zip(self.nodes, self.get_node_locs()):
+            if n.canvas_dot:
+                n.move_to(self.canvas, loc)
+        if not DYNAMIC_LEG_DISPLAY:
+            for l in self.legs:
+                l.reproject(self.canvas)
+        for g in self.graphs:
+            g.reproject()
+        if self.fleet:
+            self.fleet.set_node_px(self.canvas.node_px)
+        for v in self.vehicles:
+            v.cached_px_index = -9
+        self.static_indexed = False
+        self.clusters_stale = True
+
+    # Jump to a time, drawing it straight away so seeking works while paused
+    def seek(self, time: float):
+        self.animation_clock.seek(time)
+        self.time = self.animation_clock.time
+        self.clock["text"] = self.get_clock_text()
+        self.draw()
 
     def pause(self):
         self.paused = True
+        self.animation_clock.pause()
 
     def set_speed(self, speed: int):
         self.paused = False
         self.speed = speed
-
+        self.animation_clock.set_speed(speed)
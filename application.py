@@ -16,7 +16,13 @@ INPUT_FILE = "files/simulation_input_planes.xlsx"
 parser = argparse.ArgumentParser(prog='SHS GUI Demo')
 parser.add_argument("-x", "--input-xlsx", default=INPUT_FILE, help="XLSX file containing simulation input definitions")
 parser.add_argument("-d", "--directory", default=TMP_DIR, help="Directory containing user simulations")
+parser.add_argument("--profile", nargs="?", const="", metavar="FILE", help="Report startup phase timings of animations, to a file if given")
+parser.add_argument("--profile-hotspots", action="store_true", help="Include cProfile hotspots of each phase in the startup report")
 args = parser.parse_args()
 
+profile = None
+if args.profile is not None or args.profile_hotspots:
+    profile = (args.profile_hotspots, args.profile)
 
-ApplicationController(args.input_xlsx, args.directory).run()
+
+ApplicationController(args.input_xlsx, args.directory, profile).run()
@@ -0,0 +1,165 @@
+#!/bin/env python3
+import json
+import platform
+import argparse
+import subprocess
+from time import perf_counter
+
+from animation.data import *
+from animation.cache import ParsedLog
+from animation.fleet import FleetState, UsageCounter
+from animation.synthetic import synthetic_nodes, synthetic_log
+from animation.spatial import SpatialGrid
+from animation.stub import StubMapCanvas
+from animation.window import WorldMap
+
+
+# Time a function over repeats, with a fresh setup value for each repeat
+def measure(func, setup=None, repeat: int = 5) -> dict:
+    times = []
+    for i in range(repeat):
+        arg = setup() if setup else None
+        start = perf_counter()
+        func(arg)
+        times.append(perf_counter() - start)
+    times.sort()
+    return {"median": times[len(times) // 2], "min": times[0], "repeat": repeat}
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+# Parse command line arguments
+parser = argparse.ArgumentParser(prog='SHS Benchmark', description="Benchmark parsing and animation with synthetic movement logs")
+parser.add_argument("-n", "--nodes", type=int, default=50, help="Number of nodes")
+parser.add_argument("-V", "--vehicles", type=int, default=500, help="Number of vehicles")
+parser.add_argument("-e", "--events", type=int, default=50000, help="Number of movement log events")
+parser.add_argument("-c", "--cargo", type=float, default=0.3, help="Fraction of trips carrying cargo")
+parser.add_argument("-f", "--frames", type=int, default=300, help="Number of frames timed in frame benchmarks")
+parser.add_argument("-r", "--repeat", type=int, default=5, help="Number of times each benchmark is run")
+parser.add_argument("--seed", type=int, default=0, help="Random seed of synthetic log")
+parser.add_argument("-o", "--output", help="JSON file to save results to")
+parser.add_argument("--compare", metavar="JSON", help="Earlier results to compare against")
+args = parser.parse_args()
+
+
+print("Generating synthetic log (%d nodes, %d vehicles, %d events) ..." % (args.nodes, args.vehicles, args.events))
+nodes = synthetic_nodes(args.nodes, args.seed)
+log = synthetic_log([n[0] for n in nodes], args.vehicles, args.events, args.cargo, args.seed)
+
+parsed = ParsedLog()
+for name, lat, lon in nodes:
+    node = LocationsData.Node()
+    node.name = name
+    node.lat = lat
+    node.lon = lon
+    parsed.locations.nodes.append(node)
+parsed.routing = RoutingData.from_object(log)
+parsed.cargo = CargoData.from_object(log)
+routing = parsed.routing
+end_time = routing.get_end_time()
+frame_times = [end_time * i / args.frames for i in range(args.frames)]
+
+# Map drawn on a stub canvas, with charts for a few nodes with cargo
+world = WorldMap(None, parsed)
+world.canvas = StubMapCanvas()
+world.crop(-5, -120)
+world.style("dark", False)
+world.add_vehicle_graph()
+for name, lat, lon in nodes[:6]:
+    world.add_cargo_piechart(name, lat, lon)
+world.display(None, 1918, 966)
+fleet = FleetState(routing, [v.kind for v in world.vehicles], world.canvas.node_px)
+
+def draw_frames(arg):
+    for t in frame_times:
+        world.time = t
+        world.draw()
+
+def compute_frames(arg):
+    for t in frame_times:
+        fleet.compute(t)
+
+def change_frames(arg):
+    fleet.compute(-1.0)
+    for t in frame_times:
+        fleet.get_changes(t)
+
+# Zoom in and out around the center, then pan back and forth, every frame
+def view_frames(arg):
+    (x, y) = (world.canvas.coord.px_width_full / 2, world.canvas.coord.px_height_full / 2)
+    for i, t in enumerate(frame_times):
+        if i % 40 < 20:
+            world.zoom(x, y, 1.05 if i % 40 < 10 else 1 / 1.05)
+        else:
+            world.pan(-10 if i % 40 < 30 else 10, 5 if i % 40 < 30 else -5)
+        world.time = t
+        world.draw()
+
+# Vehicle changes moved in a hit-testing grid, with a lookup every frame
+def hit_frames(grid):
+    fleet.compute(-1.0)
+    for i, t in enumerate(frame_times):
+        for v, loc in fleet.get_changes(t):
+            grid.move(v, loc)
+        grid.nearest(i * 7 % 1918, i * 3 % 966, 8)
+
+def usage_frames(counter):
+    for t in frame_times:
+        counter.get_usage(t)
+
+
+benchmarks = [
+        ("parse routing", lambda arg: RoutingData.from_object(log), None),
+        ("parse cargo", lambda arg: CargoData.from_object(log), None),
+        ("get_legs", lambda r: r.get_legs(), lambda: RoutingData.from_object(log)),
+        ("get_leg_index", lambda r: r.get_leg_index(), lambda: RoutingData.from_object(log)),
+        ("get_vehicles", lambda r: r.get_vehicles(), lambda: RoutingData.from_object(log)),
+        ("frame state", compute_frames, None),
+        ("frame changes", change_frames, None),
+        ("frame usage", usage_frames, lambda: UsageCounter(fleet)),
+        ("frame hits", hit_frames, SpatialGrid),
+        ("draw frames", draw_frames, None),
+        ("view frames", view_frames, None),
+    ]
+results = {}
+for name, func, setup in benchmarks:
+    results[name] = measure(func, setup, args.repeat)
+    if name in ["frame state", "frame changes", "frame usage", "frame hits", "draw frames", "view frames"]:
+        results[name]["per_frame"] = results[name]["median"] / args.frames
+stub = world.canvas.canvas
+stub.updates = 0
+draw_frames(None)
+results["draw frames"]["updates_per_frame"] = stub.updates / args.frames
+results["draw frames"]["items"] = stub.creates
+
+
+# Print and save results
+old = {}
+if args.compare:
+    with open(args.compare) as f:
+        data = json.load(f)
+    old = data["results"]
+    for name in ["nodes", "vehicles", "events", "cargo", "frames", "seed"]:
+        if data["params"][name] != getattr(args, name):
+            print("WARNING: Compared results used different %s (%s)" % (name, data["params"][name]))
+for name, r in results.items():
+    line = "%-16s %10.3f ms" % (name, r["median"] * 1000)
+    if "per_frame" in r:
+        line += " (%.3f ms/frame)" % (r["per_frame"] * 1000)
+    if name in old:
+        line += "  was %.3f ms (%+.0f%%)" % (old[name]["median"] * 1000, 100 * (r["median"] / old[name]["median"] - 1))
+    print(line)
+print("Draw updates per frame %.1f, canvas items %d" % (results["draw frames"]["updates_per_frame"], results["draw frames"]["items"]))
+if args.output:
+    with open(args.output, "w") as f:
+        json.dump({
+                "commit": get_commit(),
+                "python": platform.python_version(),
+                "params": vars(args),
+                "results": results,
+            }, f, indent=1)
+    print("Saved results (%s)" % args.output)
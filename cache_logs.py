@@ -0,0 +1,51 @@
+#!/bin/env python3
+import os
+import pickle
+import argparse
+
+from animation.cache import *
+
+
+# Parse command line arguments
+parser = argparse.ArgumentParser(prog='SHS Cache Builder', description="Prebuild parsed log caches for every movement log in a directory")
+parser.add_argument("directory", help="Directory containing movement log or saved simulation pickle files")
+parser.add_argument("-x", "--input-xlsx", default="files/simulation_input_planes.xlsx", help="XLSX file containing simulation input definitions")
+parser.add_argument("-c", "--cache-dir", default=CACHE_DIR, help="Directory to store cache files in")
+parser.add_argument("-v", "--verbose", action="store_true", help="Print detailed information")
+args = parser.parse_args()
+
+
+count = 0
+for f in sorted(os.scandir(args.directory), key=lambda f: f.name):
+    # Hidden files are skipped, eg. workbook sidecars beside the xlsx
+    if not f.name.endswith(".pkl") or f.name.startswith("."):
+        continue
+    try:
+        # Check for an existing cache before reading the log, a saved
+        # simulation carries its own input xlsx so is only keyed once read
+        xlsx = args.input_xlsx
+        key = cache_key(f.path, xlsx, args.cache_dir)
+        data = None
+        if not os.path.exists(cache_path(f.path, key, args.cache_dir)):
+            with open(f.path, "rb") as log:
+                data = pickle.load(log)
+            if hasattr(data, "output"):
+                if not data.output:
+                    print("Skipping %s (no simulation output)" % f.name)
+                    continue
+                if data.xlsx != xlsx:
+                    xlsx = data.xlsx
+                    key = cache_key(f.path, xlsx, args.cache_dir)
+                data = data.output
+        path = cache_path(f.path, key, args.cache_dir)
+        if os.path.exists(path):
+            if args.verbose:
+                print("Up to date %s" % f.name)
+            continue
+        ParsedLog.from_object(data, xlsx, args.verbose).to_cache(path, key)
+    except Exception as e:
+        print("Skipping %s (%s)" % (f.name, e))
+        continue
+    print("Cached %s" % f.name)
+    count += 1
+print("Built %d caches in %s" % (count, args.cache_dir))
@@ -0,0 +1,32 @@
+#!/bin/env python3
+import os
+import re
+import glob
+import argparse
+
+from animation.tiles import make_tiles, TILE_DIR
+
+
+# Parse command line arguments
+parser = argparse.ArgumentParser(prog='SHS Map Tiles', description="Cut equirectangular map images into tile pyramids for the map background")
+parser.add_argument("maps", nargs="*", help="Map images, defaults to the largest image of each map in files/maps")
+parser.add_argument("-o", "--output", default=TILE_DIR, help="Directory to write a tile directory of each map to")
+parser.add_argument("-v", "--verbose", action="store_true", help="Print detailed information")
+args = parser.parse_args()
+
+
+# Find the largest image of each map, by name without its size
+maps = {}
+for f in args.maps or glob.glob("files/maps/equirectangular_*.png"):
+    match = re.fullmatch(r"(.*?)(_(\d+)x\d+)?\.png", os.path.basename(f))
+    if not match:
+        continue
+    width = int(match.group(3) or 0)
+    if not match.group(1) in maps or maps[match.group(1)][0] < width:
+        maps[match.group(1)] = (width, f)
+if not maps:
+    print("No map images found")
+for name, (width, f) in sorted(maps.items()):
+    print("Making tiles of %s ..." % f)
+    count = make_tiles(f, os.path.join(args.output, name), args.verbose)
+    print("Wrote %d tiles (%s)" % (count, os.path.join(args.output, name)))
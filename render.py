@@ -0,0 +1,37 @@
+#!/bin/env python3
+import os
+import argparse
+
+from animation.export import AnimationExport
+
+
+# Parse command line arguments
+parser = argparse.ArgumentParser(prog='SHS Renderer', description="Render animation without a display, to PNG frames, an animated GIF, or a video")
+parser.add_argument("output", help="Directory to write numbered PNG frames to, or a GIF or video (mp4, mkv, mov, webm) file")
+parser.add_argument("-x", "--input-xlsx", default="files/simulation_input_planes.xlsx", help="XLSX file containing simulation input definitions")
+parser.add_argument("-l", "--movement-log", default="files/movement_log_planes.pkl", help="Pickle file containing mission events")
+parser.add_argument("-v", "--verbose", action="store_true", help="Print detailed information")
+parser.add_argument("-s", "--speed", type=int, default=1, help="Animation speed, a integer between 1 and 20 ")
+parser.add_argument("-r", "--resolution", default="1920x1080", help="Frame size as WIDTHxHEIGHT")
+parser.add_argument("-f", "--fps", type=int, default=30, help="Frames per second of animation")
+parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Number of processes rendering frames")
+parser.add_argument("--style", choices=["light", "dark", "satellite"], help="Animation style and color scheme")
+parser.add_argument("--icons", action="store_true", help="Use icons in place of dots of vehicles")
+args = parser.parse_args()
+
+try:
+    width, height = [int(x) for x in args.resolution.lower().split("x")]
+except ValueError:
+    parser.error("Invalid resolution '%s'" % args.resolution)
+
+
+try:
+    export = AnimationExport(args.input_xlsx, args.movement_log, args.output, width, height, args.fps, args.speed)
+except ValueError as e:
+    parser.error(e)
+export.set_style(args.style, args.icons)
+
+
+print("Rendering animation ...")
+count = export.run(args.jobs, args.verbose)
+print("Rendered %d frames to %s" % (count, args.output))
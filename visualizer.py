@@ -1,8 +1,13 @@
 #!/bin/env python3
+import sys
 import argparse
 
-from animation.data import *
-from animation.window import WorldMap
+from animation.profiler import PROFILER
+# Imports are timed before arguments are parsed
+PROFILER.collect_hotspots("--profile-hotspots" in sys.argv)
+with PROFILER.phase("imports"):
+    from animation.data import *
+    from animation.window import WorldMap
 
 
 # Parse command line arguments
@@ -13,19 +18,31 @@ parser.add_argument("-v", "--verbose", action="store_true", help="Print detailed
 parser.add_argument("-s", "--speed", type=int, default=1, help="Animation speed, a integer between 1 and 20 ")
 parser.add_argument("--style", choices=["light", "dark", "satellite"], help="Animation style and color scheme")
 parser.add_argument("--icons", action="store_true", help="Use icons in place of dots of vehicles")
+parser.add_argument("--telemetry", action="store_true", help="Show frame timing overlay (toggle with F3)")
+parser.add_argument("--telemetry-dump", metavar="FILE", help="Write per frame timings to a CSV or JSON file on exit")
+parser.add_argument("--skip-idle", action="store_true", help="Skip periods where nothing moves (toggle with F4)")
+parser.add_argument("--clusters", action="store_true", help="Draw crowded vehicles as badges with counts at low zoom (toggle with F5)")
+parser.add_argument("--profile", nargs="?", const="", metavar="FILE", help="Report startup phase timings, to a file if given")
+parser.add_argument("--profile-hotspots", action="store_true", help="Include cProfile hotspots of each phase in the startup report")
 args = parser.parse_args()
+if args.profile is not None or args.profile_hotspots:
+    PROFILER.enable(args.profile_hotspots, args.profile)
 
 
 print("Loading animation data ...")
-with open(args.movement_log, "rb") as f:
-    log = pickle.load(f)
-world = WorldMap(args.input_xlsx, log)
+world = WorldMap(args.input_xlsx, args.movement_log, args.verbose)
 
 
 world.crop(-5, -120)
 world.style(args.style, args.icons)
 # world.add_vehicle_graph()
 world.add_cargo_charts()
+if args.telemetry or args.telemetry_dump:
+    world.add_telemetry(args.telemetry, args.telemetry_dump)
+if args.skip_idle:
+    world.add_skip_idle()
+if args.clusters:
+    world.add_vehicle_clusters()
 
 
 print("Running animation ...")
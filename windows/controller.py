@@ -3,6 +3,7 @@ from multiprocessing import Process, Queue
 
 from animation.data import *
 from animation.window import WorldMap
+from animation.profiler import PROFILER
 from windows.data import SimGUIInputs
 from windows.manager import ManagerWindow
 from windows.input import InputWindow
@@ -17,8 +18,10 @@ def edit_sim(name, data, cmd_queue):
     win = InputWindow(data, name, cmd_queue)
     win.display()
 
-def display_sim(data):
-    world = WorldMap(data.xlsx, data.output)
+def display_sim(sim_file, xlsx, profile=None):
+    if profile:
+        PROFILER.enable(*profile)
+    world = WorldMap(xlsx, sim_file)
     world.crop(-5, -120)
     world.style("satellite", False)
     world.add_cargo_charts()
@@ -27,8 +30,11 @@ def display_sim(data):
 
 
 class ApplicationController:
-    def __init__(self, xlsx, directory):
+    # Create with simulation input xlsx, directory of user simulations, and
+    # startup profiler settings for animations as (hotspots, report file)
+    def __init__(self, xlsx, directory, profile=None):
         self.xlsx = xlsx
+        self.profile = profile
         os.makedirs(directory, exist_ok=True)
         self.directory = directory
         self.cmd_queue = Queue()
@@ -57,7 +63,8 @@ class ApplicationController:
                 proc.start()
                 self.procs.append(proc)
             elif cmd[0] == "display_sim":
-                proc = Process(target=display_sim, args=(cmd[1],))
+                sim_file = os.path.join(self.directory, cmd[1].name + ".pkl")
+                proc = Process(target=display_sim, args=(sim_file, cmd[1].xlsx, self.profile))
                 proc.start()
                 self.procs.append(proc)
             elif cmd[0] == "new_sim":
@@ -3,6 +3,7 @@ import pickle
 from operator import itemgetter
 import pandas as pd
 from simulator.frontend import SelfHealingSimulation
+from animation.data import WorkbookData
 
 
 
@@ -37,15 +38,15 @@ class SimGUIInputs:
 
     @staticmethod
     def from_xlsx(file: str):
-        xls = pd.ExcelFile(file)
-        nodes_raw = pd.read_excel(xls, "Army_nodes")
+        workbook = WorkbookData.load(file)
+        nodes_raw = workbook.sheet("Army_nodes")
         nodes_raw.set_index("ICAO", inplace=True)
 
         ret = SimGUIInputs()
         for idx, row in nodes_raw.iterrows():
             ret.nodes[idx] = SimGUIInputs.Node(idx, row["name"])
 
-        vehicles_raw = pd.read_excel(xls, "Vehicles")
+        vehicles_raw = workbook.sheet("Vehicles")
         vehicles_raw.set_index("model", inplace=True)
 
         for idx, row in vehicles_raw.iterrows():